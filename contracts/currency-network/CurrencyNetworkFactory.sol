@@ -0,0 +1,38 @@
+pragma solidity ^0.5.8;
+
+
+/**
+ * @title Factory to deploy and initialize currency networks in one transaction
+ **/
+
+contract CurrencyNetworkFactory {
+
+    event CurrencyNetworkDeployment(address currencyNetworkAddress, address deployer, bytes32 salt);
+
+    /**
+     * @notice Deploys a currency network by executing `initcode` and initializes it with `initData`
+     * @dev The network is deployed via create2 with keccak256(msg.sender, salt) as salt,
+     * so that the address only depends on the deployer, `salt` and `initcode`
+     * and can not be taken by somebody else.
+     * @param initcode The initcode of the currency network
+     * @param salt The salt chosen by the deployer
+     * @param initData The abi encoded call to `init` of the currency network
+     **/
+    function deployCurrencyNetwork(bytes memory initcode, bytes32 salt, bytes memory initData) public {
+        bytes32 create2Salt = keccak256(abi.encodePacked(msg.sender, salt));
+
+        address currencyNetworkAddress;
+        assembly {
+            currencyNetworkAddress := create2(0, add(initcode, 0x20), mload(initcode), create2Salt)
+            if iszero(extcodesize(currencyNetworkAddress)) {
+                revert(0, 0)
+            }
+        }
+
+        // solium-disable-next-line security/no-low-level-calls
+        (bool success, ) = currencyNetworkAddress.call(initData);
+        require(success, "Initialization of the currency network failed.");
+
+        emit CurrencyNetworkDeployment(currencyNetworkAddress, msg.sender, salt);
+    }
+}
@@ -0,0 +1,18 @@
+pragma solidity ^0.5.8;
+
+import "../identity/Proxy.sol";
+
+
+/**
+ * @title Proxy for a currency network forwarding all calls to a shared implementation
+ * @dev The implementation is set in the constructor, so that it can not be set by anybody else.
+ * The implementation has to be a ProxiedCurrencyNetwork, so that its storage layout starts with the one of the proxy.
+ * The network still has to be initialized by calling `init` through the proxy.
+ **/
+contract CurrencyNetworkProxy is Proxy {
+
+    constructor(address _implementation) Proxy(msg.sender) public {
+        implementation = _implementation;
+        emit ImplementationChange(_implementation);
+    }
+}
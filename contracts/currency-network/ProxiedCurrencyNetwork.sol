@@ -0,0 +1,16 @@
+pragma solidity ^0.5.8;
+
+import "../identity/ProxyStorage.sol";
+import "./CurrencyNetwork.sol";
+
+
+/**
+ * ProxiedCurrencyNetwork
+ *
+ * Currency network to be used as implementation of a CurrencyNetworkProxy.
+ * Inherits ProxyStorage first, so that the implementation slot of the proxy is not overwritten.
+ *
+ **/
+contract ProxiedCurrencyNetwork is ProxyStorage, CurrencyNetwork {
+    // solium-disable-previous-line no-empty-blocks
+}
@@ -1,7 +1,7 @@
 pragma solidity ^0.5.8;
 
 
-// Contract used to synchronize storage layout between Identity.sol and Proxy.sol
+// Contract used to synchronize storage layout between Identity.sol / ProxiedCurrencyNetwork.sol and Proxy.sol
 // Required since we use delegateCall in IdentityProxy to call the implementation of Identity
 contract ProxyStorage {
 
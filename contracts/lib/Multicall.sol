@@ -0,0 +1,34 @@
+pragma solidity ^0.5.8;
+pragma experimental ABIEncoderV2;
+
+
+/**
+ * @title Multicall
+ * @notice Bundles view calls to other contracts, so that they can be done with
+ * a single eth_call
+ */
+contract Multicall {
+
+    /**
+     * @notice Calls every target with the corresponding calldata
+     * @param _targets The addresses of the contracts to call
+     * @param _data The calldata for every target
+     * @return Whether every call succeeded and the data it returned
+     **/
+    function tryAggregate(
+        address[] memory _targets,
+        bytes[] memory _data
+    )
+        public
+        view
+        returns (bool[] memory successes, bytes[] memory results)
+    {
+        require(_targets.length == _data.length, "Every target needs calldata.");
+
+        successes = new bool[](_targets.length);
+        results = new bytes[](_targets.length);
+        for (uint i = 0; i < _targets.length; i++) {
+            (successes[i], results[i]) = _targets[i].staticcall(_data[i]);
+        }
+    }
+}
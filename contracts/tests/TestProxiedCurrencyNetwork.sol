@@ -0,0 +1,15 @@
+pragma solidity ^0.5.8;
+
+/*
+  The sole purpose of this file is to be able to test proxied currency
+  networks with the test functions of the TestCurrencyNetwork
+*/
+
+
+import "../identity/ProxyStorage.sol";
+import "./TestCurrencyNetwork.sol";
+
+
+contract TestProxiedCurrencyNetwork is ProxyStorage, TestCurrencyNetwork {
+    // solium-disable-previous-line no-empty-blocks
+}
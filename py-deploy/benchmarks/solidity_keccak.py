@@ -0,0 +1,57 @@
+#! /usr/bin/env python3
+"""Compare the timings of `SolidityKeccakPacker` and `Web3.solidityKeccak`
+
+Run it with `python py-deploy/benchmarks/solidity_keccak.py`. The timings are
+only printed, they depend too much on the machine to be checked in the tests.
+"""
+import argparse
+import random
+import timeit
+
+from eth_utils import to_checksum_address
+from web3 import Web3
+
+from tldeploy.exchange import order_hash_packer
+from tldeploy.identity import meta_transaction_hash_packer
+
+PACKERS = {
+    "order hash": order_hash_packer,
+    "meta transaction hash": meta_transaction_hash_packer,
+}
+
+
+def random_value(abi_type, rng):
+    if abi_type == "address":
+        return to_checksum_address(rng.getrandbits(160).to_bytes(20, byteorder="big"))
+    if abi_type.startswith("uint"):
+        return rng.getrandbits(int(abi_type[len("uint") :]))
+    size = int(abi_type[len("bytes") :])
+    return rng.getrandbits(8 * size).to_bytes(size, byteorder="big")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--number", type=int, default=2000, help="number of hashes per timing"
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for name, packer in PACKERS.items():
+        abi_types = packer.abi_types
+        values = [random_value(abi_type, rng) for abi_type in abi_types]
+        assert packer(values) == Web3.solidityKeccak(abi_types, values)
+
+        web3_time = timeit.timeit(
+            lambda: Web3.solidityKeccak(abi_types, values), number=args.number
+        )
+        packer_time = timeit.timeit(lambda: packer(values), number=args.number)
+        print(
+            f"{name}: solidityKeccak {web3_time:.4f}s, "
+            f"SolidityKeccakPacker {packer_time:.4f}s, "
+            f"speedup {web3_time / packer_time:.1f}x ({args.number} hashes)"
+        )
+
+
+if __name__ == "__main__":
+    main()
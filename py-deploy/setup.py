@@ -49,10 +49,12 @@ setup(
         "click>=7.0",
         "trustlines-contracts-bin>=1.1.1,<2.0.0",
         "contract-deploy-tools>=0.6.1",
-        "attrs>=18.2",
+        "attrs>=19.2",
         "pendulum>=2.0.0",
+        "importlib-metadata; python_version<'3.8'",
         "setuptools",
     ],
+    extras_require={"coincurve": ["coincurve>=13.0.0"], "aiohttp": ["aiohttp>=3.5.4"]},
     python_requires=">=3.6",
     # To provide executable scripts, use entry points in preference to the
     # "scripts" keyword. Entry points provide cross-platform support and allow
@@ -0,0 +1,393 @@
+# Helpers to load the compiled contracts from contracts.json without having to
+# parse the whole file on every process start.
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+from typing import Dict, Iterator, Optional, Tuple
+
+from eth_utils import keccak
+
+INDEX_MAGIC = b"TLCINDEX1\n"
+INDEX_HEADER_LENGTH_SIZE = 8
+INDEX_SUFFIX = ".index"
+CACHE_SUFFIX = ".cache"
+CACHE_FORMAT_VERSION = 1
+SELECTORS_SUFFIX = ".selectors"
+USER_CACHE_DIR_NAME = "trustlines-contracts"
+
+
+def get_index_path(contracts_json_path: str) -> str:
+    return contracts_json_path + INDEX_SUFFIX
+
+
+def _source_stamp(path: str) -> Dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def get_user_cache_dir() -> str:
+    """Returns the directory for the index and cache of contracts.json files
+    in directories that are not writable, e.g. in site-packages"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, USER_CACHE_DIR_NAME)
+
+
+def get_user_cache_path(path: str) -> str:
+    """Returns the path in the user cache directory used instead of `path`"""
+    absolute_path = os.path.abspath(path)
+    path_hash = hashlib.sha256(absolute_path.encode()).hexdigest()[:16]
+    return os.path.join(
+        get_user_cache_dir(), "{}-{}".format(path_hash, os.path.basename(path))
+    )
+
+
+def _candidate_paths(path: str) -> Tuple[str, str]:
+    # files next to contracts.json take precedence, e.g. when they were built
+    # together with it
+    return path, get_user_cache_path(path)
+
+
+def _get_writable_path(path: str) -> Optional[str]:
+    """Returns `path` if its directory is writable, otherwise the path in the
+    user cache directory, or None if neither is writable"""
+    if os.access(os.path.dirname(os.path.abspath(path)), os.W_OK):
+        return path
+    user_cache_path = get_user_cache_path(path)
+    user_cache_dir = os.path.dirname(user_cache_path)
+    try:
+        os.makedirs(user_cache_dir, exist_ok=True)
+    except OSError:
+        return None
+    if os.access(user_cache_dir, os.W_OK):
+        return user_cache_path
+    return None
+
+
+def write_contracts_index(
+    contracts_json_path: str, index_path: str = None, *, contracts: Dict = None
+) -> str:
+    """Write an indexed copy of contracts.json to `index_path`
+
+    The index consists of a magic string, the length of a json encoded
+    header, the header with the offset table and then one json blob per
+    contract. This allows to decode a single contract without parsing the
+    interfaces of all the others.
+    If `contracts` is given, it has to be the already decoded content of
+    `contracts_json_path`.
+    Returns the path of the written index.
+    """
+    if index_path is None:
+        index_path = get_index_path(contracts_json_path)
+    if contracts is None:
+        with open(contracts_json_path, "rb") as f:
+            contracts = json.load(f)
+
+    entries = {}
+    blobs = []
+    offset = 0
+    for name, interface in contracts.items():
+        blob = json.dumps(interface, separators=(",", ":")).encode()
+        entries[name] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps(
+        {"source": _source_stamp(contracts_json_path), "entries": entries}
+    ).encode()
+
+    # write to a temporary file first, so that concurrent readers never see a
+    # partially written index
+    tmp_path = "{}.{}.tmp".format(index_path, os.getpid())
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(INDEX_MAGIC)
+            f.write(len(header).to_bytes(INDEX_HEADER_LENGTH_SIZE, byteorder="big"))
+            f.write(header)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, index_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return index_path
+
+
+class ContractsIndex:
+    """Read-only view on an index written by `write_contracts_index`
+
+    The file is memory mapped and each contract interface is only decoded when
+    it is accessed for the first time.
+    """
+
+    def __init__(self, index_path: str):
+        with open(index_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic_end = len(INDEX_MAGIC)
+        if self._mmap[:magic_end] != INDEX_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{index_path} is not a contracts index.")
+        header_start = magic_end + INDEX_HEADER_LENGTH_SIZE
+        header_length = int.from_bytes(
+            self._mmap[magic_end:header_start], byteorder="big"
+        )
+        header = json.loads(self._mmap[header_start : header_start + header_length])
+
+        self.source = header["source"]
+        self._entries = header["entries"]
+        self._data_start = header_start + header_length
+        self._decoded: Dict[str, Dict] = {}
+
+    def is_fresh_for(self, contracts_json_path: str) -> bool:
+        """Returns whether the index was built from the current content of
+        `contracts_json_path`"""
+        try:
+            return _source_stamp(contracts_json_path) == self.source
+        except FileNotFoundError:
+            return False
+
+    def __contains__(self, name) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, name: str) -> Dict:
+        interface = self._decoded.get(name)
+        if interface is None:
+            offset, length = self._entries[name]
+            start = self._data_start + offset
+            interface = json.loads(self._mmap[start : start + length])
+            self._decoded[name] = interface
+        return interface
+
+
+def _open_contracts_index(
+    contracts_json_path: str
+) -> Tuple[Optional[ContractsIndex], bool]:
+    """Returns the index and whether an existing index could be used"""
+    for index_path in _candidate_paths(get_index_path(contracts_json_path)):
+        try:
+            index = ContractsIndex(index_path)
+        except (OSError, ValueError):
+            continue
+        if index.is_fresh_for(contracts_json_path):
+            return index, True
+
+    # check before parsing contracts.json, so that it is not parsed twice if
+    # the index cannot be written
+    writable_index_path = _get_writable_path(get_index_path(contracts_json_path))
+    if writable_index_path is None:
+        return None, False
+    try:
+        write_contracts_index(contracts_json_path, writable_index_path)
+        return ContractsIndex(writable_index_path), False
+    except (OSError, ValueError):
+        return None, False
+
+
+def open_contracts_index(contracts_json_path: str) -> Optional[ContractsIndex]:
+    """Open the index belonging to `contracts_json_path`
+
+    The index is (re)built if it is missing or stale. If the directory of
+    `contracts_json_path` is not writable, the index is kept in the user cache
+    directory instead, see `get_user_cache_dir`. Returns None if there is no
+    usable index.
+    """
+    index, _ = _open_contracts_index(contracts_json_path)
+    return index
+
+
+def get_cache_path(contracts_json_path: str) -> str:
+    return contracts_json_path + CACHE_SUFFIX
+
+
+def _content_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class ContractsCache:
+    """Pickled cache of the decoded contracts.json
+
+    The cache is stored next to contracts.json, or in the user cache
+    directory if that is not writable, and keyed by the size,
+    modification time and content hash of the json file. If size and
+    modification time are unchanged, the cache is used without reading the
+    json file. Otherwise the content hash decides whether the cache is still
+    valid, so that e.g. a reinstall of the same contracts does not invalidate
+    it.
+    The number of cache hits and misses is counted in `hits` and `misses`,
+    including the indexes opened with `open_index`.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, contracts_json_path: str) -> Dict:
+        stamp = _source_stamp(contracts_json_path)
+        content_hash = None
+
+        for cache_path in _candidate_paths(get_cache_path(contracts_json_path)):
+            key, contracts = self._read(cache_path)
+            if key is None:
+                continue
+            if {"size": key["size"], "mtime_ns": key["mtime_ns"]} == stamp:
+                self.hits += 1
+                return contracts
+            if key["size"] == stamp["size"]:
+                if content_hash is None:
+                    content_hash = _content_hash(contracts_json_path)
+                if key["sha256"] == content_hash:
+                    self.hits += 1
+                    key = dict(stamp, sha256=content_hash)
+                    self._write(contracts_json_path, key, contracts)
+                    return contracts
+
+        self.misses += 1
+        with open(contracts_json_path, "rb") as f:
+            content = f.read()
+        contracts = json.loads(content)
+        key = dict(stamp, sha256=hashlib.sha256(content).hexdigest())
+        self._write(contracts_json_path, key, contracts)
+        return contracts
+
+    def open_index(self, contracts_json_path: str) -> Optional[ContractsIndex]:
+        """Same as `open_contracts_index`, counts an up to date index as hit and
+        a missing or stale one as miss"""
+        index, is_hit = _open_contracts_index(contracts_json_path)
+        if is_hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return index
+
+    @staticmethod
+    def _read(cache_path: str):
+        # The cache lives next to contracts.json or in the cache directory of
+        # the user, so it is as trustworthy as the contracts or the user's own
+        # files
+        try:
+            with open(cache_path, "rb") as f:
+                version, key = pickle.load(f)
+                if version != CACHE_FORMAT_VERSION:
+                    return None, None
+                return key, pickle.load(f)
+        except Exception:
+            # missing or corrupt cache
+            return None, None
+
+    @staticmethod
+    def _write(contracts_json_path: str, key: Dict, contracts: Dict):
+        cache_path = _get_writable_path(get_cache_path(contracts_json_path))
+        if cache_path is None:
+            return
+        tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump((CACHE_FORMAT_VERSION, key), f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(contracts, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            # the cache is optional, e.g. the directory might not be writable
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def canonical_type(abi_input: Dict) -> str:
+    """Returns the abi type of `abi_input` with tuples spelled out, e.g.
+    `(address,uint256)[]`"""
+    abi_type = abi_input["type"]
+    if abi_type.startswith("tuple"):
+        components = ",".join(
+            canonical_type(component) for component in abi_input["components"]
+        )
+        return "({}){}".format(components, abi_type[len("tuple") :])
+    return abi_type
+
+
+def abi_signature(abi_entry: Dict) -> str:
+    """Returns the canonical signature of a function or event abi entry,
+    e.g. `transfer(uint64,uint64,address[],bytes)`"""
+    return "{}({})".format(
+        abi_entry["name"],
+        ",".join(canonical_type(abi_input) for abi_input in abi_entry["inputs"]),
+    )
+
+
+def build_selector_table(contracts: Dict) -> Dict[str, Dict[str, Dict[str, str]]]:
+    """Compute the function selectors and event topics of all contracts
+
+    Returns a mapping from contract name to a dict with the keys `functions`
+    and `events`, each mapping the canonical signature to the hex encoded
+    selector or topic.
+    """
+    hashes: Dict[str, bytes] = {}
+
+    def hash_signature(signature):
+        if signature not in hashes:
+            hashes[signature] = keccak(text=signature)
+        return hashes[signature]
+
+    table = {}
+    for name, interface in contracts.items():
+        functions = {}
+        events = {}
+        for abi_entry in interface["abi"]:
+            if abi_entry["type"] == "function":
+                signature = abi_signature(abi_entry)
+                functions[signature] = "0x" + hash_signature(signature)[:4].hex()
+            elif abi_entry["type"] == "event":
+                signature = abi_signature(abi_entry)
+                events[signature] = "0x" + hash_signature(signature).hex()
+        table[name] = {"functions": functions, "events": events}
+    return table
+
+
+def get_selectors_path(contracts_json_path: str) -> str:
+    return contracts_json_path + SELECTORS_SUFFIX
+
+
+def load_selector_table(contracts_json_path: str) -> Dict:
+    """Returns the selector table of the contracts in `contracts_json_path`
+
+    The table is stored next to contracts.json and rebuilt if it is missing or
+    stale.
+    """
+    selectors_path = get_selectors_path(contracts_json_path)
+    stamp = _source_stamp(contracts_json_path)
+    try:
+        with open(selectors_path, "rb") as f:
+            cached = json.load(f)
+        if cached["source"] == stamp:
+            return cached["contracts"]
+    except Exception:
+        # missing or corrupt table
+        pass
+
+    with open(contracts_json_path, "rb") as f:
+        table = build_selector_table(json.load(f))
+
+    tmp_path = "{}.{}.tmp".format(selectors_path, os.getpid())
+    try:
+        with open(tmp_path, "w") as tmp_file:
+            json.dump({"source": stamp, "contracts": table}, tmp_file)
+        os.replace(tmp_path, selectors_path)
+    except OSError:
+        pass
+    return table
@@ -0,0 +1,346 @@
+import abc
+import asyncio
+import itertools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, List, MutableMapping, Optional, Union
+
+from eth_abi import encode_abi
+from eth_utils import keccak
+from hexbytes import HexBytes
+from web3 import Web3
+
+from tldeploy.artifacts import abi_signature, canonical_type
+from tldeploy.identity import (
+    MAX_GAS,
+    TRANSACTION_EXECUTION_TOPIC,
+    LastNonceFunctionNotFound,
+    MetaTransaction,
+    MetaTransactionStatus,
+    ValidateNonceNotFound,
+    ValidateSignatureNotFound,
+    ValidateTimeLimitNotFound,
+)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    _get_running_loop = asyncio.get_running_loop
+except AttributeError:
+    # python 3.6, where get_event_loop returns the running loop in coroutines
+    _get_running_loop = asyncio.get_event_loop
+
+# transaction options that are sent as hex encoded quantities
+QUANTITY_TRANSACTION_OPTIONS = ["gas", "gasPrice", "value", "nonce"]
+
+
+class JsonRpcError(Exception):
+    """An error response of a JSON-RPC request"""
+
+    def __init__(self, error: Dict):
+        super().__init__(error.get("message", error))
+        self.code = error.get("code")
+        self.error = error
+
+
+class AsyncJsonRpcClient(abc.ABC):
+    """Sends JSON-RPC requests to an ethereum node without blocking"""
+
+    @abc.abstractmethod
+    async def request(self, method: str, params: List) -> Any:
+        pass
+
+    async def close(self) -> None:
+        """Releases the resources of the client, e.g. connections"""
+
+
+class HttpJsonRpcClient(AsyncJsonRpcClient):
+    """Sends JSON-RPC requests over HTTP with aiohttp
+
+    Requests share the connections of one aiohttp session, which is created
+    on the first request if none is given and closed with `close`.
+    """
+
+    def __init__(self, endpoint_uri: str, *, session=None):
+        if aiohttp is None:
+            raise RuntimeError(
+                "The HttpJsonRpcClient needs aiohttp, install tldeploy[aiohttp]."
+            )
+        self.endpoint_uri = endpoint_uri
+        self._session = session
+        self._request_ids = itertools.count()
+
+    async def request(self, method: str, params: List) -> Any:
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        payload = {
+            "jsonrpc": "2.0",
+            "id": next(self._request_ids),
+            "method": method,
+            "params": params,
+        }
+        async with self._session.post(self.endpoint_uri, json=payload) as response:
+            response.raise_for_status()
+            content = await response.json()
+        if "error" in content:
+            raise JsonRpcError(content["error"])
+        return content["result"]
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class Web3JsonRpcClient(AsyncJsonRpcClient):
+    """Sends the requests with a synchronous web3 instance in an executor
+
+    This allows to use providers without async support, for example
+    eth-tester. Per default, the requests are sent one after the other by a
+    single thread, as not all providers are thread safe. That thread is shut
+    down with `close`, a given executor is left to the caller.
+    """
+
+    def __init__(self, web3: Web3, *, executor: Executor = None):
+        self._web3 = web3
+        self._owns_executor = executor is None
+        self._executor = (
+            executor if executor is not None else ThreadPoolExecutor(max_workers=1)
+        )
+
+    async def request(self, method: str, params: List) -> Any:
+        loop = _get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._web3.manager.request_blocking, method, params
+        )
+
+    async def close(self) -> None:
+        if self._owns_executor:
+            self._executor.shutdown()
+
+
+def _to_int(value: Union[int, str]) -> int:
+    if isinstance(value, int):
+        return value
+    return int(value, 16)
+
+
+class _FunctionEncoder:
+    """Encodes the transaction data of calls to one contract function"""
+
+    def __init__(self, abi_entry: Dict):
+        self.abi_types = [
+            canonical_type(abi_input) for abi_input in abi_entry["inputs"]
+        ]
+        self.selector = keccak(text=abi_signature(abi_entry))[:4]
+
+    def encode(self, args: List) -> str:
+        # eth-abi only accepts bytes, web3 also hex strings
+        args = [
+            HexBytes(arg) if abi_type.startswith("bytes") else arg
+            for abi_type, arg in zip(self.abi_types, args)
+        ]
+        return HexBytes(self.selector + encode_abi(self.abi_types, args)).hex()
+
+
+def _decode_uint(result, not_found_exception) -> int:
+    result = HexBytes(result)
+    if len(result) != 32:
+        raise not_found_exception
+    return int.from_bytes(result, byteorder="big")
+
+
+class AsyncDelegate:
+    """Asyncio version of `tldeploy.identity.Delegate`
+
+    All requests to the node are sent with `client`, the calls to identity
+    contracts are encoded with eth-abi.
+    """
+
+    def __init__(
+        self,
+        delegate_address: str,
+        *,
+        client: AsyncJsonRpcClient,
+        identity_contract_abi,
+        default_gas=MAX_GAS,
+        chain_id: int = None,
+    ):
+        self.delegate_address = delegate_address
+        self.client = client
+        self.default_gas = default_gas
+        self._identity_function_encoders = {
+            abi_entry["name"]: _FunctionEncoder(abi_entry)
+            for abi_entry in identity_contract_abi
+            if abi_entry["type"] == "function"
+        }
+        self._chain_id = chain_id
+
+    async def get_chain_id(self) -> int:
+        """Returns the chain id of the node, which is fetched only once"""
+        if self._chain_id is None:
+            self._chain_id = _to_int(await self.client.request("eth_chainId", []))
+        return self._chain_id
+
+    async def estimate_gas_signed_meta_transaction(
+        self, signed_meta_transaction: MetaTransaction
+    ) -> int:
+        transaction = self._meta_transaction_transaction(signed_meta_transaction)
+        transaction["from"] = self.delegate_address
+        return _to_int(await self.client.request("eth_estimateGas", [transaction]))
+
+    async def send_signed_meta_transaction(
+        self,
+        signed_meta_transaction: MetaTransaction,
+        *,
+        transaction_options: MutableMapping[str, Any] = None,
+    ) -> str:
+        """Sends the meta transaction out inside of an ethereum transaction
+        and returns the hash of the ethereum transaction, see
+        `Delegate.send_signed_meta_transaction`"""
+        if transaction_options is None:
+            transaction_options = {}
+
+        if "from" not in transaction_options:
+            transaction_options["from"] = self.delegate_address
+
+        if "gas" not in transaction_options and self.default_gas is not None:
+            transaction_options["gas"] = self.default_gas
+
+        transaction = self._meta_transaction_transaction(signed_meta_transaction)
+        for key, value in transaction_options.items():
+            if key in QUANTITY_TRANSACTION_OPTIONS:
+                value = hex(value)
+            transaction[key] = value
+        tx_hash = await self.client.request("eth_sendTransaction", [transaction])
+        return HexBytes(tx_hash).hex()
+
+    async def validate_meta_transaction(
+        self, signed_meta_transaction: MetaTransaction
+    ) -> bool:
+        """Validates the fields of the meta transaction against the state of
+        the identity contract, see `Delegate.validate_meta_transaction`.
+
+        The checks are done concurrently.
+        Will raise UnexpectedIdentityContractException, if it could not find
+        a check in the contract.
+        """
+        results = await asyncio.gather(
+            self.validate_chain_id(signed_meta_transaction),
+            self.validate_nonce(signed_meta_transaction),
+            self.validate_signature(signed_meta_transaction),
+            self.validate_time_limit(signed_meta_transaction),
+        )
+        return all(results)
+
+    async def validate_nonce(self, signed_meta_transaction: MetaTransaction) -> bool:
+        return bool(
+            await self._call_identity(
+                signed_meta_transaction.from_,
+                "validateNonce",
+                [signed_meta_transaction.nonce, signed_meta_transaction.hash],
+                ValidateNonceNotFound,
+            )
+        )
+
+    async def validate_signature(
+        self, signed_meta_transaction: MetaTransaction
+    ) -> bool:
+        return bool(
+            await self._call_identity(
+                signed_meta_transaction.from_,
+                "validateSignature",
+                [signed_meta_transaction.hash, signed_meta_transaction.signature],
+                ValidateSignatureNotFound,
+            )
+        )
+
+    async def validate_time_limit(self, meta_transaction: MetaTransaction) -> bool:
+        return bool(
+            await self._call_identity(
+                meta_transaction.from_,
+                "validateTimeLimit",
+                [meta_transaction.time_limit],
+                ValidateTimeLimitNotFound,
+            )
+        )
+
+    async def validate_chain_id(self, meta_transaction: MetaTransaction) -> bool:
+        return meta_transaction.chain_id == await self.get_chain_id()
+
+    async def get_next_nonce(self, identity_address: str) -> int:
+        """Returns the next usable nonce.
+
+        Will raise UnexpectedIdentityContractException, if  it could not
+        find the necessary function in the contract.
+        """
+        last_nonce = await self._call_identity(
+            identity_address, "lastNonce", [], LastNonceFunctionNotFound
+        )
+        return last_nonce + 1
+
+    async def get_meta_transaction_status(
+        self, identity_address, hash, *, from_block=0, to_block="latest"
+    ) -> MetaTransactionStatus:
+        logs = await self.client.request(
+            "eth_getLogs",
+            [
+                {
+                    "address": identity_address,
+                    "fromBlock": hex(from_block)
+                    if isinstance(from_block, int)
+                    else from_block,
+                    "toBlock": hex(to_block) if isinstance(to_block, int) else to_block,
+                    "topics": [TRANSACTION_EXECUTION_TOPIC.hex(), HexBytes(hash).hex()],
+                }
+            ],
+        )
+        assert len(logs) <= 1
+        if len(logs) == 1:
+            # the status is the only not indexed argument of the event
+            if int.from_bytes(HexBytes(logs[0]["data"]), byteorder="big"):
+                return MetaTransactionStatus.SUCCESS
+            else:
+                return MetaTransactionStatus.FAILURE
+        return MetaTransactionStatus.NOT_FOUND
+
+    async def _call_identity(
+        self,
+        identity_address: Optional[str],
+        fn_name: str,
+        args: List,
+        not_found_exception,
+    ) -> int:
+        if identity_address is None:
+            raise ValueError("From has to be set")
+        data = self._identity_function_encoders[fn_name].encode(args)
+        result = await self.client.request(
+            "eth_call", [{"to": identity_address, "data": data}, "latest"]
+        )
+        return _decode_uint(result, not_found_exception)
+
+    def _meta_transaction_transaction(
+        self, signed_meta_transaction: MetaTransaction
+    ) -> Dict[str, Any]:
+        from_ = signed_meta_transaction.from_
+        if from_ is None:
+            raise ValueError("From has to be set")
+        data = self._identity_function_encoders["executeTransaction"].encode(
+            [
+                signed_meta_transaction.to,
+                signed_meta_transaction.value,
+                signed_meta_transaction.data,
+                signed_meta_transaction.base_fee,
+                signed_meta_transaction.gas_price,
+                signed_meta_transaction.gas_limit,
+                signed_meta_transaction.fee_recipient,
+                signed_meta_transaction.currency_network_of_fees,
+                signed_meta_transaction.nonce,
+                signed_meta_transaction.time_limit,
+                signed_meta_transaction.operation_type.value,
+                signed_meta_transaction.signature,
+            ]
+        )
+        return {"to": from_, "data": data}
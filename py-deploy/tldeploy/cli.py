@@ -1,39 +1,70 @@
+# The imports of web3, deploy_tools and pendulum are expensive. To keep
+# `tl-deploy --help` and `tl-deploy --version` fast, they are only imported
+# inside the commands that need them.
 import json
+from typing import TYPE_CHECKING
 
 import click
-import pkg_resources
-from deploy_tools.cli import (
-    auto_nonce_option,
-    connect_to_json_rpc,
-    gas_option,
-    gas_price_option,
-    get_nonce,
-    jsonrpc_option,
-    keystore_option,
-    nonce_option,
-    retrieve_private_key,
-)
-from deploy_tools.deploy import build_transaction_options
-from eth_utils import is_checksum_address, to_checksum_address
 
-import pendulum
-from tldeploy.identity import (
-    deploy_identity_implementation,
-    deploy_identity_proxy_factory,
-)
+if TYPE_CHECKING:
+    import pendulum  # noqa: F401
+
+
+# options of deploy_tools.cli used by all commands to send transactions
+TRANSACTION_OPTIONS = [
+    "jsonrpc_option",
+    "gas_option",
+    "gas_price_option",
+    "nonce_option",
+    "auto_nonce_option",
+    "keystore_option",
+]
+
+
+class TransactionCommand(click.Command):
+    """Command with the options of deploy_tools.cli to send transactions
+
+    Importing deploy_tools.cli imports web3, so the options are only added
+    once the parameters of the command are needed, which is not the case when
+    listing the commands with `tl-deploy --help`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._has_transaction_options = False
+
+    def get_params(self, ctx):
+        if not self._has_transaction_options:
+            import deploy_tools.cli
+
+            for option_name in TRANSACTION_OPTIONS:
+                getattr(deploy_tools.cli, option_name)(self)
+            self._has_transaction_options = True
+        return super().get_params(ctx)
+
+
+def get_distribution_version(dist):
+    try:
+        from importlib import metadata
+    except ImportError:
+        # python < 3.8
+        import importlib_metadata as metadata  # type: ignore
 
-from .core import deploy_exchange, deploy_network, deploy_networks, deploy_unw_eth
+    return metadata.version(dist)
 
 
 def report_version():
     for dist in ["trustlines-contracts-deploy", "trustlines-contracts-bin"]:
-        msg = "{} {}".format(dist, pkg_resources.get_distribution(dist).version)
+        msg = "{} {}".format(dist, get_distribution_version(dist))
         click.echo(msg)
 
 
 def validate_date(ctx, param, value):
     if value is None:
         return None
+
+    import pendulum
+
     try:
         return pendulum.parse(value)
     except pendulum.parsing.exceptions.ParserError as e:
@@ -42,11 +73,56 @@ def validate_date(ctx, param, value):
         ) from e
 
 
+def connect_and_build_transaction_options(
+    *, jsonrpc, keystore, gas, gas_price, nonce, auto_nonce
+):
+    """Returns web3, private key and transaction options for the given command
+    line options"""
+    from deploy_tools.cli import connect_to_json_rpc, get_nonce, retrieve_private_key
+    from deploy_tools.deploy import build_transaction_options
+
+    web3 = connect_to_json_rpc(jsonrpc)
+    private_key = retrieve_private_key(keystore)
+    nonce = get_nonce(
+        web3=web3, nonce=nonce, auto_nonce=auto_nonce, private_key=private_key
+    )
+    transaction_options = build_transaction_options(
+        gas=gas, gas_price=gas_price, nonce=nonce
+    )
+    return web3, private_key, transaction_options
+
+
+def report_gas_estimates():
+    from tldeploy.core import gas_estimate_cache, get_selector_table
+    from tldeploy.gas import CONSTRUCTOR
+
+    selector_table = get_selector_table()
+    click.echo("Gas estimates:")
+    for contract_name, gas_limits in sorted(gas_estimate_cache.gas_limits().items()):
+        functions = selector_table[contract_name]["functions"]
+        signatures = {selector: signature for signature, selector in functions.items()}
+        for selector, gas_limit in sorted(gas_limits.items()):
+            if selector == CONSTRUCTOR:
+                function = CONSTRUCTOR
+            else:
+                function = signatures.get(selector, selector)
+            click.echo(f"{contract_name} {function}: {gas_limit}")
+    for gas_price in gas_estimate_cache.gas_prices().values():
+        click.echo(f"Gas price: {gas_price}")
+
+
 @click.group(invoke_without_command=True)
 @click.option("--version", help="Prints the version of the software", is_flag=True)
+@click.option(
+    "--print-gas-estimates",
+    help="Print the cached gas estimates used by the command after it finished",
+    is_flag=True,
+)
 @click.pass_context
-def cli(ctx, version):
+def cli(ctx, version, print_gas_estimates):
     """Commandline tool to deploy the Trustlines contracts"""
+    if print_gas_estimates:
+        ctx.call_on_close(report_gas_estimates)
     if version:
         report_version()
     elif ctx.invoked_subcommand is None:
@@ -57,12 +133,12 @@ def cli(ctx, version):
 currency_network_contract_name_option = click.option(
     "--currency-network-contract-name",
     help="name of the currency network contract to deploy (only use this for testing)",
-    default="CurrencyNetwork",
+    default=None,
     hidden=True,
 )
 
 
-@cli.command(short_help="Deploy a currency network contract.")
+@cli.command(cls=TransactionCommand, short_help="Deploy a currency network contract.")
 @click.argument("name", type=str)
 @click.argument("symbol", type=str)
 @click.option(
@@ -100,6 +176,33 @@ currency_network_contract_name_option = click.option(
     metavar="ADDRESS",
     show_default=True,
 )
+@click.option(
+    "--factory-contract",
+    help=(
+        "Address of a currency network factory to deploy and initialize the network "
+        "in one transaction at a precomputable address. [Optional] [default: None]"
+    ),
+    default=None,
+    type=str,
+    metavar="ADDRESS",
+)
+@click.option(
+    "--implementation-contract",
+    help=(
+        "Address of a deployed currency network to use as implementation. Only a small "
+        "proxy forwarding to it will be deployed. [Optional] [default: None]"
+    ),
+    default=None,
+    type=str,
+    metavar="ADDRESS",
+)
+@click.option(
+    "--salt",
+    help="Salt used to compute the network address when using a factory",
+    default=0,
+    type=int,
+    show_default=True,
+)
 @currency_network_contract_name_option
 @click.option(
     "--expiration-time",
@@ -122,12 +225,6 @@ currency_network_contract_name_option = click.option(
     metavar="DATE",
     callback=validate_date,
 )
-@jsonrpc_option
-@gas_option
-@gas_price_option
-@nonce_option
-@auto_nonce_option
-@keystore_option
 def currencynetwork(
     name: str,
     symbol: str,
@@ -138,9 +235,12 @@ def currencynetwork(
     custom_interests: bool,
     prevent_mediator_interests: bool,
     exchange_contract: str,
+    factory_contract: str,
+    implementation_contract: str,
+    salt: int,
     currency_network_contract_name: str,
     expiration_time: int,
-    expiration_date: pendulum.DateTime,
+    expiration_date: "pendulum.DateTime",
     gas: int,
     gas_price: int,
     nonce: int,
@@ -148,9 +248,30 @@ def currencynetwork(
     keystore: str,
 ):
     """Deploy a currency network contract with custom settings and optionally connect it to an exchange contract"""
+    from eth_utils import is_checksum_address, to_checksum_address
+
+    from tldeploy.core import (
+        deploy_network,
+        deploy_network_with_factory,
+        deploy_proxied_network,
+    )
+
     if exchange_contract is not None and not is_checksum_address(exchange_contract):
         raise click.BadParameter("{} is not a valid address.".format(exchange_contract))
 
+    if factory_contract is not None and not is_checksum_address(factory_contract):
+        raise click.BadParameter("{} is not a valid address.".format(factory_contract))
+
+    if implementation_contract is not None:
+        if not is_checksum_address(implementation_contract):
+            raise click.BadParameter(
+                "{} is not a valid address.".format(implementation_contract)
+            )
+        if factory_contract is not None:
+            raise click.BadParameter(
+                "Both --factory-contract and --implementation-contract have been specified."
+            )
+
     if custom_interests and default_interest_rate != 0.0:
         raise click.BadParameter(
             "Custom interests can only be set without a"
@@ -183,20 +304,16 @@ def currencynetwork(
         raise click.BadParameter("This default interest rate is not usable")
     default_interest_rate = int(default_interest_rate)
 
-    web3 = connect_to_json_rpc(jsonrpc)
-    private_key = retrieve_private_key(keystore)
-    nonce = get_nonce(
-        web3=web3, nonce=nonce, auto_nonce=auto_nonce, private_key=private_key
-    )
-    transaction_options = build_transaction_options(
-        gas=gas, gas_price=gas_price, nonce=nonce
+    web3, private_key, transaction_options = connect_and_build_transaction_options(
+        jsonrpc=jsonrpc,
+        keystore=keystore,
+        gas=gas,
+        gas_price=gas_price,
+        nonce=nonce,
+        auto_nonce=auto_nonce,
     )
 
-    contract = deploy_network(
-        web3,
-        name,
-        symbol,
-        decimals,
+    network_settings = dict(
         fee_divisor=fee_divisor,
         default_interest_rate=default_interest_rate,
         custom_interests=custom_interests,
@@ -207,6 +324,22 @@ def currencynetwork(
         transaction_options=transaction_options,
         private_key=private_key,
     )
+    if implementation_contract is not None:
+        contract = deploy_proxied_network(
+            web3, implementation_contract, name, symbol, decimals, **network_settings
+        )
+    elif factory_contract is None:
+        contract = deploy_network(web3, name, symbol, decimals, **network_settings)
+    else:
+        contract = deploy_network_with_factory(
+            web3,
+            factory_contract,
+            name,
+            symbol,
+            decimals,
+            salt=salt,
+            **network_settings,
+        )
 
     click.echo(
         "CurrencyNetwork(name={name}, symbol={symbol}, "
@@ -228,26 +361,94 @@ def currencynetwork(
     )
 
 
-@cli.command(short_help="Deploy an exchange contract.")
-@jsonrpc_option
-@gas_option
-@gas_price_option
-@nonce_option
-@auto_nonce_option
-@keystore_option
+@cli.command(cls=TransactionCommand, short_help="Deploy a currency network factory.")
+def currency_network_factory(
+    jsonrpc: str, gas: int, gas_price: int, nonce: int, auto_nonce: bool, keystore: str
+):
+    """Deploy a currency network factory, which can be used to deploy and initialize
+    currency networks in one transaction at a precomputable address.
+    """
+    from eth_utils import to_checksum_address
+
+    from tldeploy.core import deploy_currency_network_factory
+
+    web3, private_key, transaction_options = connect_and_build_transaction_options(
+        jsonrpc=jsonrpc,
+        keystore=keystore,
+        gas=gas,
+        gas_price=gas_price,
+        nonce=nonce,
+        auto_nonce=auto_nonce,
+    )
+    currency_network_factory = deploy_currency_network_factory(
+        web3=web3, transaction_options=transaction_options, private_key=private_key
+    )
+    click.echo(
+        "Currency network factory: {}".format(
+            to_checksum_address(currency_network_factory.address)
+        )
+    )
+
+
+@cli.command(
+    cls=TransactionCommand, short_help="Deploy a currency network implementation."
+)
+@currency_network_contract_name_option
+def currency_network_implementation(
+    currency_network_contract_name: str,
+    jsonrpc: str,
+    gas: int,
+    gas_price: int,
+    nonce: int,
+    auto_nonce: bool,
+    keystore: str,
+):
+    """Deploy a currency network without initializing it. It can be used with
+    `currencynetwork --implementation-contract` to deploy cheap proxied networks.
+    """
+    from eth_utils import to_checksum_address
+
+    from tldeploy.core import deploy_currency_network_implementation
+
+    web3, private_key, transaction_options = connect_and_build_transaction_options(
+        jsonrpc=jsonrpc,
+        keystore=keystore,
+        gas=gas,
+        gas_price=gas_price,
+        nonce=nonce,
+        auto_nonce=auto_nonce,
+    )
+    implementation = deploy_currency_network_implementation(
+        web3=web3,
+        currency_network_contract_name=currency_network_contract_name,
+        transaction_options=transaction_options,
+        private_key=private_key,
+    )
+    click.echo(
+        "Currency network implementation: {}".format(
+            to_checksum_address(implementation.address)
+        )
+    )
+
+
+@cli.command(cls=TransactionCommand, short_help="Deploy an exchange contract.")
 def exchange(
     jsonrpc: str, gas: int, gas_price: int, nonce: int, auto_nonce: bool, keystore: str
 ):
     """Deploy an exchange contract and a contract to wrap Ether into an ERC 20
   token.
     """
-    web3 = connect_to_json_rpc(jsonrpc)
-    private_key = retrieve_private_key(keystore)
-    nonce = get_nonce(
-        web3=web3, nonce=nonce, auto_nonce=auto_nonce, private_key=private_key
-    )
-    transaction_options = build_transaction_options(
-        gas=gas, gas_price=gas_price, nonce=nonce
+    from eth_utils import to_checksum_address
+
+    from tldeploy.core import deploy_exchange, deploy_unw_eth
+
+    web3, private_key, transaction_options = connect_and_build_transaction_options(
+        jsonrpc=jsonrpc,
+        keystore=keystore,
+        gas=gas,
+        gas_price=gas_price,
+        nonce=nonce,
+        auto_nonce=auto_nonce,
     )
     exchange_contract = deploy_exchange(
         web3=web3, transaction_options=transaction_options, private_key=private_key
@@ -264,26 +465,26 @@ def exchange(
     click.echo("Unwrapping ether: {}".format(to_checksum_address(unw_eth_address)))
 
 
-@cli.command(short_help="Deploy an identity implementation contract.")
-@jsonrpc_option
-@gas_option
-@gas_price_option
-@nonce_option
-@auto_nonce_option
-@keystore_option
+@cli.command(
+    cls=TransactionCommand, short_help="Deploy an identity implementation contract."
+)
 def identity_implementation(
     jsonrpc: str, gas: int, gas_price: int, nonce: int, auto_nonce: bool, keystore: str
 ):
     """Deploy an identity contract without initializing it. Can be used as the implementation for deployed
     identity proxies.
     """
-    web3 = connect_to_json_rpc(jsonrpc)
-    private_key = retrieve_private_key(keystore)
-    nonce = get_nonce(
-        web3=web3, nonce=nonce, auto_nonce=auto_nonce, private_key=private_key
-    )
-    transaction_options = build_transaction_options(
-        gas=gas, gas_price=gas_price, nonce=nonce
+    from eth_utils import to_checksum_address
+
+    from tldeploy.identity import deploy_identity_implementation
+
+    web3, private_key, transaction_options = connect_and_build_transaction_options(
+        jsonrpc=jsonrpc,
+        keystore=keystore,
+        gas=gas,
+        gas_price=gas_price,
+        nonce=nonce,
+        auto_nonce=auto_nonce,
     )
     identity_implementation = deploy_identity_implementation(
         web3=web3, transaction_options=transaction_options, private_key=private_key
@@ -295,26 +496,23 @@ def identity_implementation(
     )
 
 
-@cli.command(short_help="Deploy an identity proxy factory.")
-@jsonrpc_option
-@gas_option
-@gas_price_option
-@nonce_option
-@auto_nonce_option
-@keystore_option
+@cli.command(cls=TransactionCommand, short_help="Deploy an identity proxy factory.")
 def identity_proxy_factory(
     jsonrpc: str, gas: int, gas_price: int, nonce: int, auto_nonce: bool, keystore: str
 ):
     """Deploy an identity proxy factory, which can be used to create proxies for identity contracts.
     """
+    from eth_utils import to_checksum_address
 
-    web3 = connect_to_json_rpc(jsonrpc)
-    private_key = retrieve_private_key(keystore)
-    nonce = get_nonce(
-        web3=web3, nonce=nonce, auto_nonce=auto_nonce, private_key=private_key
-    )
-    transaction_options = build_transaction_options(
-        gas=gas, gas_price=gas_price, nonce=nonce
+    from tldeploy.identity import deploy_identity_proxy_factory
+
+    web3, private_key, transaction_options = connect_and_build_transaction_options(
+        jsonrpc=jsonrpc,
+        keystore=keystore,
+        gas=gas,
+        gas_price=gas_price,
+        nonce=nonce,
+        auto_nonce=auto_nonce,
     )
     identity_proxy_factory = deploy_identity_proxy_factory(
         web3=web3, transaction_options=transaction_options, private_key=private_key
@@ -326,20 +524,28 @@ def identity_proxy_factory(
     )
 
 
-@cli.command(short_help="Deploy contracts for testing.")
+@cli.command(cls=TransactionCommand, short_help="Deploy contracts for testing.")
 @click.option(
     "--file",
     help="Output file for the addresses in json",
     default="",
     type=click.Path(dir_okay=False, writable=True),
 )
-@jsonrpc_option
-@gas_option
-@gas_price_option
-@nonce_option
-@auto_nonce_option
-@keystore_option
 @currency_network_contract_name_option
+@click.option(
+    "--pipelined",
+    help="Send all transactions back to back and wait for them at the end",
+    is_flag=True,
+    default=False,
+)
+@click.option(
+    "--network-init-gas",
+    help="Gas limit of the init transactions of the currency networks with "
+    "--pipelined, which can not be estimated before the networks are deployed",
+    type=int,
+    default=500_000,
+    show_default=True,
+)
 def test(
     jsonrpc: str,
     file: str,
@@ -349,10 +555,19 @@ def test(
     auto_nonce: bool,
     keystore: str,
     currency_network_contract_name: str,
+    pipelined: bool,
+    network_init_gas: int,
 ):
     """Deploy three test currency network contracts connected to an exchange contract and an unwrapping ether contract.
     Also deploys an identity proxy factory and a identity implementation contract.
     This can be used for testing"""
+    from eth_utils import to_checksum_address
+
+    from tldeploy.core import deploy_networks
+    from tldeploy.identity import (
+        deploy_identity_implementation,
+        deploy_identity_proxy_factory,
+    )
 
     expiration_time = 4_102_444_800  # 01/01/2100
 
@@ -385,25 +600,48 @@ def test(
         },
     ]
 
-    web3 = connect_to_json_rpc(jsonrpc)
-    private_key = retrieve_private_key(keystore)
-    nonce = get_nonce(
-        web3=web3, nonce=nonce, auto_nonce=auto_nonce, private_key=private_key
-    )
-    transaction_options = build_transaction_options(
-        gas=gas, gas_price=gas_price, nonce=nonce
-    )
-    networks, exchange, unw_eth = deploy_networks(
-        web3,
-        network_settings,
-        currency_network_contract_name=currency_network_contract_name,
-    )
-    identity_implementation = deploy_identity_implementation(
-        web3=web3, transaction_options=transaction_options, private_key=private_key
-    )
-    identity_proxy_factory = deploy_identity_proxy_factory(
-        web3=web3, transaction_options=transaction_options, private_key=private_key
+    web3, private_key, transaction_options = connect_and_build_transaction_options(
+        jsonrpc=jsonrpc,
+        keystore=keystore,
+        gas=gas,
+        gas_price=gas_price,
+        nonce=nonce,
+        auto_nonce=auto_nonce,
     )
+    if pipelined:
+        from tldeploy.pipeline import (
+            TransactionPipeline,
+            pipeline_identity_implementation,
+            pipeline_identity_proxy_factory,
+            pipeline_networks,
+        )
+
+        pipeline = TransactionPipeline(
+            web3=web3, transaction_options=transaction_options, private_key=private_key
+        )
+        networks, exchange, unw_eth = pipeline_networks(
+            pipeline,
+            network_settings,
+            currency_network_contract_name,
+            init_gas=network_init_gas,
+        )
+        identity_implementation = pipeline_identity_implementation(pipeline)
+        identity_proxy_factory = pipeline_identity_proxy_factory(pipeline)
+        pipeline.wait()
+    else:
+        networks, exchange, unw_eth = deploy_networks(
+            web3,
+            network_settings,
+            currency_network_contract_name=currency_network_contract_name,
+            transaction_options=transaction_options,
+            private_key=private_key,
+        )
+        identity_implementation = deploy_identity_implementation(
+            web3=web3, transaction_options=transaction_options, private_key=private_key
+        )
+        identity_proxy_factory = deploy_identity_proxy_factory(
+            web3=web3, transaction_options=transaction_options, private_key=private_key
+        )
     addresses = dict()
     network_addresses = [network.address for network in networks]
     exchange_address = exchange.address
@@ -436,3 +674,84 @@ def test(
                 settings=settings, address=to_checksum_address(address)
             )
         )
+
+
+@cli.command(
+    cls=TransactionCommand, short_help="Deploy contracts described in a plan file."
+)
+@click.argument("plan_file", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--manifest",
+    help="File to store the progress of the deployment in, "
+    "used to resume an interrupted deployment [default: PLAN_FILE.progress.json]",
+    default=None,
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--file",
+    help="Output file for the addresses in json",
+    default="",
+    type=click.Path(dir_okay=False, writable=True),
+)
+def deploy_plan(
+    plan_file: str,
+    manifest: str,
+    file: str,
+    jsonrpc: str,
+    gas: int,
+    gas_price: int,
+    nonce: int,
+    auto_nonce: bool,
+    keystore: str,
+):
+    """Deploy the currency networks, exchange, unwrapping ether and identity contracts
+    described in the json file PLAN_FILE.
+
+    Transactions that do not depend on each other are sent together. If the
+    deployment is interrupted, running the same command again resumes it."""
+    from eth_utils import to_checksum_address
+
+    from tldeploy.plan import InvalidPlan, execute_plan, get_plan_addresses, load_plan
+
+    if manifest is None:
+        manifest = plan_file + ".progress.json"
+
+    try:
+        plan = load_plan(plan_file)
+    except InvalidPlan as e:
+        raise click.BadParameter(str(e)) from e
+
+    web3, private_key, transaction_options = connect_and_build_transaction_options(
+        jsonrpc=jsonrpc,
+        keystore=keystore,
+        gas=gas,
+        gas_price=gas_price,
+        nonce=nonce,
+        auto_nonce=auto_nonce,
+    )
+    try:
+        addresses = execute_plan(
+            plan,
+            web3=web3,
+            manifest_path=manifest,
+            transaction_options=transaction_options,
+            private_key=private_key,
+        )
+    except InvalidPlan as e:
+        raise click.ClickException(str(e)) from e
+
+    addresses = get_plan_addresses(plan, addresses)
+    if file:
+        with open(file, "w") as outfile:
+            json.dump(addresses, outfile)
+
+    for key, value in addresses.items():
+        if key == "networks":
+            continue
+        click.echo("{}: {}".format(key, to_checksum_address(value)))
+    for settings, address in zip(plan.get("networks", []), addresses["networks"]):
+        click.echo(
+            "CurrencyNetwork({settings}) at {address}".format(
+                settings=settings, address=to_checksum_address(address)
+            )
+        )
@@ -3,25 +3,37 @@
 # contracts when running tests in this project.
 
 import collections
-import json
+import functools
 import os
 import sys
-from typing import Dict
+import weakref
+from typing import Dict, MutableMapping
 
-from deploy_tools import deploy_compiled_contract
+from deploy_tools.compile import build_initcode
 from deploy_tools.deploy import (
     increase_transaction_options_nonce,
     send_function_call_transaction,
 )
+from eth_utils import to_checksum_address
 from web3 import Web3
 
+from tldeploy.artifacts import ContractsCache, build_selector_table, load_selector_table
+from tldeploy.gas import GasEstimateCache
 
-def load_contracts_json():
-    path = os.environ.get("TRUSTLINES_CONTRACTS_JSON") or os.path.join(
+
+def get_contracts_json_path():
+    return os.environ.get("TRUSTLINES_CONTRACTS_JSON") or os.path.join(
         sys.prefix, "trustlines-contracts", "build", "contracts.json"
     )
-    with open(path, "rb") as f:
-        return json.load(f)
+
+
+# hit and miss counters are available as contracts_cache.hits and
+# contracts_cache.misses
+contracts_cache = ContractsCache()
+
+
+def load_contracts_json():
+    return contracts_cache.load(get_contracts_json_path())
 
 
 # lazily load the contracts, so the compile_contracts fixture has a chance to
@@ -29,10 +41,40 @@ def load_contracts_json():
 
 
 class LazyContractsLoader(collections.UserDict):
-    def __getitem__(self, *args):
-        if not self.data:
-            self.data = load_contracts_json()
-        return super().__getitem__(*args)
+    """Loads the contract interfaces on first access
+
+    If possible, the interfaces are read from an index next to
+    contracts.json, so that only the requested contracts have to be decoded.
+    Otherwise the whole contracts.json is loaded. Interfaces assigned to
+    `data` take precedence over both.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._index = None
+
+    def _load(self):
+        """Returns the mapping the contract interfaces are read from"""
+        if self.data:
+            return self.data
+        if self._index is None:
+            self._index = contracts_cache.open_index(get_contracts_json_path())
+            if self._index is None:
+                self.data = load_contracts_json()
+                return self.data
+        return self._index
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
 
 
 contracts = LazyContractsLoader()
@@ -42,6 +84,93 @@ def get_contract_interface(contract_name):
     return contracts[contract_name]
 
 
+@functools.lru_cache(maxsize=1)
+def get_selector_table():
+    """Returns the function selectors and event topics of all contracts, see
+    `tldeploy.artifacts.build_selector_table`"""
+    if contracts.data:
+        return build_selector_table(contracts.data)
+    return load_selector_table(get_contracts_json_path())
+
+
+# cached gas limits by contract name and function selector, which are used by
+# the deployment functions unless a gas limit is given
+gas_estimate_cache = GasEstimateCache()
+
+
+def send_contract_transaction(
+    function_call,
+    *,
+    web3: Web3,
+    contract_name: str,
+    transaction_options: Dict = None,
+    private_key: bytes = None,
+):
+    """Send the transaction of `function_call` and wait for its receipt
+
+    Gas limit and gas price are taken from `gas_estimate_cache` unless they are
+    given in `transaction_options`, to save the estimation round trips.
+    """
+    if transaction_options is None:
+        transaction_options = {}
+
+    try:
+        sender = get_sender_address(
+            web3, transaction_options=transaction_options, private_key=private_key
+        )
+    except ValueError:
+        sender = None
+
+    return send_function_call_transaction(
+        function_call,
+        web3=web3,
+        transaction_options=gas_estimate_cache.fill_transaction_options(
+            function_call,
+            web3=web3,
+            contract_name=contract_name,
+            transaction_options=transaction_options,
+            sender=sender,
+        ),
+        private_key=private_key,
+    )
+
+
+# attribute of web3 instances holding their contract factories by contract name
+CONTRACT_FACTORIES_ATTRIBUTE = "_tldeploy_contract_factories"
+
+
+def get_contract_factory(web3: Web3, contract_name: str):
+    """Returns the web3 contract factory for `contract_name`
+
+    Building a factory parses the abi and creates the function and event
+    classes, so factories are cached per web3 instance and contract name. A
+    factory is rebuilt when the interface of the contract changed.
+    """
+    # The factories reference their web3 instance, so they are stored on it
+    # instead of in a global cache to not keep it alive.
+    factories = getattr(web3, CONTRACT_FACTORIES_ATTRIBUTE, None)
+    if factories is None:
+        factories = {}
+        setattr(web3, CONTRACT_FACTORIES_ATTRIBUTE, factories)
+
+    contract_interface = get_contract_interface(contract_name)
+    cached = factories.get(contract_name)
+    if cached is not None and cached[0] is contract_interface:
+        return cached[1]
+
+    factory = web3.eth.contract(
+        abi=contract_interface["abi"], bytecode=contract_interface["bytecode"]
+    )
+    factories[contract_name] = (contract_interface, factory)
+    return factory
+
+
+def get_contract(web3: Web3, contract_name: str, address: str):
+    """Returns a new contract `contract_name` at `address` built from the
+    cached contract factory"""
+    return get_contract_factory(web3, contract_name)(address=address)
+
+
 def deploy(
     contract_name,
     *,
@@ -53,15 +182,15 @@ def deploy(
     if transaction_options is None:
         transaction_options = {}
 
-    contract_interface = contracts[contract_name]
-    return deploy_compiled_contract(
-        abi=contract_interface["abi"],
-        bytecode=contract_interface["bytecode"],
+    contract_factory = get_contract_factory(web3, contract_name)
+    receipt = send_contract_transaction(
+        contract_factory.constructor(*constructor_args),
         web3=web3,
+        contract_name=contract_name,
         transaction_options=transaction_options,
         private_key=private_key,
-        constructor_args=constructor_args,
     )
+    return get_contract(web3, contract_name, receipt["contractAddress"])
 
 
 def deploy_exchange(
@@ -102,9 +231,10 @@ def deploy_unw_eth(
     if exchange_address is not None:
         if exchange_address is not None:
             function_call = unw_eth.functions.addAuthorizedAddress(exchange_address)
-            send_function_call_transaction(
+            send_contract_transaction(
                 function_call,
                 web3=web3,
+                contract_name="UnwEth",
                 transaction_options=transaction_options,
                 private_key=private_key,
             )
@@ -113,6 +243,49 @@ def deploy_unw_eth(
     return unw_eth
 
 
+def deploy_multicall(
+    *, web3: Web3, transaction_options: Dict = None, private_key: bytes = None
+):
+    """Deploy the contract used to bundle view calls into one eth_call"""
+    if transaction_options is None:
+        transaction_options = {}
+
+    multicall = deploy(
+        "Multicall",
+        web3=web3,
+        transaction_options=transaction_options,
+        private_key=private_key,
+    )
+    increase_transaction_options_nonce(transaction_options)
+    return multicall
+
+
+def currency_network_init_function_call(
+    currency_network,
+    *,
+    name,
+    symbol,
+    decimals,
+    expiration_time,
+    fee_divisor=0,
+    default_interest_rate=0,
+    custom_interests=True,
+    prevent_mediator_interests=False,
+    authorized_addresses=(),
+):
+    return currency_network.functions.init(
+        name,
+        symbol,
+        decimals,
+        fee_divisor,
+        default_interest_rate,
+        custom_interests,
+        prevent_mediator_interests,
+        expiration_time,
+        list(authorized_addresses),
+    )
+
+
 def deploy_network(
     web3,
     name,
@@ -152,21 +325,23 @@ def deploy_network(
     if exchange_address is not None:
         authorized_addresses.append(exchange_address)
 
-    init_function_call = currency_network.functions.init(
-        name,
-        symbol,
-        decimals,
-        fee_divisor,
-        default_interest_rate,
-        custom_interests,
-        prevent_mediator_interests,
-        expiration_time,
-        authorized_addresses,
+    init_function_call = currency_network_init_function_call(
+        currency_network,
+        name=name,
+        symbol=symbol,
+        decimals=decimals,
+        fee_divisor=fee_divisor,
+        default_interest_rate=default_interest_rate,
+        custom_interests=custom_interests,
+        prevent_mediator_interests=prevent_mediator_interests,
+        expiration_time=expiration_time,
+        authorized_addresses=authorized_addresses,
     )
 
-    send_function_call_transaction(
+    send_contract_transaction(
         init_function_call,
         web3=web3,
+        contract_name=currency_network_contract_name,
         transaction_options=transaction_options,
         private_key=private_key,
     )
@@ -180,9 +355,20 @@ def deploy_networks(
     network_settings,
     currency_network_contract_name=None,
     transaction_options: Dict = None,
+    private_key: bytes = None,
 ):
-    exchange = deploy_exchange(web3=web3)
-    unw_eth = deploy_unw_eth(web3=web3, exchange_address=exchange.address)
+    if transaction_options is None:
+        transaction_options = {}
+
+    exchange = deploy_exchange(
+        web3=web3, transaction_options=transaction_options, private_key=private_key
+    )
+    unw_eth = deploy_unw_eth(
+        web3=web3,
+        transaction_options=transaction_options,
+        private_key=private_key,
+        exchange_address=exchange.address,
+    )
 
     networks = [
         deploy_network(
@@ -190,6 +376,7 @@ def deploy_networks(
             exchange_address=exchange.address,
             currency_network_contract_name=currency_network_contract_name,
             transaction_options=transaction_options,
+            private_key=private_key,
             **network_setting,
         )
         for network_setting in network_settings
@@ -198,6 +385,245 @@ def deploy_networks(
     return networks, exchange, unw_eth
 
 
+def deploy_currency_network_implementation(
+    *,
+    web3: Web3,
+    currency_network_contract_name=None,
+    transaction_options: Dict = None,
+    private_key: bytes = None,
+):
+    """Deploy a currency network without initializing it, to be used as shared
+    implementation of proxied networks"""
+    if transaction_options is None:
+        transaction_options = {}
+    if currency_network_contract_name is None:
+        currency_network_contract_name = "ProxiedCurrencyNetwork"
+
+    implementation = deploy(
+        currency_network_contract_name,
+        web3=web3,
+        transaction_options=transaction_options,
+        private_key=private_key,
+    )
+    increase_transaction_options_nonce(transaction_options)
+    return implementation
+
+
+def deploy_proxied_network(
+    web3,
+    implementation_address,
+    name,
+    symbol,
+    decimals,
+    expiration_time,
+    fee_divisor=0,
+    default_interest_rate=0,
+    custom_interests=True,
+    prevent_mediator_interests=False,
+    exchange_address=None,
+    currency_network_contract_name=None,
+    transaction_options: Dict = None,
+    private_key=None,
+    authorized_addresses=None,
+):
+    """Deploy a CurrencyNetworkProxy forwarding to the currency network at
+    `implementation_address` and initialize it
+
+    Only the small proxy is deployed, which is a lot cheaper than deploying
+    the whole currency network with `deploy_network`.
+    `currency_network_contract_name` has to be the contract of the
+    implementation, which has to inherit ProxyStorage first like the default
+    ProxiedCurrencyNetwork.
+    """
+    if transaction_options is None:
+        transaction_options = {}
+    if authorized_addresses is None:
+        authorized_addresses = []
+    if currency_network_contract_name is None:
+        currency_network_contract_name = "ProxiedCurrencyNetwork"
+
+    proxy = deploy(
+        "CurrencyNetworkProxy",
+        web3=web3,
+        transaction_options=transaction_options,
+        private_key=private_key,
+        constructor_args=(implementation_address,),
+    )
+    increase_transaction_options_nonce(transaction_options)
+
+    currency_network = get_contract(web3, currency_network_contract_name, proxy.address)
+
+    if exchange_address is not None:
+        authorized_addresses.append(exchange_address)
+
+    init_function_call = currency_network_init_function_call(
+        currency_network,
+        name=name,
+        symbol=symbol,
+        decimals=decimals,
+        fee_divisor=fee_divisor,
+        default_interest_rate=default_interest_rate,
+        custom_interests=custom_interests,
+        prevent_mediator_interests=prevent_mediator_interests,
+        expiration_time=expiration_time,
+        authorized_addresses=authorized_addresses,
+    )
+    send_contract_transaction(
+        init_function_call,
+        web3=web3,
+        contract_name=currency_network_contract_name,
+        transaction_options=transaction_options,
+        private_key=private_key,
+    )
+    increase_transaction_options_nonce(transaction_options)
+
+    return currency_network
+
+
+def deploy_currency_network_factory(
+    *, web3: Web3, transaction_options: Dict = None, private_key: bytes = None
+):
+    if transaction_options is None:
+        transaction_options = {}
+
+    currency_network_factory = deploy(
+        "CurrencyNetworkFactory",
+        web3=web3,
+        transaction_options=transaction_options,
+        private_key=private_key,
+    )
+    increase_transaction_options_nonce(transaction_options)
+    return currency_network_factory
+
+
+def to_salt(salt) -> bytes:
+    """Convert an int, bytes or hex string salt to bytes32"""
+    if isinstance(salt, int):
+        return salt.to_bytes(32, byteorder="big")
+    if isinstance(salt, str):
+        salt = Web3.toBytes(hexstr=salt)
+    if len(salt) > 32:
+        raise ValueError(f"Salt {salt!r} is longer than 32 bytes.")
+    return bytes(salt).rjust(32, b"\0")
+
+
+def compute_network_address(
+    factory_address, deployer_address, salt, currency_network_contract_name=None
+):
+    """Returns the address at which a currency network deployed by
+    `deployer_address` via the factory at `factory_address` with `salt` will
+    be found"""
+    if currency_network_contract_name is None:
+        currency_network_contract_name = "CurrencyNetwork"
+
+    initcode = get_currency_network_initcode(currency_network_contract_name)
+    create2_salt = Web3.solidityKeccak(
+        ["address", "bytes32"], [deployer_address, to_salt(salt)]
+    )
+    return build_create2_address(factory_address, initcode, create2_salt)
+
+
+def get_currency_network_initcode(currency_network_contract_name):
+    interface = get_contract_interface(currency_network_contract_name)
+    return build_initcode(
+        contract_abi=interface["abi"], contract_bytecode=interface["bytecode"]
+    )
+
+
+class UnexpectedNetworkAddress(Exception):
+    """The factory deployed the network at another address than computed"""
+
+
+def deploy_network_with_factory(
+    web3,
+    factory_address,
+    name,
+    symbol,
+    decimals,
+    expiration_time,
+    fee_divisor=0,
+    default_interest_rate=0,
+    custom_interests=True,
+    prevent_mediator_interests=False,
+    exchange_address=None,
+    currency_network_contract_name=None,
+    salt=0,
+    transaction_options: Dict = None,
+    private_key=None,
+    authorized_addresses=None,
+):
+    """Deploy and initialize a currency network in one transaction via the
+    CurrencyNetworkFactory at `factory_address`
+
+    The address of the network can be computed in advance with
+    `compute_network_address`.
+    """
+    if transaction_options is None:
+        transaction_options = {}
+    if authorized_addresses is None:
+        authorized_addresses = []
+    if currency_network_contract_name is None:
+        currency_network_contract_name = "CurrencyNetwork"
+
+    if exchange_address is not None:
+        authorized_addresses.append(exchange_address)
+
+    deployer_address = get_sender_address(
+        web3, transaction_options=transaction_options, private_key=private_key
+    )
+    network_address = compute_network_address(
+        factory_address,
+        deployer_address,
+        salt,
+        currency_network_contract_name=currency_network_contract_name,
+    )
+    currency_network = get_contract(
+        web3, currency_network_contract_name, network_address
+    )
+    init_function_call = currency_network_init_function_call(
+        currency_network,
+        name=name,
+        symbol=symbol,
+        decimals=decimals,
+        fee_divisor=fee_divisor,
+        default_interest_rate=default_interest_rate,
+        custom_interests=custom_interests,
+        prevent_mediator_interests=prevent_mediator_interests,
+        expiration_time=expiration_time,
+        authorized_addresses=authorized_addresses,
+    )
+    init_data = currency_network.encodeABI(
+        fn_name=init_function_call.fn_name, args=init_function_call.args
+    )
+
+    factory = get_contract(web3, "CurrencyNetworkFactory", factory_address)
+    function_call = factory.functions.deployCurrencyNetwork(
+        get_currency_network_initcode(currency_network_contract_name),
+        to_salt(salt),
+        init_data,
+    )
+    receipt = send_contract_transaction(
+        function_call,
+        web3=web3,
+        contract_name="CurrencyNetworkFactory",
+        transaction_options=transaction_options,
+        private_key=private_key,
+    )
+    increase_transaction_options_nonce(transaction_options)
+
+    deployment_event = factory.events.CurrencyNetworkDeployment().processReceipt(
+        receipt
+    )
+    deployed_address = deployment_event[0]["args"]["currencyNetworkAddress"]
+    if deployed_address != network_address:
+        raise UnexpectedNetworkAddress(
+            f"The computed network address {network_address} does not match "
+            f"the deployed address {deployed_address} found via events."
+        )
+
+    return currency_network
+
+
 def deploy_identity(
     web3, owner_address, chain_id=None, transaction_options: Dict = None
 ):
@@ -208,13 +634,57 @@ def deploy_identity(
     if chain_id is None:
         chain_id = get_chain_id(web3)
     function_call = identity.functions.init(owner_address, chain_id)
-    send_function_call_transaction(
-        function_call, web3=web3, transaction_options=transaction_options
+    send_contract_transaction(
+        function_call,
+        web3=web3,
+        contract_name="Identity",
+        transaction_options=transaction_options,
     )
     increase_transaction_options_nonce(transaction_options)
 
     return identity
 
 
-def get_chain_id(web3):
-    return int(web3.eth.chainId)
+def get_sender_address(web3, *, transaction_options: Dict, private_key=None):
+    """Returns the address that will send transactions with the given options"""
+    if private_key is not None:
+        return web3.eth.account.from_key(private_key).address
+    if "from" in transaction_options:
+        return transaction_options["from"]
+    if web3.eth.defaultAccount:
+        return web3.eth.defaultAccount
+    raise ValueError("Could not determine the sender of the transactions.")
+
+
+def build_create2_address(deployer_address, bytecode, salt="0x" + "00" * 32):
+    hashed_bytecode = Web3.solidityKeccak(["bytes"], [bytecode])
+    to_hash = ["0xff", deployer_address, salt, hashed_bytecode]
+    abi_types = ["bytes1", "address", "bytes32", "bytes32"]
+
+    return to_checksum_address(Web3.solidityKeccak(abi_types, to_hash)[12:])
+
+
+# chain ids by web3 instance, see `get_chain_id`, weak keys so that the cache
+# does not keep web3 instances alive
+_chain_ids: MutableMapping[Web3, int] = weakref.WeakKeyDictionary()
+
+
+def get_chain_id(web3) -> int:
+    """Returns the chain id of the node `web3` is connected to
+
+    The chain id of a connection does not change, so it is fetched only once
+    per web3 instance, unless it was set with `set_chain_id`.
+    """
+    chain_id = _chain_ids.get(web3)
+    if chain_id is None:
+        chain_id = _chain_ids[web3] = int(web3.eth.chainId)
+    return chain_id
+
+
+def set_chain_id(web3, chain_id: int) -> None:
+    """Use `chain_id` for `web3` instead of fetching it from the node"""
+    _chain_ids[web3] = chain_id
+
+
+def clear_chain_id_cache() -> None:
+    _chain_ids.clear()
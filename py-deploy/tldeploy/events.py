@@ -0,0 +1,220 @@
+import functools
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from eth_abi import decode_abi
+from eth_utils import keccak, to_checksum_address
+
+from tldeploy.artifacts import abi_signature, canonical_type
+from tldeploy.core import get_contract_interface, get_selector_table
+
+# Events that are decoded by the default decoder, by contract name
+HOT_EVENTS = {
+    "CurrencyNetwork": ["Transfer", "BalanceUpdate", "TrustlineUpdate", "DebtUpdate"],
+    "Identity": ["TransactionExecution", "FeePayment"],
+}
+
+WORD_SIZE = 32
+
+# integer and fixed size bytes types, which are encoded in a single word if
+# their size is valid
+SIZED_TYPE = re.compile(r"(uint|int|bytes)([0-9]*)")
+
+HexOrBytes = Union[str, bytes]
+
+
+def _to_bytes(value: HexOrBytes) -> bytes:
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if value.startswith("0x"):
+        value = value[2:]
+    return bytes.fromhex(value)
+
+
+@functools.lru_cache(maxsize=4096)
+def _decode_address(word: bytes) -> str:
+    # the same addresses show up again and again in logs, so we cache the
+    # checksum computation
+    return to_checksum_address(word[12:])
+
+
+def _decode_uint(word: bytes) -> int:
+    return int.from_bytes(word, byteorder="big")
+
+
+def _decode_int(word: bytes) -> int:
+    return int.from_bytes(word, byteorder="big", signed=True)
+
+
+def _decode_bool(word: bytes) -> bool:
+    return word != bytes(WORD_SIZE)
+
+
+def _get_word_decoder(abi_type: str):
+    """Returns the decoder of a type encoded in a single word, or None if the
+    type is dynamic, an array or a tuple"""
+    if abi_type == "address":
+        return _decode_address
+    if abi_type == "bool":
+        return _decode_bool
+    match = SIZED_TYPE.fullmatch(abi_type)
+    if match is None:
+        return None
+    base_type, size = match.groups()
+    if base_type == "bytes":
+        if size and 1 <= int(size) <= 32:
+            return lambda word: word[: int(size)]
+        return None
+    if size and not (8 <= int(size) <= 256 and int(size) % 8 == 0):
+        return None
+    return _decode_uint if base_type == "uint" else _decode_int
+
+
+class _EventLayout:
+    def __init__(self, abi_entry: Dict):
+        self.name = abi_entry["name"]
+        # (name, word decoder) of the indexed inputs
+        self.indexed: List[Tuple[str, Callable]] = []
+        # (name, word decoder or None, abi type) of the inputs in the data
+        self.non_indexed: List[Tuple[str, Optional[Callable], str]] = []
+        non_indexed_types = []
+        for abi_input in abi_entry["inputs"]:
+            abi_type = canonical_type(abi_input)
+            decoder = _get_word_decoder(abi_type)
+            if abi_input["indexed"]:
+                # indexed dynamic values are only available as their hash
+                self.indexed.append((abi_input["name"], decoder or bytes))
+            else:
+                self.non_indexed.append((abi_input["name"], decoder, abi_type))
+                non_indexed_types.append(abi_type)
+
+        # Arrays and tuples are decoded by eth_abi, which is a lot slower
+        self.abi_decoded_types: Optional[List[str]] = None
+        if any(
+            decoder is None and abi_type not in ("bytes", "string")
+            for _, decoder, abi_type in self.non_indexed
+        ):
+            self.abi_decoded_types = non_indexed_types
+
+    def decode_args(self, topics: List[bytes], data: bytes) -> Dict:
+        if len(topics) != len(self.indexed) + 1:
+            raise ValueError(f"Wrong number of topics for event {self.name}")
+        args = {}
+        for (name, decode_topic), topic in zip(self.indexed, topics[1:]):
+            args[name] = decode_topic(topic)
+
+        if self.abi_decoded_types is not None:
+            values = decode_abi(self.abi_decoded_types, data)
+            for (name, _, _), value in zip(self.non_indexed, values):
+                args[name] = value
+            return args
+
+        for position, (name, decoder, abi_type) in enumerate(self.non_indexed):
+            word = data[position * WORD_SIZE : (position + 1) * WORD_SIZE]
+            if decoder is not None:
+                args[name] = decoder(word)
+            else:
+                offset = _decode_uint(word)
+                length = _decode_uint(data[offset : offset + WORD_SIZE])
+                value = data[offset + WORD_SIZE : offset + WORD_SIZE + length]
+                args[name] = value.decode() if abi_type == "string" else value
+        return args
+
+
+class EventDecoder:
+    """Decodes raw logs of known events without building web3 contracts
+
+    The decoded events have the same structure as web3's event data: a dict with
+    `event`, `args`, `address`, `blockNumber`, `blockHash`, `transactionHash`,
+    `transactionIndex` and `logIndex`. Arguments of static types, `bytes` and
+    `string` are decoded directly, all others with eth_abi.
+    Logs are matched by their first topic only, so events of other contracts
+    with the same signature are decoded as well, unless the decoder is
+    restricted to `addresses`.
+    """
+
+    LOG_FIELDS = (
+        "address",
+        "blockNumber",
+        "blockHash",
+        "transactionHash",
+        "transactionIndex",
+        "logIndex",
+    )
+
+    def __init__(self, event_abis: Iterable[Dict] = (), *, addresses=None):
+        self._layouts: Dict[bytes, _EventLayout] = {}
+        self._addresses = (
+            {address.lower() for address in addresses}
+            if addresses is not None
+            else None
+        )
+        for abi_entry in event_abis:
+            self.add_event(abi_entry)
+
+    def add_event(self, abi_entry: Dict, topic: bytes = None) -> None:
+        """Add the event of `abi_entry`, `topic` is computed if not given"""
+        if topic is None:
+            topic = keccak(text=abi_signature(abi_entry))
+        self._layouts[topic] = _EventLayout(abi_entry)
+
+    @classmethod
+    def from_contracts(
+        cls, events_by_contract: Dict[str, List[str]], *, addresses=None
+    ) -> "EventDecoder":
+        """Returns a decoder for the given events of the compiled contracts,
+        with the topics taken from the selector table"""
+        selector_table = get_selector_table()
+        decoder = cls(addresses=addresses)
+        for contract_name, event_names in events_by_contract.items():
+            topics = selector_table[contract_name]["events"]
+            for abi_entry in get_contract_interface(contract_name)["abi"]:
+                if abi_entry["type"] == "event" and abi_entry["name"] in event_names:
+                    topic = topics[abi_signature(abi_entry)]
+                    decoder.add_event(abi_entry, _to_bytes(topic))
+        return decoder
+
+    @property
+    def topics(self) -> List[bytes]:
+        """The topics of all events known to the decoder"""
+        return list(self._layouts)
+
+    def can_decode(self, log: Dict) -> bool:
+        topics = log["topics"]
+        return (
+            len(topics) > 0
+            and _to_bytes(topics[0]) in self._layouts
+            and self._is_known_address(log)
+        )
+
+    def decode(self, log: Dict) -> Optional[Dict]:
+        """Decode a raw log, returns None if the event is unknown"""
+        if not self._is_known_address(log):
+            return None
+        topics = [_to_bytes(topic) for topic in log["topics"]]
+        if not topics:
+            return None
+        layout = self._layouts.get(topics[0])
+        if layout is None:
+            return None
+
+        event = {field: log[field] for field in self.LOG_FIELDS if field in log}
+        event["event"] = layout.name
+        event["args"] = layout.decode_args(topics, _to_bytes(log["data"]))
+        return event
+
+    def _is_known_address(self, log: Dict) -> bool:
+        return self._addresses is None or log["address"].lower() in self._addresses
+
+    def decode_many(self, logs: Iterable[Dict]) -> Iterator[Dict]:
+        """Decode the logs of known events and skip all others"""
+        for log in logs:
+            event = self.decode(log)
+            if event is not None:
+                yield event
+
+
+@functools.lru_cache(maxsize=1)
+def get_hot_event_decoder() -> EventDecoder:
+    """Returns a decoder for the events in `HOT_EVENTS`"""
+    return EventDecoder.from_contracts(HOT_EVENTS)
@@ -1,66 +1,285 @@
-from tldeploy.signing import solidity_keccak, eth_sign
+from concurrent.futures import ProcessPoolExecutor
+from enum import IntEnum
+from typing import List, Optional, Sequence, Tuple, Union
 
+import attr
+from eth_hash.auto import keccak
+from eth_utils import to_canonical_address, to_checksum_address
+from hexbytes import HexBytes
 
-class Order(object):
-    def __init__(
-        self,
-        exchange_address,
-        maker_address,
-        taker_address,
-        maker_token,
-        taker_token,
-        fee_recipient,
-        maker_token_amount,
-        taker_token_amount,
-        maker_fee,
-        taker_fee,
-        expiration_timestamp_in_sec,
-        salt,
-    ):
-        self.exchange_address = exchange_address
-        self.maker_address = maker_address
-        self.taker_address = taker_address
-        self.maker_token = maker_token
-        self.taker_token = taker_token
-        self.fee_recipient = fee_recipient
-        self.maker_token_amount = maker_token_amount
-        self.taker_token_amount = taker_token_amount
-        self.maker_fee = maker_fee
-        self.taker_fee = taker_fee
-        self.expiration_timestamp_in_sec = expiration_timestamp_in_sec
-        self.salt = salt
-
-    def hash(self):
-        return solidity_keccak(
+from tldeploy.signing import SolidityKeccakPacker, eth_sign
+
+order_hash_packer = SolidityKeccakPacker(
+    [
+        "address",
+        "address",
+        "address",
+        "address",
+        "address",
+        "address",
+        "uint256",
+        "uint256",
+        "uint256",
+        "uint256",
+        "uint256",
+        "uint256",
+    ]
+)
+
+ADDRESS_SIZE = 20
+UINT_SIZE = 32
+ADDRESSES_PER_ORDER = 6
+VALUES_PER_ORDER = 6
+ORDER_ADDRESSES_SIZE = ADDRESSES_PER_ORDER * ADDRESS_SIZE
+ORDER_VALUES_SIZE = VALUES_PER_ORDER * UINT_SIZE
+ORDER_PREIMAGE_SIZE = ORDER_ADDRESSES_SIZE + ORDER_VALUES_SIZE
+
+# batches are split into chunks of at least this many orders when hashing with
+# processes
+DEFAULT_CHUNK_SIZE = 10000
+
+
+class ExchangeError(IntEnum):
+    """The error ids of `LogError` events of the exchange contract"""
+
+    ORDER_EXPIRED = 0
+    ORDER_FULLY_FILLED_OR_CANCELLED = 1
+    ROUNDING_ERROR_TOO_LARGE = 2
+    INSUFFICIENT_BALANCE_OR_ALLOWANCE = 3
+
+
+@attr.s(auto_attribs=True, frozen=True, slots=True)
+class Order:
+    """An order of the exchange contract
+
+    Orders are immutable, so that their hash can be computed once and cached.
+    """
+
+    exchange_address: str
+    maker_address: str
+    taker_address: str
+    maker_token: str
+    taker_token: str
+    fee_recipient: str
+    maker_token_amount: int
+    taker_token_amount: int
+    maker_fee: int
+    taker_fee: int
+    expiration_timestamp_in_sec: int
+    salt: int
+    _hash: Optional[HexBytes] = attr.ib(default=None, init=False, repr=False, eq=False)
+
+    def hash(self) -> HexBytes:
+        """Returns the hash of the order as `HexBytes`, like `OrderBatch.hashes`"""
+        order_hash = self._hash
+        if order_hash is None:
+            order_hash = self._compute_hash()
+            object.__setattr__(self, "_hash", order_hash)
+        return order_hash
+
+    def _compute_hash(self) -> HexBytes:
+        return order_hash_packer(
             [
-                "address",
-                "address",
-                "address",
-                "address",
-                "address",
-                "address",
-                "uint256",
-                "uint256",
-                "uint256",
-                "uint256",
-                "uint256",
-                "uint256",
+                self.exchange_address,
+                self.maker_address,
+                self.taker_address,
+                self.maker_token,
+                self.taker_token,
+                self.fee_recipient,
+                self.maker_token_amount,
+                self.taker_token_amount,
+                self.maker_fee,
+                self.taker_fee,
+                self.expiration_timestamp_in_sec,
+                self.salt,
+            ]
+        )
+
+    def sign(self, key):
+        return eth_sign(self.hash(), key)
+
+    def to_contract_args(self) -> Tuple[List[str], List[int]]:
+        """Returns the `orderAddresses` and `orderValues` arguments of the
+        functions of the exchange contract, e.g. `fillOrder`"""
+        return (
+            [
+                self.maker_address,
+                self.taker_address,
+                self.maker_token,
+                self.taker_token,
+                self.fee_recipient,
             ],
             [
+                self.maker_token_amount,
+                self.taker_token_amount,
+                self.maker_fee,
+                self.taker_fee,
+                self.expiration_timestamp_in_sec,
+                self.salt,
+            ],
+        )
+
+    def _packed_addresses(self) -> bytes:
+        return b"".join(
+            to_canonical_address(address)
+            for address in [
                 self.exchange_address,
                 self.maker_address,
                 self.taker_address,
                 self.maker_token,
                 self.taker_token,
                 self.fee_recipient,
+            ]
+        )
+
+    def _packed_values(self) -> bytes:
+        return b"".join(
+            value.to_bytes(UINT_SIZE, byteorder="big")
+            for value in [
                 self.maker_token_amount,
                 self.taker_token_amount,
                 self.maker_fee,
                 self.taker_fee,
                 self.expiration_timestamp_in_sec,
                 self.salt,
+            ]
+        )
+
+
+def get_partial_amount(numerator: int, denominator: int, target: int) -> int:
+    """Same as `getPartialAmount` of the exchange contract"""
+    return numerator * target // denominator
+
+
+def is_rounding_error(numerator: int, denominator: int, target: int) -> bool:
+    """Same as `isRoundingError` of the exchange contract, which checks if the
+    rounding error of `get_partial_amount` is larger than 0.1%"""
+    remainder = target * numerator % denominator
+    if remainder == 0:
+        return False
+    return remainder * 1_000_000 // (numerator * target) > 1000
+
+
+def _hash_preimages(preimages: bytes) -> List[HexBytes]:
+    return [
+        HexBytes(keccak(preimages[offset : offset + ORDER_PREIMAGE_SIZE]))
+        for offset in range(0, len(preimages), ORDER_PREIMAGE_SIZE)
+    ]
+
+
+class OrderBatch:
+    """Orders of the exchange contract stored column-wise
+
+    The six addresses of every order are stored as 20 bytes each in
+    `addresses`, the six uint256 values as 32 bytes each in `values`, both
+    in the order used for the order hash. Slicing a batch does not copy
+    the data.
+    """
+
+    def __init__(
+        self,
+        addresses: Union[bytes, bytearray, memoryview],
+        values: Union[bytes, bytearray, memoryview],
+    ):
+        addresses = memoryview(addresses)
+        values = memoryview(values)
+        if len(addresses) % ORDER_ADDRESSES_SIZE != 0:
+            raise ValueError("The size of the addresses does not fit to whole orders")
+        if len(values) % ORDER_VALUES_SIZE != 0:
+            raise ValueError("The size of the values does not fit to whole orders")
+        if len(addresses) // ORDER_ADDRESSES_SIZE != len(values) // ORDER_VALUES_SIZE:
+            raise ValueError("The number of orders of addresses and values differ")
+        self.addresses = addresses
+        self.values = values
+
+    @classmethod
+    def from_orders(cls, orders: Sequence[Order]) -> "OrderBatch":
+        addresses = bytearray(len(orders) * ORDER_ADDRESSES_SIZE)
+        values = bytearray(len(orders) * ORDER_VALUES_SIZE)
+        for index, order in enumerate(orders):
+            addresses_offset = index * ORDER_ADDRESSES_SIZE
+            values_offset = index * ORDER_VALUES_SIZE
+            addresses[
+                addresses_offset : addresses_offset + ORDER_ADDRESSES_SIZE
+            ] = order._packed_addresses()
+            values[
+                values_offset : values_offset + ORDER_VALUES_SIZE
+            ] = order._packed_values()
+        return cls(addresses, values)
+
+    def __len__(self) -> int:
+        return len(self.addresses) // ORDER_ADDRESSES_SIZE
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("Order batches can only be sliced with step 1")
+            stop = max(start, stop)
+            return OrderBatch(
+                self.addresses[
+                    start * ORDER_ADDRESSES_SIZE : stop * ORDER_ADDRESSES_SIZE
+                ],
+                self.values[start * ORDER_VALUES_SIZE : stop * ORDER_VALUES_SIZE],
+            )
+
+        index = range(len(self))[key]
+        addresses = self.addresses[
+            index * ORDER_ADDRESSES_SIZE : (index + 1) * ORDER_ADDRESSES_SIZE
+        ]
+        values = self.values[
+            index * ORDER_VALUES_SIZE : (index + 1) * ORDER_VALUES_SIZE
+        ]
+        return Order(
+            *[
+                to_checksum_address(bytes(addresses[i : i + ADDRESS_SIZE]))
+                for i in range(0, ORDER_ADDRESSES_SIZE, ADDRESS_SIZE)
+            ],
+            *[
+                int.from_bytes(values[i : i + UINT_SIZE], byteorder="big")
+                for i in range(0, ORDER_VALUES_SIZE, UINT_SIZE)
             ],
         )
 
-    def sign(self, key):
-        return eth_sign(self.hash(), key)
+    def preimages(self) -> bytearray:
+        """Returns the packed preimages of the order hashes in one buffer"""
+        buffer = bytearray(len(self) * ORDER_PREIMAGE_SIZE)
+        addresses = self.addresses
+        values = self.values
+        for index in range(len(self)):
+            offset = index * ORDER_PREIMAGE_SIZE
+            addresses_offset = index * ORDER_ADDRESSES_SIZE
+            values_offset = index * ORDER_VALUES_SIZE
+            buffer[offset : offset + ORDER_ADDRESSES_SIZE] = addresses[
+                addresses_offset : addresses_offset + ORDER_ADDRESSES_SIZE
+            ]
+            buffer[
+                offset + ORDER_ADDRESSES_SIZE : offset + ORDER_PREIMAGE_SIZE
+            ] = values[values_offset : values_offset + ORDER_VALUES_SIZE]
+        return buffer
+
+    def hashes(
+        self, *, processes: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> List[HexBytes]:
+        """Returns the hashes of all orders in the order of the batch as
+        `HexBytes`, like `Order.hash`
+
+        If `processes` is given, batches of more than `chunk_size` orders are
+        hashed in a pool of that many processes.
+        """
+        preimages = bytes(self.preimages())
+        if processes is None or len(self) <= chunk_size:
+            return _hash_preimages(preimages)
+
+        chunk_size = max(chunk_size, -(-len(self) // processes))
+        chunk_bytes = chunk_size * ORDER_PREIMAGE_SIZE
+        chunks = [
+            preimages[offset : offset + chunk_bytes]
+            for offset in range(0, len(preimages), chunk_bytes)
+        ]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            return [
+                order_hash
+                for chunk_hashes in executor.map(_hash_preimages, chunks)
+                for order_hash in chunk_hashes
+            ]
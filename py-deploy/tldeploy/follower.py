@@ -0,0 +1,200 @@
+import json
+import os
+import time
+from typing import Dict, List
+
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+from web3 import Web3
+
+from tldeploy.events import EventDecoder
+from tldeploy.exchange import ExchangeError
+from tldeploy.orderbook import OrderBook
+
+EXCHANGE_EVENTS = {"Exchange": ["LogFill", "LogCancel", "LogError"]}
+
+DEFAULT_CHUNK_SIZE = 1000
+# blocks that are not processed to avoid events that are removed by a reorg
+DEFAULT_CONFIRMATIONS = 12
+# seconds between checkpoints while catching up, every checkpoint writes the
+# amounts of all orders
+DEFAULT_CHECKPOINT_INTERVAL = 60
+
+
+class ExchangeEventFollower:
+    """Follows the LogFill, LogCancel and LogError events of an exchange
+    contract and keeps the filled and cancelled amounts of all orders
+
+    The events are read in chunks of `chunk_size` blocks up to the latest block
+    minus `confirmations`. Reorgs are not detected, events of processed blocks
+    that are removed by a reorg deeper than `confirmations` stay counted.
+    If `checkpoint_path` is given, the amounts and the last processed block
+    are stored there at the end of every `sync` and every
+    `checkpoint_interval` seconds while catching up, so that a new follower
+    continues where the last one stopped. If `order_book` is given, fills and
+    cancels of its orders are recorded in it as well, including the amounts
+    loaded from the checkpoint for the orders that are in the book already.
+    Orders added to the book later can be given their amounts with
+    `OrderBook.add`.
+    """
+
+    def __init__(
+        self,
+        web3: Web3,
+        exchange_address: str,
+        *,
+        from_block: int = 0,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        confirmations: int = DEFAULT_CONFIRMATIONS,
+        checkpoint_path: str = None,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+        order_book: OrderBook = None,
+        clock=time.monotonic,
+    ):
+        self.web3 = web3
+        self.exchange_address = to_checksum_address(exchange_address)
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self._clock = clock
+        self._last_checkpoint_time = clock()
+        self.order_book = order_book
+        self.decoder = EventDecoder.from_contracts(EXCHANGE_EVENTS)
+        self._topics = [HexBytes(topic).hex() for topic in self.decoder.topics]
+
+        self.last_processed_block = from_block - 1
+        self.filled: Dict[bytes, int] = {}
+        self.cancelled: Dict[bytes, int] = {}
+        # error ids of the LogError events by order hash
+        self.errors: Dict[bytes, List[int]] = {}
+
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self._load_checkpoint(checkpoint_path)
+
+    def get_filled_taker_token_amount(self, order_hash: bytes) -> int:
+        return self.filled.get(bytes(order_hash), 0)
+
+    def get_cancelled_taker_token_amount(self, order_hash: bytes) -> int:
+        return self.cancelled.get(bytes(order_hash), 0)
+
+    def get_unavailable_taker_token_amount(self, order_hash: bytes) -> int:
+        """Same as `getUnavailableTakerTokenAmount` of the exchange contract at
+        `last_processed_block`"""
+        order_hash = bytes(order_hash)
+        return self.filled.get(order_hash, 0) + self.cancelled.get(order_hash, 0)
+
+    def get_errors(self, order_hash: bytes) -> List[ExchangeError]:
+        """Returns the errors of all LogError events of an order"""
+        error_ids = self.errors.get(bytes(order_hash), [])
+        return [ExchangeError(error_id) for error_id in error_ids]
+
+    def sync(self, to_block: int = None) -> int:
+        """Process all new events up to `to_block` and return their number
+
+        Per default, events up to the latest block minus `confirmations` are
+        processed.
+        """
+        if to_block is None:
+            to_block = self.web3.eth.blockNumber - self.confirmations
+
+        number_of_events = 0
+        processed_blocks = False
+        while self.last_processed_block < to_block:
+            from_block = self.last_processed_block + 1
+            chunk_to_block = min(from_block + self.chunk_size - 1, to_block)
+            logs = self.web3.eth.getLogs(
+                {
+                    "address": self.exchange_address,
+                    "fromBlock": from_block,
+                    "toBlock": chunk_to_block,
+                    "topics": [self._topics],
+                }
+            )
+            for event in self.decoder.decode_many(logs):
+                self._process_event(event)
+                number_of_events += 1
+            self.last_processed_block = chunk_to_block
+            processed_blocks = True
+            if (
+                self.checkpoint_path is not None
+                and chunk_to_block < to_block
+                and self._clock() - self._last_checkpoint_time
+                >= self.checkpoint_interval
+            ):
+                self.save_checkpoint()
+        if self.checkpoint_path is not None and processed_blocks:
+            self.save_checkpoint()
+        return number_of_events
+
+    def _process_event(self, event: Dict) -> None:
+        args = event["args"]
+        order_hash = args["orderHash"]
+        if event["event"] == "LogFill":
+            amount = args["filledTakerTokenAmount"]
+            self.filled[order_hash] = self.filled.get(order_hash, 0) + amount
+            if self.order_book is not None:
+                self.order_book.record_fill(order_hash, amount)
+        elif event["event"] == "LogCancel":
+            amount = args["cancelledTakerTokenAmount"]
+            self.cancelled[order_hash] = self.cancelled.get(order_hash, 0) + amount
+            if self.order_book is not None:
+                self.order_book.record_cancel(order_hash, amount)
+        else:
+            self.errors.setdefault(order_hash, []).append(args["errorId"])
+
+    def save_checkpoint(self) -> None:
+        checkpoint_path = self.checkpoint_path
+        if checkpoint_path is None:
+            raise ValueError("The follower has no checkpoint path.")
+        content = {
+            "exchangeAddress": self.exchange_address,
+            "lastProcessedBlock": self.last_processed_block,
+            "filled": _encode_amounts(self.filled),
+            "cancelled": _encode_amounts(self.cancelled),
+            "errors": {
+                HexBytes(order_hash).hex(): error_ids
+                for order_hash, error_ids in self.errors.items()
+            },
+        }
+        tmp_path = checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(content, f)
+        os.replace(tmp_path, checkpoint_path)
+        self._last_checkpoint_time = self._clock()
+
+    def _load_checkpoint(self, checkpoint_path: str) -> None:
+        with open(checkpoint_path) as f:
+            content = json.load(f)
+        if to_checksum_address(content["exchangeAddress"]) != self.exchange_address:
+            raise ValueError(
+                f"The checkpoint {checkpoint_path} belongs to the exchange "
+                f"{content['exchangeAddress']}."
+            )
+        self.last_processed_block = content["lastProcessedBlock"]
+        self.filled = _decode_amounts(content["filled"])
+        self.cancelled = _decode_amounts(content["cancelled"])
+        self.errors = {
+            bytes(HexBytes(order_hash)): error_ids
+            for order_hash, error_ids in content["errors"].items()
+        }
+        if self.order_book is not None:
+            for order_hash in list(self.order_book):
+                filled_amount = self.filled.get(bytes(order_hash), 0)
+                if filled_amount:
+                    self.order_book.record_fill(order_hash, filled_amount)
+                cancelled_amount = self.cancelled.get(bytes(order_hash), 0)
+                if cancelled_amount:
+                    self.order_book.record_cancel(order_hash, cancelled_amount)
+
+
+def _encode_amounts(amounts: Dict[bytes, int]) -> Dict[str, int]:
+    return {
+        HexBytes(order_hash).hex(): amount for order_hash, amount in amounts.items()
+    }
+
+
+def _decode_amounts(amounts: Dict[str, int]) -> Dict[bytes, int]:
+    return {
+        bytes(HexBytes(order_hash)): amount for order_hash, amount in amounts.items()
+    }
@@ -0,0 +1,166 @@
+import threading
+import time
+import weakref
+from typing import Dict, MutableMapping, Tuple
+
+from eth_utils import decode_hex, encode_hex, function_abi_to_4byte_selector
+
+# key used instead of a function selector for contract deployments
+CONSTRUCTOR = "constructor"
+
+# cached gas limits are estimated again after this many seconds
+DEFAULT_MAX_AGE = 600
+# the gas price can change with every block, so it is only cached shortly
+DEFAULT_GAS_PRICE_MAX_AGE = 5
+# the estimate of one call is used for calls with different arguments, so we
+# add some margin on top
+DEFAULT_MARGIN = 1.25
+
+
+def get_function_selector(function_call) -> str:
+    """Returns the selector of a contract function call, or `CONSTRUCTOR` for
+    a contract deployment"""
+    if getattr(function_call, "fn_name", None) is None:
+        return CONSTRUCTOR
+    return encode_hex(function_abi_to_4byte_selector(function_call.abi))
+
+
+def get_call_data_size(function_call) -> int:
+    """Returns the size in bytes of the transaction data of a contract
+    function call or contract deployment"""
+    if getattr(function_call, "fn_name", None) is None:
+        data = function_call.data_in_transaction
+    else:
+        data = function_call._encode_transaction_data()
+    return len(decode_hex(data))
+
+
+class GasEstimateCache:
+    """Caches gas limits by chain id, contract name, function selector and size
+    of the transaction data and the gas price by web3 instance
+
+    Calls with arguments of different lengths, for example arrays or strings,
+    are estimated separately. Gas limits are estimated again once they are
+    older than `max_age` seconds, gas prices once they are older than
+    `gas_price_max_age` seconds. The gas price is generated with the gas price
+    strategy of web3 if one is set.
+    The estimated gas limits are increased by the factor `margin`, but never
+    exceed the gas limit of the latest block.
+    The number of cache hits and misses is counted in `hits` and `misses`.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_age: float = DEFAULT_MAX_AGE,
+        gas_price_max_age: float = DEFAULT_GAS_PRICE_MAX_AGE,
+        margin: float = DEFAULT_MARGIN,
+        clock=time.monotonic,
+    ):
+        self.max_age = max_age
+        self.gas_price_max_age = gas_price_max_age
+        self.margin = margin
+        self._clock = clock
+        # the cache is shared by concurrent deployments
+        self._lock = threading.Lock()
+        self._gas_limits: Dict[Tuple[int, str, str, int], Tuple[int, float]] = {}
+        # weak keys so that the cache does not keep web3 instances alive
+        self._gas_prices: MutableMapping = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def clear(self):
+        with self._lock:
+            self._gas_limits.clear()
+            self._gas_prices.clear()
+
+    def _is_fresh(self, timestamp: float, max_age: float) -> bool:
+        return self._clock() - timestamp <= max_age
+
+    def get_gas_limit(
+        self, function_call, *, web3, contract_name: str, sender: str = None
+    ) -> int:
+        # imported here, because tldeploy.core imports this module
+        from tldeploy.core import get_chain_id
+
+        key = (
+            get_chain_id(web3),
+            contract_name,
+            get_function_selector(function_call),
+            get_call_data_size(function_call),
+        )
+        with self._lock:
+            entry = self._gas_limits.get(key)
+            if entry is not None and self._is_fresh(entry[1], self.max_age):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        estimate_options = {"from": sender} if sender is not None else {}
+        estimate = function_call.estimateGas(estimate_options)
+        block_gas_limit = web3.eth.getBlock("latest")["gasLimit"]
+        gas_limit = min(int(estimate * self.margin), block_gas_limit)
+        with self._lock:
+            self._gas_limits[key] = (gas_limit, self._clock())
+        return gas_limit
+
+    def get_gas_price(self, web3) -> int:
+        with self._lock:
+            entry = self._gas_prices.get(web3)
+            if entry is not None and self._is_fresh(entry[1], self.gas_price_max_age):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        gas_price = web3.eth.generateGasPrice()
+        if gas_price is None:
+            gas_price = web3.eth.gasPrice
+        with self._lock:
+            self._gas_prices[web3] = (gas_price, self._clock())
+        return gas_price
+
+    def fill_transaction_options(
+        self,
+        function_call,
+        *,
+        web3,
+        contract_name: str,
+        transaction_options: Dict,
+        sender: str = None,
+    ) -> Dict:
+        """Returns a copy of `transaction_options` with the gas limit and gas
+        price taken from the cache, unless they are already set"""
+        transaction_options = dict(transaction_options)
+        if "gas" not in transaction_options:
+            transaction_options["gas"] = self.get_gas_limit(
+                function_call, web3=web3, contract_name=contract_name, sender=sender
+            )
+        if "gasPrice" not in transaction_options:
+            transaction_options["gasPrice"] = self.get_gas_price(web3)
+        return transaction_options
+
+    def gas_limits(self) -> Dict[str, Dict[str, int]]:
+        """Returns the cached gas limits by contract name and function selector
+
+        If a function was estimated on different chains or for transaction data
+        of different sizes, the highest gas limit is returned.
+        """
+        result: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            for key, (gas_limit, _) in self._gas_limits.items():
+                _, contract_name, selector, _ = key
+                gas_limits = result.setdefault(contract_name, {})
+                gas_limits[selector] = max(gas_limit, gas_limits.get(selector, 0))
+        return result
+
+    def gas_prices(self) -> Dict:
+        """Returns the cached gas prices by web3 instance"""
+        with self._lock:
+            return {
+                web3: gas_price for web3, (gas_price, _) in self._gas_prices.items()
+            }
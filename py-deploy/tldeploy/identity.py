@@ -1,26 +1,70 @@
+import functools
 import json
+import os
+import secrets
+import threading
+import time
 from enum import Enum
-from typing import Dict, Optional, Any, MutableMapping
+from typing import Dict, List, Optional, Any, MutableMapping, Sequence, Set, Tuple
 
 import attr
-import pkg_resources
 from deploy_tools.compile import build_initcode
-from deploy_tools.deploy import (
-    increase_transaction_options_nonce,
-    send_function_call_transaction,
-)
+from deploy_tools.deploy import increase_transaction_options_nonce
 from eth_keys.datatypes import PrivateKey
-from eth_utils import to_checksum_address
+from eth_utils import to_canonical_address
 from web3 import Web3
 from web3.exceptions import BadFunctionCallOutput
 from hexbytes import HexBytes
 
-from tldeploy.core import deploy, get_contract_interface, get_chain_id
-from tldeploy.signing import sign_msg_hash, solidity_keccak
+from tldeploy.core import (
+    build_create2_address,
+    deploy,
+    get_chain_id,
+    get_contract,
+    send_contract_transaction,
+)
+from tldeploy.signing import (
+    SolidityKeccakPacker,
+    recover_msg_hash_signer,
+    sign_msg_hash,
+    solidity_keccak,
+)
 
 MAX_GAS = 1_000_000
 ZERO_ADDRESS = "0x" + "0" * 40
 
+# nonces of meta transactions that are 0 or at least `maxNonce` of the identity
+# contract are not ordered, the hash of the meta transaction is used for replay
+# protection instead
+MAX_NONCE = 2 ** 255
+
+TRANSACTION_EXECUTION_TOPIC = Web3.keccak(text="TransactionExecution(bytes32,bool)")
+
+# the latest block timestamp used for local checks is fetched again after
+# this many seconds
+DEFAULT_BLOCK_TIMESTAMP_MAX_AGE = 10
+
+meta_transaction_hash_packer = SolidityKeccakPacker(
+    [
+        "bytes1",
+        "bytes1",
+        "address",
+        "uint256",
+        "uint256",
+        "address",
+        "uint256",
+        "bytes32",
+        "uint256",
+        "uint256",
+        "uint256",
+        "address",
+        "address",
+        "uint256",
+        "uint256",
+        "uint8",
+    ]
+)
+
 
 def validate_and_checksum_addresses(addresses):
     formatted_addresses = []
@@ -32,6 +76,17 @@ def validate_and_checksum_addresses(addresses):
     return formatted_addresses
 
 
+def _checksum_address(address: str) -> str:
+    (checksum_address,) = validate_and_checksum_addresses([address])
+    return checksum_address
+
+
+def _checksum_optional_address(address: Optional[str]) -> Optional[str]:
+    if address is None:
+        return None
+    return _checksum_address(address)
+
+
 class MetaTransactionStatus(Enum):
     SUCCESS = "success"
     FAILURE = "failure"
@@ -47,21 +102,24 @@ class MetaTransaction:
         CREATE = 2
         CREATE2 = 3
 
-    from_: Optional[str] = None
+    # addresses are checksummed when the meta transaction is constructed
+    from_: Optional[str] = attr.ib(default=None, converter=_checksum_optional_address)
     chain_id: Optional[int] = None
     version: int = 1
-    to: str = ZERO_ADDRESS
+    to: str = attr.ib(default=ZERO_ADDRESS, converter=_checksum_address)
     value: int = 0
     data: bytes = bytes()
     base_fee: int = 0
     gas_price: int = 0
     gas_limit: int = 0
-    fee_recipient: str = ZERO_ADDRESS
-    currency_network_of_fees: str = attr.ib()
+    fee_recipient: str = attr.ib(default=ZERO_ADDRESS, converter=_checksum_address)
+    currency_network_of_fees: str = attr.ib(converter=_checksum_address)
     nonce: Optional[int] = None
     time_limit: int = 0
     operation_type: OperationType = OperationType.CALL
     signature: Optional[bytes] = None
+    # cached hash, attr.evolve creates a new instance without it
+    _hash: Optional[bytes] = attr.ib(default=None, init=False, repr=False, eq=False)
 
     @currency_network_of_fees.default
     def _default_for_currency_network_of_fees(self):
@@ -117,46 +175,35 @@ class MetaTransaction:
 
     @property
     def hash(self) -> bytes:
-        (from_, to, currency_network_of_fees) = validate_and_checksum_addresses(
-            [self.from_, self.to, self.currency_network_of_fees]
-        )
-        return solidity_keccak(
-            [
-                "bytes1",
-                "bytes1",
-                "address",
-                "uint256",
-                "uint256",
-                "address",
-                "uint256",
-                "bytes32",
-                "uint256",
-                "uint256",
-                "uint256",
-                "address",
-                "address",
-                "uint256",
-                "uint256",
-                "uint8",
-            ],
+        meta_transaction_hash = self._hash
+        if meta_transaction_hash is None:
+            meta_transaction_hash = self._compute_hash()
+            object.__setattr__(self, "_hash", meta_transaction_hash)
+        return meta_transaction_hash
+
+    def _compute_hash(self) -> bytes:
+        for address in [self.from_, self.to, self.currency_network_of_fees]:
+            if address is None:
+                raise ValueError(f"Given input {address} is not a valid address.")
+        return meta_transaction_hash_packer(
             [
                 "0x19",
                 "0x00",
-                from_,
+                self.from_,
                 self.chain_id,
                 self.version,
-                to,
+                self.to,
                 self.value,
                 solidity_keccak(["bytes"], [self.data]),
                 self.base_fee,
                 self.gas_price,
                 self.gas_limit,
                 self.fee_recipient,
-                currency_network_of_fees,
+                self.currency_network_of_fees,
                 self.nonce,
                 self.time_limit,
                 self.operation_type.value,
-            ],
+            ]
         )
 
     def signed(self, key: PrivateKey) -> "MetaTransaction":
@@ -183,14 +230,262 @@ class LastNonceFunctionNotFound(UnexpectedIdentityContractException):
     pass
 
 
+class OwnerFunctionNotFound(UnexpectedIdentityContractException):
+    pass
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class MetaTransactionValidation:
+    """The result of every check of `Delegate.validate_meta_transaction`"""
+
+    chain_id: bool
+    nonce: bool
+    signature: bool
+    time_limit: bool
+
+    @property
+    def is_valid(self) -> bool:
+        return self.chain_id and self.nonce and self.signature and self.time_limit
+
+
+def _decode_check_result(success: bool, result: bytes, not_found_exception) -> bool:
+    # the checks of the identity contract do not revert and return a bool
+    if not success or len(result) != 32:
+        raise not_found_exception
+    return int.from_bytes(result, byteorder="big") != 0
+
+
+def is_hash_replay_nonce(nonce: int) -> bool:
+    """Returns whether the identity contract uses the hash of a meta transaction
+    with `nonce` for replay protection instead of the nonce"""
+    return nonce == 0 or nonce >= MAX_NONCE
+
+
+def random_hash_replay_nonce() -> int:
+    """Returns a random nonce of at least `MAX_NONCE`
+
+    Meta transactions with these nonces can be executed in any order, the
+    random nonce makes their hashes unique.
+    """
+    return MAX_NONCE + secrets.randbelow(2 ** 256 - MAX_NONCE)
+
+
+class IdentityNonceManager:
+    """Hands out the nonces of meta transactions of identities
+
+    The last nonce of an identity is fetched from the contract once, then
+    consecutive nonces are handed out without calls to the node, so that
+    several meta transactions of an identity can be created before the first
+    one is executed. `resync` fetches the last nonce again, for example after
+    a meta transaction failed validation, and `sync_from_events` updates the
+    last nonces from `TransactionExecution` events.
+
+    The nonces of meta transactions recorded with `record_sent_meta_transaction`
+    are pending until they are known to be used, nonces are never handed out
+    again below a pending nonce unless `record_failed_meta_transaction` is
+    called for it.
+    """
+
+    def __init__(self, web3, *, identity_contract_abi):
+        self._web3 = web3
+        self._identity_contract_factory = web3.eth.contract(abi=identity_contract_abi)
+        # nonces are handed out to concurrent requests
+        self._lock = threading.Lock()
+        # last nonce known to be used and next nonce to hand out per identity
+        self._last_nonces: Dict[str, int] = {}
+        self._next_nonces: Dict[str, int] = {}
+        # identity and nonce of sent meta transactions by hash
+        self._sent_meta_transactions: Dict[bytes, Tuple[str, int]] = {}
+        # nonces of sent meta transactions that are not known to be used yet
+        self._pending_nonces: Dict[str, Set[int]] = {}
+
+    def allocate_nonce(self, identity_address: str) -> int:
+        """Returns the next nonce of an identity and reserves it"""
+        identity_address = Web3.toChecksumAddress(identity_address)
+        with self._lock:
+            # the last nonce of a new identity is fetched under the lock, so
+            # that concurrent allocations do not reset each other's nonces
+            if identity_address not in self._next_nonces:
+                self._update_last_nonce(
+                    identity_address, self._fetch_last_nonce(identity_address)
+                )
+            nonce = self._next_nonces[identity_address]
+            self._next_nonces[identity_address] = nonce + 1
+        return nonce
+
+    @staticmethod
+    def allocate_hash_replay_nonce() -> int:
+        """Returns a nonce for a meta transaction that can be executed in
+        parallel to other meta transactions of the identity"""
+        return random_hash_replay_nonce()
+
+    def get_last_nonce(self, identity_address: str) -> int:
+        identity_address = Web3.toChecksumAddress(identity_address)
+        if identity_address not in self._last_nonces:
+            self.resync(identity_address)
+        return self._last_nonces[identity_address]
+
+    def resync(self, identity_address: str) -> int:
+        """Fetches the last nonce of an identity from the contract and returns
+        it. Nonces that were handed out but not used yet are handed out again,
+        except for the nonces of sent meta transactions that are still pending.
+
+        Will raise UnexpectedIdentityContractException, if it could not find
+        the necessary function in the contract.
+        """
+        identity_address = Web3.toChecksumAddress(identity_address)
+        last_nonce = self._fetch_last_nonce(identity_address)
+        with self._lock:
+            self._update_last_nonce(identity_address, last_nonce)
+        return last_nonce
+
+    def record_sent_meta_transaction(self, meta_transaction: MetaTransaction):
+        """Remembers the nonce of a sent meta transaction, so that it is known
+        when its `TransactionExecution` event is processed and is not handed
+        out again while it is pending"""
+        from_ = meta_transaction.from_
+        nonce = meta_transaction.nonce
+        if from_ is None or nonce is None:
+            return
+        identity_address = Web3.toChecksumAddress(from_)
+        with self._lock:
+            self._sent_meta_transactions[bytes(meta_transaction.hash)] = (
+                identity_address,
+                nonce,
+            )
+            if is_hash_replay_nonce(nonce):
+                return
+            self._pending_nonces.setdefault(identity_address, set()).add(nonce)
+            if (
+                identity_address in self._next_nonces
+                and nonce >= self._next_nonces[identity_address]
+            ):
+                self._next_nonces[identity_address] = nonce + 1
+
+    def record_failed_meta_transaction(self, meta_transaction: MetaTransaction):
+        """Forgets a sent meta transaction that is known to never be executed,
+        for example because its ethereum transaction failed, so that its nonce
+        is handed out again after the next `resync`"""
+        from_ = meta_transaction.from_
+        nonce = meta_transaction.nonce
+        if from_ is None or nonce is None:
+            return
+        identity_address = Web3.toChecksumAddress(from_)
+        with self._lock:
+            self._sent_meta_transactions.pop(bytes(meta_transaction.hash), None)
+            self._pending_nonces.get(identity_address, set()).discard(nonce)
+
+    def _fetch_last_nonce(self, identity_address: str) -> int:
+        contract = self._identity_contract_factory(address=identity_address)
+        try:
+            return contract.functions.lastNonce().call()
+        except BadFunctionCallOutput:
+            raise LastNonceFunctionNotFound
+
+    def _update_last_nonce(self, identity_address: str, last_nonce: int) -> None:
+        # has to be called with the lock held
+        pending_nonces = {
+            nonce
+            for nonce in self._pending_nonces.get(identity_address, set())
+            if nonce > last_nonce
+        }
+        self._pending_nonces[identity_address] = pending_nonces
+        self._last_nonces[identity_address] = last_nonce
+        self._next_nonces[identity_address] = (
+            max(pending_nonces, default=last_nonce) + 1
+        )
+
+    def sync_from_events(self, *, from_block: int, to_block="latest") -> None:
+        """Updates the last nonces of all known identities from the
+        `TransactionExecution` events in the given blocks
+
+        Identities with events of meta transactions that were not recorded with
+        `record_sent_meta_transaction` are resynced.
+        """
+        identity_addresses = list(self._last_nonces)
+        if not identity_addresses:
+            return
+        logs = self._web3.eth.getLogs(
+            {
+                "address": identity_addresses,
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "topics": [TRANSACTION_EXECUTION_TOPIC.hex()],
+            }
+        )
+
+        unknown_identity_addresses = set()
+        with self._lock:
+            for log in logs:
+                entry = self._sent_meta_transactions.pop(bytes(log["topics"][1]), None)
+                if entry is None:
+                    unknown_identity_addresses.add(log["address"])
+                    continue
+                identity_address, nonce = entry
+                if is_hash_replay_nonce(nonce):
+                    continue
+                self._pending_nonces.get(identity_address, set()).discard(nonce)
+                if nonce > self._last_nonces[identity_address]:
+                    self._last_nonces[identity_address] = nonce
+                if nonce >= self._next_nonces[identity_address]:
+                    self._next_nonces[identity_address] = nonce + 1
+        for identity_address in unknown_identity_addresses:
+            self.resync(identity_address)
+
+
 class Delegate:
     def __init__(
-        self, delegate_address: str, *, web3, identity_contract_abi, default_gas=MAX_GAS
+        self,
+        delegate_address: str,
+        *,
+        web3,
+        identity_contract_abi,
+        default_gas=MAX_GAS,
+        multicall_address: str = None,
+        pre_validate: bool = False,
+        block_timestamp_max_age: float = DEFAULT_BLOCK_TIMESTAMP_MAX_AGE,
+        clock=time.monotonic,
+        chain_id: int = None,
+        nonce_manager: IdentityNonceManager = None,
     ):
+        """
+        Args:
+            pre_validate: Whether `validate_meta_transaction` rejects meta
+                transactions that fail `pre_validate_meta_transaction` before
+                doing the checks of the identity contract.
+            block_timestamp_max_age: Seconds after which the cached timestamp
+                of the latest block is fetched again.
+            chain_id: The chain id meta transactions are validated against,
+                per default the cached chain id of `web3`.
+            nonce_manager: If given, it hands out the nonces of
+                `get_next_nonce`, is resynced when a nonce is invalid and
+                records sent meta transactions.
+        """
         self.delegate_address = delegate_address
         self._web3 = web3
         self._identity_contract_abi = identity_contract_abi
         self.default_gas = default_gas
+        self.pre_validate = pre_validate
+        self._chain_id = chain_id
+        self.block_timestamp_max_age = block_timestamp_max_age
+        self._clock = clock
+        self.nonce_manager = nonce_manager
+        # owners of identities are set once on init, so they are never fetched again
+        self._identity_owners: Dict[str, bytes] = {}
+        # (timestamp of the latest block, clock time when it was fetched)
+        self._latest_block_timestamp: Optional[Tuple[int, float]] = None
+        self._multicall_contract = (
+            get_contract(web3, "Multicall", multicall_address)
+            if multicall_address is not None
+            else None
+        )
+
+        # Building a contract parses the abi, so we build the factory once
+        # and keep the contracts of recently used identities around
+        self._identity_contract_factory = web3.eth.contract(abi=identity_contract_abi)
+        self._get_identity_contract = functools.lru_cache(maxsize=1024)(
+            self._build_identity_contract
+        )
 
     def estimate_gas_signed_meta_transaction(
         self, signed_meta_transaction: MetaTransaction
@@ -223,9 +518,11 @@ class Delegate:
         if "gas" not in transaction_options and self.default_gas is not None:
             transaction_options["gas"] = self.default_gas
 
-        return self._meta_transaction_function_call(signed_meta_transaction).transact(
-            transaction_options
-        )
+        function_call = self._meta_transaction_function_call(signed_meta_transaction)
+        tx_hash = function_call.transact(transaction_options)
+        if self.nonce_manager is not None:
+            self.nonce_manager.record_sent_meta_transaction(signed_meta_transaction)
+        return tx_hash
 
     def validate_meta_transaction(
         self, signed_meta_transaction: MetaTransaction
@@ -240,10 +537,16 @@ class Delegate:
         validate_signature(tx)
         validate_time_limit(tx)
         ```
+        If `pre_validate` is set, `pre_validate_meta_transaction(tx)` is
+        checked first.
         Will raise
         UnexpectedIdentityContractException, if it could not find the
         check in the contract.
         """
+        if self.pre_validate and not self.pre_validate_meta_transaction(
+            signed_meta_transaction
+        ):
+            return False
         return (
             self.validate_chain_id(signed_meta_transaction)
             and self.validate_nonce(signed_meta_transaction)
@@ -251,6 +554,169 @@ class Delegate:
             and self.validate_time_limit(signed_meta_transaction)
         )
 
+    def pre_validate_meta_transaction(
+        self, signed_meta_transaction: MetaTransaction
+    ) -> bool:
+        """Checks the signature and time limit of the meta transaction locally.
+
+        This rejects invalid meta transactions without calls to the node,
+        except for fetching the owner of an identity once and the latest
+        block timestamp at most every `block_timestamp_max_age` seconds.
+        A meta transaction that passes might still be rejected by
+        `validate_meta_transaction`, which stays authoritative.
+        """
+        return self.pre_validate_signature(
+            signed_meta_transaction
+        ) and self.pre_validate_time_limit(signed_meta_transaction)
+
+    def pre_validate_signature(self, signed_meta_transaction: MetaTransaction):
+        """Validates the signature against the cached owner of the identity,
+        like `validateSignature` of the identity contract. Meta transactions
+        of identities that are not initialized are invalid.
+
+        Will raise UnexpectedIdentityContractException, if it could not find
+        the owner of the identity.
+        """
+        from_ = signed_meta_transaction.from_
+        if from_ is None:
+            raise ValueError("From has to be set")
+        if signed_meta_transaction.signature is None:
+            raise ValueError("Signature has to be set")
+        owner = self.get_identity_owner(from_)
+        # an identity that is not initialized has no owner that could sign
+        if owner == to_canonical_address(ZERO_ADDRESS):
+            return False
+        signer = recover_msg_hash_signer(
+            signed_meta_transaction.hash, signed_meta_transaction.signature
+        )
+        return signer is not None and signer == owner
+
+    def pre_validate_time_limit(self, meta_transaction: MetaTransaction):
+        """Validates the time limit against the cached timestamp of the latest
+        block.
+
+        As the cached timestamp is never ahead of the chain, only meta
+        transactions that the identity contract rejects as well fail.
+        """
+        if meta_transaction.time_limit == 0:
+            return True
+        return meta_transaction.time_limit >= self.get_latest_block_timestamp()
+
+    def get_identity_owner(self, identity_address: str) -> bytes:
+        """Returns the canonical address of the owner of an identity, which
+        is fetched only once per identity.
+
+        Will raise UnexpectedIdentityContractException, if it could not find
+        the owner function in the contract.
+        """
+        owner = self._identity_owners.get(identity_address)
+        if owner is None:
+            contract = self._get_identity_contract(identity_address)
+            try:
+                owner = to_canonical_address(contract.functions.owner().call())
+            except BadFunctionCallOutput:
+                raise OwnerFunctionNotFound
+            # the owner of an identity that is not yet initialized can still change
+            if owner != to_canonical_address(ZERO_ADDRESS):
+                self._identity_owners[identity_address] = owner
+        return owner
+
+    def get_latest_block_timestamp(self) -> int:
+        """Returns the timestamp of the latest block, cached for
+        `block_timestamp_max_age` seconds"""
+        now = self._clock()
+        if (
+            self._latest_block_timestamp is None
+            or now - self._latest_block_timestamp[1] > self.block_timestamp_max_age
+        ):
+            timestamp = self._web3.eth.getBlock("latest")["timestamp"]
+            self._latest_block_timestamp = (timestamp, now)
+        return self._latest_block_timestamp[0]
+
+    def check_meta_transaction(
+        self, signed_meta_transaction: MetaTransaction
+    ) -> MetaTransactionValidation:
+        """Returns the result of every check of `validate_meta_transaction`
+
+        See `check_meta_transactions`.
+        """
+        return self.check_meta_transactions([signed_meta_transaction])[0]
+
+    def check_meta_transactions(
+        self, signed_meta_transactions: Sequence[MetaTransaction]
+    ) -> List[MetaTransactionValidation]:
+        """Returns the result of every check of `validate_meta_transaction`
+        for many meta transactions.
+
+        Unlike `validate_meta_transaction`, all checks are done even if one
+        of them fails. If the delegate has a multicall contract, the checks of
+        all meta transactions are done with a single eth_call, otherwise every
+        check is a separate call.
+        Will raise UnexpectedIdentityContractException, if it could not find
+        a check in the contract.
+        """
+        if self._multicall_contract is None:
+            return [
+                MetaTransactionValidation(
+                    chain_id=self.validate_chain_id(meta_transaction),
+                    nonce=self.validate_nonce(meta_transaction),
+                    signature=self.validate_signature(meta_transaction),
+                    time_limit=self.validate_time_limit(meta_transaction),
+                )
+                for meta_transaction in signed_meta_transactions
+            ]
+
+        targets: List[str] = []
+        data: List[str] = []
+        for meta_transaction in signed_meta_transactions:
+            from_ = meta_transaction.from_
+            if from_ is None:
+                raise ValueError("From has to be set")
+            contract = self._get_identity_contract(from_)
+            targets += [from_] * 3
+            data += [
+                contract.encodeABI(
+                    fn_name="validateNonce",
+                    args=[meta_transaction.nonce, meta_transaction.hash],
+                ),
+                contract.encodeABI(
+                    fn_name="validateSignature",
+                    args=[meta_transaction.hash, meta_transaction.signature],
+                ),
+                contract.encodeABI(
+                    fn_name="validateTimeLimit", args=[meta_transaction.time_limit]
+                ),
+            ]
+        successes, results = self._multicall_contract.functions.tryAggregate(
+            targets, data
+        ).call()
+
+        chain_id = self.get_chain_id()
+        validations = []
+        for index, meta_transaction in enumerate(signed_meta_transactions):
+            nonce, signature, time_limit = [
+                _decode_check_result(successes[i], results[i], not_found_exception)
+                for i, not_found_exception in zip(
+                    range(3 * index, 3 * index + 3),
+                    [
+                        ValidateNonceNotFound,
+                        ValidateSignatureNotFound,
+                        ValidateTimeLimitNotFound,
+                    ],
+                )
+            ]
+            if not nonce:
+                self._resync_nonce(meta_transaction)
+            validations.append(
+                MetaTransactionValidation(
+                    chain_id=meta_transaction.chain_id == chain_id,
+                    nonce=nonce,
+                    signature=signature,
+                    time_limit=time_limit,
+                )
+            )
+        return validations
+
     def validate_nonce(self, signed_meta_transaction: MetaTransaction):
         """Validates the nonce by using the provided check by the identity
         contract.
@@ -269,6 +735,8 @@ class Delegate:
         except BadFunctionCallOutput:
             raise ValidateNonceNotFound
 
+        if not nonce_valid:
+            self._resync_nonce(signed_meta_transaction)
         return nonce_valid
 
     def validate_signature(self, signed_meta_transaction: MetaTransaction):
@@ -318,14 +786,23 @@ class Delegate:
 
         Returns: True, if the chain id was correct
         """
-        return meta_transaction.chain_id == get_chain_id(self._web3)
+        return meta_transaction.chain_id == self.get_chain_id()
+
+    def get_chain_id(self) -> int:
+        if self._chain_id is not None:
+            return self._chain_id
+        return get_chain_id(self._web3)
 
     def get_next_nonce(self, identity_address: str):
         """Returns the next usable nonce.
 
+        With a nonce manager, the nonce is reserved, so that the next call
+        returns the following nonce.
         Will raise UnexpectedIdentityContractException, if  it could not
         find the necessary function in the contract.
         """
+        if self.nonce_manager is not None:
+            return self.nonce_manager.allocate_nonce(identity_address)
         contract = self._get_identity_contract(identity_address)
         try:
             next_nonce = contract.functions.lastNonce().call() + 1
@@ -333,8 +810,17 @@ class Delegate:
             raise LastNonceFunctionNotFound
         return next_nonce
 
-    def _get_identity_contract(self, address: str):
-        return self._web3.eth.contract(abi=self._identity_contract_abi, address=address)
+    def _build_identity_contract(self, address: str):
+        return self._identity_contract_factory(address=address)
+
+    def _resync_nonce(self, meta_transaction: MetaTransaction):
+        if (
+            self.nonce_manager is not None
+            and meta_transaction.from_ is not None
+            and meta_transaction.nonce is not None
+            and not is_hash_replay_nonce(meta_transaction.nonce)
+        ):
+            self.nonce_manager.resync(meta_transaction.from_)
 
     def _meta_transaction_function_call(self, signed_meta_transaction: MetaTransaction):
         from_ = signed_meta_transaction.from_
@@ -379,9 +865,20 @@ class Delegate:
 
 
 class Identity:
-    def __init__(self, *, contract, owner_private_key: PrivateKey):
+    def __init__(
+        self,
+        *,
+        contract,
+        owner_private_key: PrivateKey,
+        chain_id: int = None,
+        nonce_manager: IdentityNonceManager = None,
+    ):
         self.contract = contract
         self._owner_private_key = owner_private_key
+        # per default the cached chain id of the web3 instance of the contract
+        self._chain_id = chain_id
+        # if given, nonces are handed out without calling the contract
+        self.nonce_manager = nonce_manager
 
     @property
     def address(self):
@@ -400,7 +897,7 @@ class Identity:
             )
         if meta_transaction.chain_id is None:
             meta_transaction = attr.evolve(
-                meta_transaction, chain_id=get_chain_id(self.contract.web3)
+                meta_transaction, chain_id=self.get_chain_id()
             )
 
         return meta_transaction
@@ -417,12 +914,19 @@ class Identity:
         meta_transaction = self.signed_meta_transaction(meta_transaction)
         return meta_transaction
 
+    def get_chain_id(self) -> int:
+        if self._chain_id is not None:
+            return self._chain_id
+        return get_chain_id(self.contract.web3)
+
     def get_next_nonce(self):
+        if self.nonce_manager is not None:
+            return self.nonce_manager.allocate_nonce(self.address)
         return self.contract.functions.lastNonce().call() + 1
 
 
 def get_pinned_proxy_interface():
-    with open(pkg_resources.resource_filename(__name__, "identity-proxy.json")) as file:
+    with open(os.path.join(os.path.dirname(__file__), "identity-proxy.json")) as file:
         return json.load(file)["Proxy"]
 
 
@@ -489,15 +993,15 @@ def deploy_proxied_identity(
         constructor_args=[owner],
     )
 
-    factory_interface = get_contract_interface("IdentityProxyFactory")
-    factory = web3.eth.contract(address=factory_address, abi=factory_interface["abi"])
+    factory = get_contract(web3, "IdentityProxyFactory", factory_address)
 
     function_call = factory.functions.deployProxy(
         initcode, implementation_address, signature
     )
-    receipt = send_function_call_transaction(
+    receipt = send_contract_transaction(
         function_call,
         web3=web3,
+        contract_name="IdentityProxyFactory",
         transaction_options=transaction_options,
         private_key=private_key,
     )
@@ -511,11 +1015,7 @@ def deploy_proxied_identity(
         computed_proxy_address == proxy_address
     ), "The computed proxy address does not match the deployed address found via events"
 
-    identity_interface = get_contract_interface("Identity")
-    proxied_identity = web3.eth.contract(
-        address=proxy_address, abi=identity_interface["abi"]
-    )
-    return proxied_identity
+    return get_contract(web3, "Identity", proxy_address)
 
 
 def recover_proxy_deployment_signature_owner(
@@ -526,11 +1026,3 @@ def recover_proxy_deployment_signature_owner(
     signed_hash = Web3.solidityKeccak(abi_types, signed_values)
     owner = web3.eth.account.recoverHash(signed_hash, signature=signature)
     return owner
-
-
-def build_create2_address(deployer_address, bytecode, salt="0x" + "00" * 32):
-    hashed_bytecode = Web3.solidityKeccak(["bytes"], [bytecode])
-    to_hash = ["0xff", deployer_address, salt, hashed_bytecode]
-    abi_types = ["bytes1", "address", "bytes32", "bytes32"]
-
-    return to_checksum_address(Web3.solidityKeccak(abi_types, to_hash)[12:])
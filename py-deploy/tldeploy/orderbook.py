@@ -0,0 +1,333 @@
+import bisect
+import heapq
+from fractions import Fraction
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from tldeploy.exchange import Order, is_rounding_error
+
+Signature = Tuple[int, bytes, bytes]
+TokenPair = Tuple[str, str]
+
+
+def get_price(order: Order) -> Fraction:
+    """Returns the amount of taker token the taker pays per maker token"""
+    return Fraction(order.taker_token_amount, order.maker_token_amount)
+
+
+class _PriceLevels:
+    """Order hashes of one token pair, grouped by price"""
+
+    def __init__(self):
+        # sorted list of the prices, the best price for the taker first
+        self.prices: List[Fraction] = []
+        # order hashes by price, dicts are used as ordered sets
+        self.levels: Dict[Fraction, Dict[bytes, None]] = {}
+
+    def add(self, price: Fraction, order_hash: bytes) -> None:
+        level = self.levels.get(price)
+        if level is None:
+            level = self.levels[price] = {}
+            bisect.insort(self.prices, price)
+        level[order_hash] = None
+
+    def remove(self, price: Fraction, order_hash: bytes) -> None:
+        level = self.levels[price]
+        del level[order_hash]
+        if not level:
+            del self.levels[price]
+            del self.prices[bisect.bisect_left(self.prices, price)]
+
+    def __iter__(self) -> Iterator[bytes]:
+        for price in self.prices:
+            yield from self.levels[price]
+
+    def __bool__(self) -> bool:
+        return bool(self.prices)
+
+
+class OrderBook:
+    """Signed orders of the exchange contract indexed by token pair and price
+
+    The orders of a pair `(maker_token, taker_token)` are sorted by the
+    amount of taker token paid per maker token, so that the best orders for a
+    taker come first. Orders of the same price keep the order in which they
+    were added.
+    Filled and cancelled amounts are tracked like in the exchange contract and
+    orders that are no longer available are removed from the book. The
+    amounts of an order are kept until it expires, so that it is not added
+    again, and are dropped by `remove_expired`. Fills and cancels of orders
+    that were never added are ignored, the amounts of an order known from
+    elsewhere, e.g. an `ExchangeEventFollower`, can be given to `add`.
+    """
+
+    def __init__(self):
+        self._orders: Dict[bytes, Tuple[Order, Signature]] = {}
+        self._pairs: Dict[TokenPair, _PriceLevels] = {}
+        # heap of (expiration_timestamp_in_sec, order_hash) of the orders in the
+        # book or with tracked amounts, entries of orders that were removed
+        # otherwise are skipped when popped and pruned once they make up most
+        # of the heap
+        self._expirations: List[Tuple[int, bytes]] = []
+        self._filled: Dict[bytes, int] = {}
+        self._cancelled: Dict[bytes, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_hash: bytes) -> bool:
+        return order_hash in self._orders
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Iterate over the hashes of the orders in the book"""
+        return iter(self._orders)
+
+    def get(self, order_hash: bytes) -> Optional[Order]:
+        entry = self._orders.get(order_hash)
+        return entry[0] if entry is not None else None
+
+    def get_signature(self, order_hash: bytes) -> Optional[Signature]:
+        entry = self._orders.get(order_hash)
+        return entry[1] if entry is not None else None
+
+    def add(
+        self,
+        order: Order,
+        signature: Signature,
+        *,
+        filled_taker_token_amount: int = 0,
+        cancelled_taker_token_amount: int = 0,
+    ) -> bytes:
+        """Add a signed order and return its hash
+
+        The given amounts are the total filled and cancelled amounts of the
+        order known from elsewhere, they replace smaller tracked amounts. Orders
+        that are already fully filled or cancelled are not added.
+        """
+        if order.maker_token_amount <= 0 or order.taker_token_amount <= 0:
+            raise ValueError("Token amounts of orders must be positive.")
+
+        order_hash = order.hash()
+        if order_hash in self._orders:
+            return order_hash
+        if filled_taker_token_amount > self._filled.get(order_hash, 0):
+            self._filled[order_hash] = filled_taker_token_amount
+        if cancelled_taker_token_amount > self._cancelled.get(order_hash, 0):
+            self._cancelled[order_hash] = cancelled_taker_token_amount
+        if self.get_remaining_taker_token_amount(order_hash, order) == 0:
+            # drop the amounts of the order once it expires
+            heapq.heappush(
+                self._expirations, (order.expiration_timestamp_in_sec, order_hash)
+            )
+            self._prune_expirations()
+            return order_hash
+
+        self._orders[order_hash] = (order, signature)
+        pair = (order.maker_token, order.taker_token)
+        self._pairs.setdefault(pair, _PriceLevels()).add(get_price(order), order_hash)
+        heapq.heappush(
+            self._expirations, (order.expiration_timestamp_in_sec, order_hash)
+        )
+        return order_hash
+
+    def remove(self, order_hash: bytes) -> Optional[Order]:
+        """Remove an order from the book and return it"""
+        entry = self._orders.pop(order_hash, None)
+        if entry is None:
+            return None
+        order = entry[0]
+        pair = (order.maker_token, order.taker_token)
+        price_levels = self._pairs[pair]
+        price_levels.remove(get_price(order), order_hash)
+        if not price_levels:
+            del self._pairs[pair]
+        self._prune_expirations()
+        return order
+
+    def _prune_expirations(self) -> None:
+        """Drop the stale entries of `_expirations` once they are more than
+        half of the heap"""
+        tracked_count = len(self._orders) + len(self._filled) + len(self._cancelled)
+        if len(self._expirations) <= 2 * tracked_count:
+            return
+        self._expirations = [
+            (expiration, order_hash)
+            for expiration, order_hash in set(self._expirations)
+            if self._is_known(order_hash)
+        ]
+        heapq.heapify(self._expirations)
+
+    def remove_expired(self, timestamp: int) -> List[Order]:
+        """Remove all orders that are expired at `timestamp` and return them
+
+        The filled and cancelled amounts of expired orders are dropped.
+        """
+        expired_orders = []
+        while self._expirations and self._expirations[0][0] <= timestamp:
+            _, order_hash = heapq.heappop(self._expirations)
+            order = self.remove(order_hash)
+            if order is not None:
+                expired_orders.append(order)
+            self._filled.pop(order_hash, None)
+            self._cancelled.pop(order_hash, None)
+        return expired_orders
+
+    def _is_known(self, order_hash: bytes) -> bool:
+        # only added orders have an entry in `_expirations`, so that their
+        # amounts are dropped once they expire
+        return (
+            order_hash in self._orders
+            or order_hash in self._filled
+            or order_hash in self._cancelled
+        )
+
+    def record_fill(self, order_hash: bytes, filled_taker_token_amount: int) -> None:
+        """Records a fill of an order that was added, fills of other orders
+        are ignored"""
+        if not self._is_known(order_hash):
+            return
+        self._filled[order_hash] = (
+            self._filled.get(order_hash, 0) + filled_taker_token_amount
+        )
+        self._remove_if_unavailable(order_hash)
+
+    def record_cancel(
+        self, order_hash: bytes, cancelled_taker_token_amount: int
+    ) -> None:
+        """Records a cancel of an order that was added, cancels of other orders
+        are ignored"""
+        if not self._is_known(order_hash):
+            return
+        self._cancelled[order_hash] = (
+            self._cancelled.get(order_hash, 0) + cancelled_taker_token_amount
+        )
+        self._remove_if_unavailable(order_hash)
+
+    def _remove_if_unavailable(self, order_hash: bytes) -> None:
+        if (
+            order_hash in self._orders
+            and self.get_remaining_taker_token_amount(order_hash) == 0
+        ):
+            self.remove(order_hash)
+
+    def get_filled_taker_token_amount(self, order_hash: bytes) -> int:
+        return self._filled.get(order_hash, 0)
+
+    def get_cancelled_taker_token_amount(self, order_hash: bytes) -> int:
+        return self._cancelled.get(order_hash, 0)
+
+    def get_unavailable_taker_token_amount(self, order_hash: bytes) -> int:
+        """Same as `getUnavailableTakerTokenAmount` of the exchange contract"""
+        return self._filled.get(order_hash, 0) + self._cancelled.get(order_hash, 0)
+
+    def get_remaining_taker_token_amount(
+        self, order_hash: bytes, order: Order = None
+    ) -> int:
+        if order is None:
+            order = self._orders[order_hash][0]
+        return max(
+            order.taker_token_amount
+            - self.get_unavailable_taker_token_amount(order_hash),
+            0,
+        )
+
+    def orders(self, maker_token: str, taker_token: str) -> Iterator[Order]:
+        """Iterate over the orders of a pair, the best orders first"""
+        price_levels = self._pairs.get((maker_token, taker_token))
+        if price_levels is None:
+            return
+        for order_hash in price_levels:
+            yield self._orders[order_hash][0]
+
+    def select_orders(
+        self,
+        maker_token: str,
+        taker_token: str,
+        fill_taker_token_amount: int,
+        *,
+        timestamp: int = None,
+    ) -> List[Tuple[Order, int]]:
+        """Select the best orders to fill `fill_taker_token_amount`
+
+        Returns the orders with the amount of taker token to fill for each.
+        Orders that are expired at `timestamp` and fills that the exchange
+        contract would reject because of a rounding error are skipped.
+        The returned amounts may add up to less than `fill_taker_token_amount`
+        if there are not enough orders.
+        """
+        selected_orders = []
+        amount_left = fill_taker_token_amount
+        for order in self.orders(maker_token, taker_token):
+            if amount_left == 0:
+                break
+            if timestamp is not None and timestamp >= order.expiration_timestamp_in_sec:
+                continue
+            amount = min(
+                self.get_remaining_taker_token_amount(order.hash(), order), amount_left
+            )
+            if is_rounding_error(
+                amount, order.taker_token_amount, order.maker_token_amount
+            ):
+                continue
+            selected_orders.append((order, amount))
+            amount_left -= amount
+        return selected_orders
+
+    def _signature_args(self, orders: List[Order]) -> Tuple[List, List, List]:
+        signatures = [self._orders[order.hash()][1] for order in orders]
+        return (
+            [v for v, r, s in signatures],
+            [r for v, r, s in signatures],
+            [s for v, r, s in signatures],
+        )
+
+    def fill_orders_up_to_args(
+        self,
+        maker_token: str,
+        taker_token: str,
+        fill_taker_token_amount: int,
+        *,
+        timestamp: int = None,
+        should_throw_on_insufficient_balance_or_allowance: bool = False,
+    ) -> Tuple:
+        """Returns the arguments of `fillOrdersUpTo` of the exchange contract to
+        fill `fill_taker_token_amount` with the best orders"""
+        selected_orders = self.select_orders(
+            maker_token, taker_token, fill_taker_token_amount, timestamp=timestamp
+        )
+        orders = [order for order, _ in selected_orders]
+        v, r, s = self._signature_args(orders)
+        return (
+            [order.to_contract_args()[0] for order in orders],
+            [order.to_contract_args()[1] for order in orders],
+            sum(amount for _, amount in selected_orders),
+            should_throw_on_insufficient_balance_or_allowance,
+            v,
+            r,
+            s,
+        )
+
+    def batch_fill_orders_args(
+        self,
+        maker_token: str,
+        taker_token: str,
+        fill_taker_token_amount: int,
+        *,
+        timestamp: int = None,
+        should_throw_on_insufficient_balance_or_allowance: bool = False,
+    ) -> Tuple:
+        """Returns the arguments of `batchFillOrders` of the exchange contract
+        to fill `fill_taker_token_amount` with the best orders"""
+        selected_orders = self.select_orders(
+            maker_token, taker_token, fill_taker_token_amount, timestamp=timestamp
+        )
+        orders = [order for order, _ in selected_orders]
+        v, r, s = self._signature_args(orders)
+        return (
+            [order.to_contract_args()[0] for order in orders],
+            [order.to_contract_args()[1] for order in orders],
+            [amount for _, amount in selected_orders],
+            should_throw_on_insufficient_balance_or_allowance,
+            v,
+            r,
+            s,
+        )
@@ -0,0 +1,440 @@
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import attr
+import rlp
+from eth_utils import keccak, to_canonical_address, to_checksum_address
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from tldeploy.core import (
+    currency_network_init_function_call,
+    gas_estimate_cache,
+    get_chain_id,
+    get_contract,
+    get_contract_factory,
+    get_sender_address,
+)
+
+# Gas estimation does not work for calls to contracts that are deployed in the
+# same pipeline, because they do not exist yet when the call is sent.
+# These are the default gas limits used for such calls.
+CURRENCY_NETWORK_INIT_GAS = 500_000
+ADD_AUTHORIZED_ADDRESS_GAS = 100_000
+
+
+# called with the transaction hash, if already known, and the nonce of a
+# transaction before it is sent
+BeforeSendCallback = Optional[Callable[[Optional[bytes], int], None]]
+
+
+class PipelinedTransactionFailed(Exception):
+    pass
+
+
+class NonceAllocator:
+    """Hands out nonces of one sender to concurrent deployments
+
+    A nonce is only used up once the transaction sent with it was accepted,
+    so that a failing deployment does not leave a gap in the nonces. As the
+    lock is held while sending, the transactions are also sent in the order
+    of their nonces.
+    """
+
+    def __init__(self, next_nonce: int):
+        self._next_nonce = next_nonce
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def use_nonce(self) -> Iterator[int]:
+        """Yields the next nonce, which is used up if no exception is raised"""
+        with self._lock:
+            yield self._next_nonce
+            self._next_nonce += 1
+
+    @property
+    def next_nonce(self) -> int:
+        with self._lock:
+            return self._next_nonce
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class NetworkDeployment:
+    settings: Dict
+    contract: Any
+    duration: float
+
+
+def build_create_address(sender_address: str, nonce: int) -> str:
+    """Returns the address of a contract created by `sender_address` with
+    `nonce`"""
+    return to_checksum_address(
+        keccak(rlp.encode([to_canonical_address(sender_address), nonce]))[12:]
+    )
+
+
+class TransactionPipeline:
+    """Sends transactions back to back and waits for all receipts at once
+
+    Nonces are assigned locally, so that the transactions do not have to wait
+    for each other. Deployed contracts are returned at their precomputed
+    address right away and can be used to send follow up transactions.
+    As with the other deployment functions, the nonce in
+    `transaction_options` is increased for every sent transaction.
+    Pipelines sending concurrently for the same sender have to share a
+    `nonce_allocator`, the nonce in `transaction_options` is then ignored.
+    """
+
+    def __init__(
+        self,
+        *,
+        web3: Web3,
+        transaction_options: Dict = None,
+        private_key: bytes = None,
+        nonce_allocator: NonceAllocator = None,
+    ):
+        if transaction_options is None:
+            transaction_options = {}
+
+        self.web3 = web3
+        self.transaction_options = transaction_options
+        self.private_key = private_key
+
+        self.sender = get_sender_address(
+            web3, transaction_options=transaction_options, private_key=private_key
+        )
+
+        if nonce_allocator is None:
+            if "nonce" not in transaction_options:
+                transaction_options["nonce"] = web3.eth.getTransactionCount(
+                    self.sender, "pending"
+                )
+            nonce_allocator = NonceAllocator(transaction_options["nonce"])
+        self.nonce_allocator = nonce_allocator
+
+        self.transaction_hashes: List[bytes] = []
+
+    def deploy(
+        self,
+        contract_name: str,
+        *,
+        constructor_args=(),
+        before_send: BeforeSendCallback = None,
+    ):
+        """Send the deployment of `contract_name` and return the contract at
+        the address it will be deployed to"""
+        constructor = get_contract_factory(self.web3, contract_name).constructor(
+            *constructor_args
+        )
+        gas = None
+        if "gas" not in self.transaction_options:
+            gas = gas_estimate_cache.get_gas_limit(
+                constructor,
+                web3=self.web3,
+                contract_name=contract_name,
+                sender=self.sender,
+            )
+        _, nonce = self._send(constructor, gas=gas, before_send=before_send)
+        address = build_create_address(self.sender, nonce)
+        return get_contract(self.web3, contract_name, address)
+
+    def send(
+        self, function_call, *, gas: int = None, before_send: BeforeSendCallback = None
+    ) -> bytes:
+        """Send the transaction of `function_call` without waiting for it
+
+        `gas` is used if `transaction_options` do not contain a gas limit.
+        It has to be given for calls to contracts deployed in this pipeline.
+        `before_send` is called with the hash and nonce of the transaction
+        right before it is sent. The hash is only known in advance if the
+        transaction is signed with `private_key`, otherwise it is None.
+        """
+        transaction_hash, _ = self._send(
+            function_call, gas=gas, before_send=before_send
+        )
+        return transaction_hash
+
+    def _send(
+        self, function_call, *, gas: int = None, before_send: BeforeSendCallback = None
+    ) -> Tuple[bytes, int]:
+        """Returns the hash and nonce of the sent transaction"""
+        transaction_options = dict(self.transaction_options)
+        if "gas" not in transaction_options and gas is not None:
+            transaction_options["gas"] = gas
+        if "gasPrice" not in transaction_options:
+            transaction_options["gasPrice"] = gas_estimate_cache.get_gas_price(
+                self.web3
+            )
+
+        with self.nonce_allocator.use_nonce() as nonce:
+            transaction_options["nonce"] = nonce
+            if self.private_key is None:
+                transaction_options.setdefault("from", self.sender)
+                if before_send is not None:
+                    before_send(None, nonce)
+                transaction_hash = function_call.transact(transaction_options)
+            else:
+                transaction_options["from"] = self.sender
+                transaction = function_call.buildTransaction(transaction_options)
+                signed_transaction = self.web3.eth.account.sign_transaction(
+                    transaction, self.private_key
+                )
+                if before_send is not None:
+                    before_send(signed_transaction.hash, nonce)
+                transaction_hash = self.web3.eth.sendRawTransaction(
+                    signed_transaction.rawTransaction
+                )
+
+        self.transaction_options["nonce"] = nonce + 1
+        self.transaction_hashes.append(transaction_hash)
+        return transaction_hash, nonce
+
+    def wait(
+        self,
+        *,
+        timeout: float = 300,
+        poll_latency: float = 0.5,
+        on_receipt: Callable[[bytes, Dict], None] = None,
+    ) -> List:
+        """Wait for the receipts of all sent transactions
+
+        `on_receipt` is called with the transaction hash and receipt of every
+        transaction as soon as it is mined.
+        Returns the receipts in the order the transactions were sent. Raises
+        PipelinedTransactionFailed if one of them failed.
+        """
+        receipts: Dict[bytes, Dict] = {}
+        deadline = time.monotonic() + timeout
+        while True:
+            for transaction_hash in self.transaction_hashes:
+                if transaction_hash in receipts:
+                    continue
+                try:
+                    receipt = self.web3.eth.getTransactionReceipt(transaction_hash)
+                except TransactionNotFound:
+                    receipt = None
+                if receipt is not None:
+                    receipts[transaction_hash] = receipt
+                    if on_receipt is not None:
+                        on_receipt(transaction_hash, receipt)
+
+            if len(receipts) == len(self.transaction_hashes):
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"Only {len(receipts)} of {len(self.transaction_hashes)} "
+                    f"transactions were mined within {timeout} seconds."
+                )
+            time.sleep(poll_latency)
+
+        ordered_receipts = [
+            receipts[transaction_hash] for transaction_hash in self.transaction_hashes
+        ]
+        for receipt in ordered_receipts:
+            if receipt.get("status") == 0:
+                raise PipelinedTransactionFailed(
+                    "Transaction {} failed.".format(receipt["transactionHash"].hex())
+                )
+        return ordered_receipts
+
+
+def pipeline_exchange(pipeline: TransactionPipeline):
+    return pipeline.deploy("Exchange")
+
+
+def pipeline_unw_eth(
+    pipeline: TransactionPipeline,
+    *,
+    exchange_address=None,
+    add_authorized_address_gas: int = ADD_AUTHORIZED_ADDRESS_GAS,
+):
+    unw_eth = pipeline.deploy("UnwEth")
+    if exchange_address is not None:
+        pipeline.send(
+            unw_eth.functions.addAuthorizedAddress(exchange_address),
+            gas=add_authorized_address_gas,
+        )
+    return unw_eth
+
+
+def pipeline_identity_implementation(pipeline: TransactionPipeline):
+    return pipeline.deploy("Identity")
+
+
+def pipeline_identity_proxy_factory(pipeline: TransactionPipeline, *, chain_id=None):
+    if chain_id is None:
+        chain_id = get_chain_id(pipeline.web3)
+    return pipeline.deploy("IdentityProxyFactory", constructor_args=(chain_id,))
+
+
+def pipeline_network(
+    pipeline: TransactionPipeline,
+    name,
+    symbol,
+    decimals,
+    expiration_time,
+    fee_divisor=0,
+    default_interest_rate=0,
+    custom_interests=True,
+    prevent_mediator_interests=False,
+    exchange_address=None,
+    currency_network_contract_name=None,
+    authorized_addresses=None,
+    init_gas: int = CURRENCY_NETWORK_INIT_GAS,
+):
+    if authorized_addresses is None:
+        authorized_addresses = []
+    if currency_network_contract_name is None:
+        currency_network_contract_name = "CurrencyNetwork"
+
+    currency_network = pipeline.deploy(currency_network_contract_name)
+
+    if exchange_address is not None:
+        authorized_addresses.append(exchange_address)
+
+    init_function_call = currency_network_init_function_call(
+        currency_network,
+        name=name,
+        symbol=symbol,
+        decimals=decimals,
+        fee_divisor=fee_divisor,
+        default_interest_rate=default_interest_rate,
+        custom_interests=custom_interests,
+        prevent_mediator_interests=prevent_mediator_interests,
+        expiration_time=expiration_time,
+        authorized_addresses=authorized_addresses,
+    )
+    pipeline.send(init_function_call, gas=init_gas)
+    return currency_network
+
+
+def pipeline_networks(
+    pipeline: TransactionPipeline,
+    network_settings,
+    currency_network_contract_name=None,
+    *,
+    init_gas: int = CURRENCY_NETWORK_INIT_GAS,
+    add_authorized_address_gas: int = ADD_AUTHORIZED_ADDRESS_GAS,
+):
+    """Send the transactions of `tldeploy.core.deploy_networks` to `pipeline`
+    without waiting for them"""
+    exchange = pipeline_exchange(pipeline)
+    unw_eth = pipeline_unw_eth(
+        pipeline,
+        exchange_address=exchange.address,
+        add_authorized_address_gas=add_authorized_address_gas,
+    )
+    networks = [
+        pipeline_network(
+            pipeline,
+            exchange_address=exchange.address,
+            currency_network_contract_name=currency_network_contract_name,
+            init_gas=init_gas,
+            **network_setting,
+        )
+        for network_setting in network_settings
+    ]
+    return networks, exchange, unw_eth
+
+
+def deploy_networks_pipelined(
+    web3,
+    network_settings,
+    currency_network_contract_name=None,
+    transaction_options: Dict = None,
+    private_key: bytes = None,
+    *,
+    init_gas: int = CURRENCY_NETWORK_INIT_GAS,
+    add_authorized_address_gas: int = ADD_AUTHORIZED_ADDRESS_GAS,
+):
+    """Same as `tldeploy.core.deploy_networks`, but sends all transactions
+    back to back and only waits for the receipts at the end"""
+    pipeline = TransactionPipeline(
+        web3=web3, transaction_options=transaction_options, private_key=private_key
+    )
+    networks, exchange, unw_eth = pipeline_networks(
+        pipeline,
+        network_settings,
+        currency_network_contract_name,
+        init_gas=init_gas,
+        add_authorized_address_gas=add_authorized_address_gas,
+    )
+    pipeline.wait()
+
+    return networks, exchange, unw_eth
+
+
+def deploy_networks_concurrently(
+    web3,
+    network_settings,
+    currency_network_contract_name=None,
+    transaction_options: Dict = None,
+    private_key: bytes = None,
+    max_workers: int = 8,
+    *,
+    init_gas: int = CURRENCY_NETWORK_INIT_GAS,
+    add_authorized_address_gas: int = ADD_AUTHORIZED_ADDRESS_GAS,
+):
+    """Same as `tldeploy.core.deploy_networks`, but deploys the networks
+    concurrently in a thread pool
+
+    All deployments take their nonces from a shared `NonceAllocator` when
+    they send a transaction. Returns a list of `NetworkDeployment` in the
+    order of `network_settings`, holding the contract and the time it took to
+    deploy it, the exchange contract and the unwrapping ether contract.
+    """
+    if transaction_options is None:
+        transaction_options = {}
+
+    # the sender and first nonce are determined by the pipeline
+    exchange_pipeline = TransactionPipeline(
+        web3=web3,
+        transaction_options=dict(transaction_options),
+        private_key=private_key,
+    )
+    nonce_allocator = exchange_pipeline.nonce_allocator
+
+    exchange = pipeline_exchange(exchange_pipeline)
+    unw_eth = pipeline_unw_eth(
+        exchange_pipeline,
+        exchange_address=exchange.address,
+        add_authorized_address_gas=add_authorized_address_gas,
+    )
+
+    def deploy_one(network_setting):
+        start = time.monotonic()
+        pipeline = TransactionPipeline(
+            web3=web3,
+            transaction_options=dict(transaction_options),
+            private_key=private_key,
+            nonce_allocator=nonce_allocator,
+        )
+        contract = pipeline_network(
+            pipeline,
+            exchange_address=exchange.address,
+            currency_network_contract_name=currency_network_contract_name,
+            init_gas=init_gas,
+            **network_setting,
+        )
+        pipeline.wait()
+        return NetworkDeployment(
+            settings=network_setting,
+            contract=contract,
+            duration=time.monotonic() - start,
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(deploy_one, network_setting)
+            for network_setting in network_settings
+        ]
+        exchange_pipeline.wait()
+        deployments = [future.result() for future in futures]
+
+    if "nonce" in transaction_options:
+        transaction_options["nonce"] = nonce_allocator.next_nonce
+
+    return deployments, exchange, unw_eth
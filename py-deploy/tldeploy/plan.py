@@ -0,0 +1,383 @@
+"""Deploy a set of contracts described in a plan file
+
+A plan is a json object like:
+
+```
+{
+    "exchange": true,
+    "unwEth": true,
+    "identityImplementation": true,
+    "identityProxyFactory": true,
+    "networks": [
+        {"name": "Cash", "symbol": "CASH", "decimals": 4, "fee_divisor": 1000}
+    ]
+}
+```
+
+The settings of a network are the keyword arguments of
+`tldeploy.core.deploy_network`. If the plan contains an exchange, the networks
+and the unwrapping ether contract are connected to it.
+
+The plan is split into steps that each send one transaction. Steps that do not
+depend on each other are sent together. The progress is written to a manifest
+file right before every transaction is sent and after it is sent and
+confirmed, so that an interrupted deployment can be resumed without sending
+any transaction twice.
+"""
+import functools
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import attr
+from hexbytes import HexBytes
+from web3.exceptions import TransactionNotFound
+
+from tldeploy.core import (
+    currency_network_init_function_call,
+    get_chain_id,
+    get_contract,
+)
+from tldeploy.pipeline import TransactionPipeline
+
+NETWORK_SETTINGS_KEYS = {
+    "name",
+    "symbol",
+    "decimals",
+    "expiration_time",
+    "fee_divisor",
+    "default_interest_rate",
+    "custom_interests",
+    "prevent_mediator_interests",
+    "currency_network_contract_name",
+}
+
+SENDING = "sending"
+SENT = "sent"
+CONFIRMED = "confirmed"
+
+
+class InvalidPlan(Exception):
+    pass
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class DeployStep:
+    id: str
+    contract_name: str
+    constructor_args: Tuple = ()
+    depends_on: Tuple[str, ...] = ()
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class CallStep:
+    """Calls a function on the contract deployed by the step `contract_step`
+
+    `build_function_call` is called with the contract and the addresses of all
+    confirmed steps.
+    """
+
+    id: str
+    contract_step: str
+    contract_name: str
+    build_function_call: Callable
+    depends_on: Tuple[str, ...] = ()
+
+
+def load_plan(path: str) -> Dict:
+    with open(path) as f:
+        plan = json.load(f)
+    validate_plan(plan)
+    return plan
+
+
+def validate_plan(plan: Dict) -> None:
+    known_keys = {
+        "exchange",
+        "unwEth",
+        "identityImplementation",
+        "identityProxyFactory",
+        "networks",
+    }
+    unknown_keys = set(plan) - known_keys
+    if unknown_keys:
+        raise InvalidPlan(f"Unknown keys in plan: {sorted(unknown_keys)}")
+    for index, network_settings in enumerate(plan.get("networks", [])):
+        unknown_keys = set(network_settings) - NETWORK_SETTINGS_KEYS
+        if unknown_keys:
+            raise InvalidPlan(
+                f"Unknown settings for network {index}: {sorted(unknown_keys)}"
+            )
+        for key in ["name", "symbol", "decimals"]:
+            if key not in network_settings:
+                raise InvalidPlan(f"Missing setting {key} for network {index}")
+
+
+def get_plan_hash(plan: Dict) -> str:
+    return hashlib.sha256(json.dumps(plan, sort_keys=True).encode()).hexdigest()
+
+
+def build_steps(plan: Dict, *, chain_id: int) -> List:
+    steps: List = []
+    has_exchange = plan.get("exchange", False)
+
+    if has_exchange:
+        steps.append(DeployStep(id="exchange", contract_name="Exchange"))
+
+    if plan.get("unwEth", False):
+        steps.append(DeployStep(id="unwEth", contract_name="UnwEth"))
+        if has_exchange:
+            steps.append(
+                CallStep(
+                    id="unwEth.authorizeExchange",
+                    contract_step="unwEth",
+                    contract_name="UnwEth",
+                    build_function_call=lambda contract, addresses: (
+                        contract.functions.addAuthorizedAddress(addresses["exchange"])
+                    ),
+                    depends_on=("unwEth", "exchange"),
+                )
+            )
+
+    if plan.get("identityImplementation", False):
+        steps.append(DeployStep(id="identityImplementation", contract_name="Identity"))
+
+    if plan.get("identityProxyFactory", False):
+        steps.append(
+            DeployStep(
+                id="identityProxyFactory",
+                contract_name="IdentityProxyFactory",
+                constructor_args=(chain_id,),
+            )
+        )
+
+    for index, network_settings in enumerate(plan.get("networks", [])):
+        network_settings = dict(network_settings)
+        contract_name = network_settings.pop(
+            "currency_network_contract_name", "CurrencyNetwork"
+        )
+        network_settings.setdefault("expiration_time", 0)
+        deploy_step_id = f"networks.{index}"
+        steps.append(DeployStep(id=deploy_step_id, contract_name=contract_name))
+        depends_on: Tuple[str, ...] = (deploy_step_id,)
+        if has_exchange:
+            depends_on += ("exchange",)
+        steps.append(
+            CallStep(
+                id=f"{deploy_step_id}.init",
+                contract_step=deploy_step_id,
+                contract_name=contract_name,
+                build_function_call=_build_network_init(network_settings, has_exchange),
+                depends_on=depends_on,
+            )
+        )
+
+    return steps
+
+
+def _build_network_init(network_settings: Dict, has_exchange: bool):
+    def build_function_call(contract, addresses):
+        authorized_addresses = [addresses["exchange"]] if has_exchange else []
+        return currency_network_init_function_call(
+            contract, authorized_addresses=authorized_addresses, **network_settings
+        )
+
+    return build_function_call
+
+
+class Manifest:
+    """Progress of a plan deployment, stored as json at `path`"""
+
+    def __init__(self, path: str, plan_hash: str):
+        self.path = path
+        self.plan_hash = plan_hash
+        self.steps: Dict[str, Dict] = {}
+
+        if os.path.exists(path):
+            with open(path) as f:
+                content = json.load(f)
+            if content["planHash"] != plan_hash:
+                raise InvalidPlan(
+                    f"The manifest {path} belongs to a different plan. "
+                    "Remove it to start a new deployment."
+                )
+            self.steps = content["steps"]
+
+    def status(self, step_id: str) -> Optional[str]:
+        return self.steps.get(step_id, {}).get("status")
+
+    def addresses(self) -> Dict[str, str]:
+        return {
+            step_id: step["address"]
+            for step_id, step in self.steps.items()
+            if step["status"] == CONFIRMED and "address" in step
+        }
+
+    def set_sending(
+        self, step_id: str, sender: str, transaction_hash, nonce: int
+    ) -> None:
+        """Record a transaction that is about to be sent. Its hash is only
+        known if it is signed locally."""
+        step = {"status": SENDING, "from": sender, "nonce": nonce}
+        if transaction_hash is not None:
+            step["transactionHash"] = HexBytes(transaction_hash).hex()
+        self.steps[step_id] = step
+        self.save()
+
+    def set_sent(self, step_id: str, transaction_hash) -> None:
+        self.steps[step_id] = {
+            "status": SENT,
+            "transactionHash": HexBytes(transaction_hash).hex(),
+        }
+        self.save()
+
+    def set_confirmed(self, step_id: str, receipt) -> None:
+        step = {
+            "status": CONFIRMED,
+            "transactionHash": HexBytes(receipt["transactionHash"]).hex(),
+        }
+        if receipt.get("contractAddress"):
+            step["address"] = receipt["contractAddress"]
+        self.steps[step_id] = step
+        self.save()
+
+    def forget(self, step_id: str) -> None:
+        self.steps.pop(step_id, None)
+        self.save()
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"planHash": self.plan_hash, "steps": self.steps}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def execute_plan(
+    plan: Dict,
+    *,
+    web3,
+    manifest_path: str,
+    transaction_options: Dict = None,
+    private_key: bytes = None,
+    chain_id: int = None,
+    timeout: float = 300,
+) -> Dict[str, str]:
+    """Deploy the contracts of `plan` and return the addresses by step id
+
+    Steps that are confirmed in the manifest at `manifest_path` are skipped,
+    transactions that were sent but not confirmed are waited for.
+    """
+    if transaction_options is None:
+        transaction_options = {}
+    if chain_id is None:
+        chain_id = get_chain_id(web3)
+
+    steps = build_steps(plan, chain_id=chain_id)
+    manifest = Manifest(manifest_path, get_plan_hash(plan))
+
+    _recover_sent_steps(web3, manifest, timeout=timeout)
+
+    remaining = [step for step in steps if manifest.status(step.id) != CONFIRMED]
+    while remaining:
+        confirmed = {step.id for step in steps if manifest.status(step.id) == CONFIRMED}
+        ready = [
+            step
+            for step in remaining
+            if all(dependency in confirmed for dependency in step.depends_on)
+        ]
+        if not ready:
+            raise InvalidPlan("The plan contains unresolvable dependencies.")
+
+        pipeline = TransactionPipeline(
+            web3=web3, transaction_options=transaction_options, private_key=private_key
+        )
+        step_ids_by_hash = {}
+        addresses = manifest.addresses()
+        for step in ready:
+            before_send = functools.partial(
+                manifest.set_sending, step.id, pipeline.sender
+            )
+            if isinstance(step, DeployStep):
+                pipeline.deploy(
+                    step.contract_name,
+                    constructor_args=step.constructor_args,
+                    before_send=before_send,
+                )
+                transaction_hash = pipeline.transaction_hashes[-1]
+            else:
+                contract = get_contract(
+                    web3, step.contract_name, addresses[step.contract_step]
+                )
+                transaction_hash = pipeline.send(
+                    step.build_function_call(contract, addresses),
+                    before_send=before_send,
+                )
+            step_ids_by_hash[HexBytes(transaction_hash)] = step.id
+            manifest.set_sent(step.id, transaction_hash)
+
+        def on_receipt(transaction_hash, receipt):
+            if receipt.get("status") != 0:
+                manifest.set_confirmed(
+                    step_ids_by_hash[HexBytes(transaction_hash)], receipt
+                )
+
+        pipeline.wait(timeout=timeout, on_receipt=on_receipt)
+        remaining = [step for step in remaining if step not in ready]
+
+    return manifest.addresses()
+
+
+def _recover_sent_steps(web3, manifest: Manifest, *, timeout: float) -> None:
+    """Check the transactions that were sent by an interrupted run
+
+    Mined transactions are marked as confirmed, pending ones are waited for
+    and failed or dropped ones are forgotten, so that they are sent again.
+    Raises InvalidPlan if a transaction without a known hash might have been
+    sent, as it can not be checked.
+    """
+    pending_steps = {}
+    for step_id, step in list(manifest.steps.items()):
+        if step["status"] not in (SENT, SENDING):
+            continue
+        if "transactionHash" not in step:
+            # the transaction was about to be sent by the node
+            sent_nonce = web3.eth.getTransactionCount(step["from"], "pending")
+            if sent_nonce > step["nonce"]:
+                raise InvalidPlan(
+                    f"The transaction of step {step_id} might have been sent with "
+                    f"nonce {step['nonce']}. Check it and remove the step from "
+                    f"the manifest {manifest.path} to resume."
+                )
+            manifest.forget(step_id)
+            continue
+        transaction_hash = HexBytes(step["transactionHash"])
+        try:
+            transaction = web3.eth.getTransaction(transaction_hash)
+        except TransactionNotFound:
+            transaction = None
+        if transaction is None:
+            manifest.forget(step_id)
+            continue
+        pending_steps[step_id] = transaction_hash
+
+    for step_id, transaction_hash in pending_steps.items():
+        receipt = web3.eth.waitForTransactionReceipt(transaction_hash, timeout=timeout)
+        if receipt.get("status") == 0:
+            manifest.forget(step_id)
+        else:
+            manifest.set_confirmed(step_id, receipt)
+
+
+def get_plan_addresses(plan: Dict, addresses: Dict[str, str]) -> Dict:
+    """Format the addresses of a deployed plan like the `test` command"""
+    result: Dict = {
+        "networks": [
+            addresses[f"networks.{index}"]
+            for index in range(len(plan.get("networks", [])))
+        ]
+    }
+    for key in ["exchange", "unwEth", "identityImplementation", "identityProxyFactory"]:
+        if key in addresses:
+            result[key] = addresses[key]
+    return result
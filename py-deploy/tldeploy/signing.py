@@ -1,9 +1,24 @@
-from typing import List, Tuple, Union
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple, Union
 
 from eth_keys import keys
-from eth_keys.exceptions import BadSignature
+from eth_keys.exceptions import BadSignature, ValidationError
+from eth_utils import keccak, to_canonical_address
+from hexbytes import HexBytes
 from web3 import Web3
 
+try:
+    import coincurve
+except ImportError:
+    coincurve = None
+
+ETH_SIGNED_MESSAGE_PREFIX = b"\x19Ethereum Signed Message:\n32"
+
+# batches are split into chunks of at least this size when using processes,
+# smaller chunks are not worth the overhead
+DEFAULT_CHUNK_SIZE = 1000
+
 
 def eth_sign(hash: bytes, key: bytes):
     v, r, s = (
@@ -18,6 +33,166 @@ def eth_sign(hash: bytes, key: bytes):
     return v, r, s
 
 
+def _build_eth_signer(key: bytes) -> Callable[[bytes], Tuple[int, bytes, bytes]]:
+    """Returns a function that signs hashes like `eth_sign` with `key`
+
+    The key is only parsed once and coincurve is used directly if installed.
+    Both backends create the same deterministic signatures.
+    """
+    if coincurve is not None:
+        coincurve_key = coincurve.PrivateKey(key)
+
+        def sign(hash: bytes) -> Tuple[int, bytes, bytes]:
+            signature = coincurve_key.sign_recoverable(
+                keccak(ETH_SIGNED_MESSAGE_PREFIX + hash), hasher=None
+            )
+            return signature[64] + 27, signature[:32], signature[32:64]
+
+    else:
+        private_key = keys.PrivateKey(key)
+
+        def sign(hash: bytes) -> Tuple[int, bytes, bytes]:
+            v, r, s = private_key.sign_msg_hash(
+                keccak(ETH_SIGNED_MESSAGE_PREFIX + hash)
+            ).vrs
+            return (
+                v + 27,
+                r.to_bytes(32, byteorder="big"),
+                s.to_bytes(32, byteorder="big"),
+            )
+
+    return sign
+
+
+def _sign_chunk(key: bytes, hashes: Sequence[bytes]) -> List[Tuple[int, bytes, bytes]]:
+    sign = _build_eth_signer(key)
+    return [sign(hash) for hash in hashes]
+
+
+def sign_many(
+    hashes: Sequence[bytes],
+    key: bytes,
+    *,
+    processes: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> List[Tuple[int, bytes, bytes]]:
+    """Sign all `hashes` like `eth_sign` and return the list of (v, r, s)
+
+    If `processes` is given, batches of more than `chunk_size` hashes are split
+    into chunks that are signed in a pool of that many processes.
+    """
+    return _map_chunks(
+        functools.partial(_sign_chunk, key),
+        hashes,
+        processes=processes,
+        chunk_size=chunk_size,
+    )
+
+
+def _map_chunks(
+    function: Callable[[Sequence], List], items: Sequence, *, processes, chunk_size
+) -> List:
+    """Apply `function` to chunks of `items` in a pool of `processes`
+    processes and return the concatenated results"""
+    if processes is None or len(items) <= chunk_size:
+        return function(items)
+
+    chunk_size = max(chunk_size, -(-len(items) // processes))
+    chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return [
+            result
+            for chunk_results in executor.map(function, chunks)
+            for result in chunk_results
+        ]
+
+
+def _to_int(value: Union[int, bytes]) -> int:
+    if isinstance(value, bytes):
+        return int.from_bytes(value, byteorder="big")
+    return value
+
+
+def _recover_signer(msg_hash: bytes, v: int, r: int, s: int) -> Optional[bytes]:
+    try:
+        if coincurve is not None:
+            signature = (
+                r.to_bytes(32, byteorder="big")
+                + s.to_bytes(32, byteorder="big")
+                + bytes([v])
+            )
+            public_key = coincurve.PublicKey.from_signature_and_message(
+                signature, msg_hash, hasher=None
+            )
+            return keccak(public_key.format(compressed=False)[1:])[12:]
+        return (
+            keys.Signature(vrs=(v, r, s))
+            .recover_public_key_from_msg_hash(msg_hash)
+            .to_canonical_address()
+        )
+    except (BadSignature, ValidationError, ValueError, OverflowError):
+        return None
+
+
+def _recover_eth_signer(msg_hash: bytes, vrs) -> Optional[bytes]:
+    """Returns the canonical address that signed `msg_hash` like `eth_sign`,
+    or None if the signature is invalid"""
+    v, r, s = (_to_int(value) for value in vrs)
+    if v >= 27:
+        v -= 27
+    return _recover_signer(keccak(ETH_SIGNED_MESSAGE_PREFIX + msg_hash), v, r, s)
+
+
+def recover_msg_hash_signer(msg_hash: bytes, signature: bytes) -> Optional[bytes]:
+    """Returns the canonical address that signed `msg_hash` like
+    `sign_msg_hash`, or None if the signature is invalid
+
+    Mirrors `ECDSA.recover` of the contracts, which accepts v as 0 or 1 and
+    as 27 or 28.
+    """
+    if signature is None or len(signature) != 65:
+        return None
+    v = signature[64]
+    if v < 27:
+        v += 27
+    if v not in (27, 28):
+        return None
+    return _recover_signer(
+        msg_hash,
+        v - 27,
+        int.from_bytes(signature[:32], byteorder="big"),
+        int.from_bytes(signature[32:64], byteorder="big"),
+    )
+
+
+def _validate_chunk(signed_hashes: Sequence[Tuple]) -> List[bool]:
+    return [
+        _recover_eth_signer(msg_hash, vrs) == address
+        for msg_hash, vrs, address in signed_hashes
+    ]
+
+
+def validate_many(
+    signed_hashes: Sequence[Tuple[bytes, Tuple, Union[str, bytes]]],
+    *,
+    processes: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> List[bool]:
+    """Validate many `(msg_hash, vrs, address)` tuples like `eth_validate`
+
+    The recovered signers are compared to the addresses as raw 20 bytes.
+    If `processes` is given, batches of more than `chunk_size` signatures are
+    validated in a pool of that many processes.
+    """
+    signed_hashes = [
+        (msg_hash, vrs, to_canonical_address(address))
+        for msg_hash, vrs, address in signed_hashes
+    ]
+    return _map_chunks(
+        _validate_chunk, signed_hashes, processes=processes, chunk_size=chunk_size
+    )
+
+
 def eth_validate(
     msg_hash: bytes,
     vrs: Tuple[Union[int, bytes], Union[int, bytes], Union[int, bytes]],
@@ -50,5 +225,71 @@ def solidity_keccak(abi_types: List, values: List) -> bytes:
     return Web3.solidityKeccak(abi_types, values)
 
 
+def _to_raw_bytes(value: Union[str, bytes]) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return value
+
+
+def _build_field_packer(abi_type: str):
+    """Returns the size of the packed `abi_type` and a function that converts
+    a value to its packed bytes"""
+    if abi_type == "address":
+        return 20, _to_raw_bytes
+    if abi_type == "bool":
+        return 1, lambda value: b"\x01" if value else b"\x00"
+    for prefix, signed in [("uint", False), ("int", True)]:
+        if abi_type.startswith(prefix):
+            size = int(abi_type[len(prefix) :] or 256) // 8
+            return (
+                size,
+                lambda value: value.to_bytes(size, byteorder="big", signed=signed),
+            )
+    if abi_type.startswith("bytes") and abi_type != "bytes":
+        size = int(abi_type[len("bytes") :])
+        # like solidity_keccak, short values are not padded, so they are
+        # rejected when packed
+        return size, _to_raw_bytes
+    raise ValueError(f"Can not pack values of type {abi_type} into a fixed size")
+
+
+class SolidityKeccakPacker:
+    """Computes `solidity_keccak(abi_types, values)` for fixed `abi_types`
+
+    The layout of the packed values is computed once, so that every call only
+    writes the values into one buffer and hashes it. In contrast to
+    `solidity_keccak`, the values are not validated, e.g. addresses do not
+    need to be checksummed. Only types with a fixed size are supported and
+    values of `bytesN` types have to be exactly N bytes long.
+    """
+
+    def __init__(self, abi_types: Sequence[str]):
+        self.abi_types = tuple(abi_types)
+        # (start, end, pack) of every field in the packed buffer
+        self._fields: List[Tuple[int, int, Callable]] = []
+        offset = 0
+        for abi_type in self.abi_types:
+            size, pack = _build_field_packer(abi_type)
+            self._fields.append((offset, offset + size, pack))
+            offset += size
+        self.size = offset
+
+    def pack(self, values: Sequence) -> bytearray:
+        if len(values) != len(self._fields):
+            raise ValueError(
+                f"Expected {len(self._fields)} values, but got {len(values)}"
+            )
+        buffer = bytearray(self.size)
+        for (start, end, pack), value in zip(self._fields, values):
+            packed = pack(value)
+            if len(packed) != end - start:
+                raise ValueError(f"Can not pack {value!r} into {end - start} bytes")
+            buffer[start:end] = packed
+        return buffer
+
+    def __call__(self, values: Sequence) -> HexBytes:
+        return HexBytes(keccak(self.pack(values)))
+
+
 def sign_msg_hash(hash: bytes, key: keys.PrivateKey) -> bytes:
     return key.sign_msg_hash(hash).to_bytes()
@@ -0,0 +1,329 @@
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import attr
+
+from tldeploy.exchange import (
+    ExchangeError,
+    Order,
+    get_partial_amount,
+    is_rounding_error,
+)
+
+NULL_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# `MAX_FEE` of the exchange contract used for the trustline transfers
+EXCHANGE_MAX_FEE = 100
+
+# the exchange contract casts the transferred amounts to uint32
+UINT32_MASK = 2 ** 32 - 1
+
+
+class TransferError(Exception):
+    """A transfer along a path that the currency network would revert"""
+
+
+def calculate_fees_reverse(
+    imbalance_generated: int, capacity_imbalance_fee_divisor: int
+) -> int:
+    """Same as `_calculateFeesReverse` of the currency network contract"""
+    if capacity_imbalance_fee_divisor == 0 or imbalance_generated == 0:
+        return 0
+    return (imbalance_generated - 1) // (capacity_imbalance_fee_divisor - 1) + 1
+
+
+def imbalance_generated(value: int, balance: int) -> int:
+    """Same as `_imbalanceGenerated` of the currency network contract"""
+    if balance > 0:
+        return max(value - balance, 0)
+    return value
+
+
+class TrustlineSnapshot:
+    """Balances and creditlines of the trustlines of one currency network
+
+    Every trustline is stored once as a list of
+    `[balance, creditline_given, creditline_received, is_frozen]` from the view
+    of one of its two users, and looked up in both directions. Interests are
+    not applied to the balances.
+    """
+
+    def __init__(
+        self,
+        capacity_imbalance_fee_divisor: int = 0,
+        *,
+        is_network_frozen: bool = False,
+    ):
+        self.capacity_imbalance_fee_divisor = capacity_imbalance_fee_divisor
+        self.is_network_frozen = is_network_frozen
+        # (a, b) -> (trustline, whether the trustline is stored from the view of a)
+        self._trustlines: Dict[Tuple[str, str], Tuple[List, bool]] = {}
+
+    @classmethod
+    def from_contract(cls, currency_network_contract) -> "TrustlineSnapshot":
+        """Load all trustlines of a currency network contract"""
+        functions = currency_network_contract.functions
+        snapshot = cls(
+            functions.capacityImbalanceFeeDivisor().call(),
+            is_network_frozen=functions.isNetworkFrozen().call(),
+        )
+        for user in functions.getUsers().call():
+            for friend in functions.getFriends(user).call():
+                if snapshot.has_trustline(user, friend):
+                    continue
+                (
+                    creditline_given,
+                    creditline_received,
+                    _,
+                    _,
+                    is_frozen,
+                    _,
+                    balance,
+                ) = functions.getAccount(user, friend).call()
+                snapshot.set_trustline(
+                    user,
+                    friend,
+                    creditline_given=creditline_given,
+                    creditline_received=creditline_received,
+                    balance=balance,
+                    is_frozen=is_frozen,
+                )
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self._trustlines) // 2
+
+    def has_trustline(self, a: str, b: str) -> bool:
+        return (a, b) in self._trustlines
+
+    def set_trustline(
+        self,
+        a: str,
+        b: str,
+        *,
+        creditline_given: int,
+        creditline_received: int,
+        balance: int = 0,
+        is_frozen: bool = False,
+    ) -> None:
+        """Set the trustline between `a` and `b` from the view of `a`"""
+        trustline = [balance, creditline_given, creditline_received, is_frozen]
+        self._trustlines[(a, b)] = (trustline, True)
+        self._trustlines[(b, a)] = (trustline, False)
+
+    def get_balance(self, a: str, b: str) -> int:
+        trustline, is_view_of_a = self._trustlines[(a, b)]
+        return trustline[0] if is_view_of_a else -trustline[0]
+
+    def get_creditline_received(self, a: str, b: str) -> int:
+        """Returns the creditline given from `b` to `a`"""
+        trustline, is_view_of_a = self._trustlines[(a, b)]
+        return trustline[2] if is_view_of_a else trustline[1]
+
+    def simulate_transfer(
+        self,
+        value: int,
+        max_fee: int,
+        path: Sequence[str],
+        changed_balances: Dict[Tuple[str, str], int] = None,
+    ) -> int:
+        """Simulate a transfer along `path` where the sender pays the fees
+
+        Mirrors `_mediatedTransferSenderPays` of the currency network contract
+        and returns the fees. Raises `TransferError` if the contract would
+        revert. The new balances are written to `changed_balances` keyed by
+        the hops of the path in both directions, the snapshot itself is not
+        changed. Balances already in `changed_balances` are used instead of the
+        ones of the snapshot.
+        """
+        if len(path) < 2:
+            raise TransferError("Path too short.")
+        if changed_balances is None:
+            changed_balances = {}
+
+        forwarded_value = value
+        fees = 0
+        for receiver_index in range(len(path) - 1, 0, -1):
+            sender, receiver = path[receiver_index - 1], path[receiver_index]
+            hop = (sender, receiver)
+            entry = self._trustlines.get(hop)
+            if entry is None:
+                raise TransferError(f"There is no trustline between {hop}.")
+            trustline, is_view_of_sender = entry
+            if self.is_network_frozen or trustline[3]:
+                raise TransferError("One trustline in the path is frozen.")
+
+            balance = changed_balances.get(hop)
+            if balance is None:
+                balance = trustline[0] if is_view_of_sender else -trustline[0]
+            if receiver_index != len(path) - 1:
+                fee = calculate_fees_reverse(
+                    imbalance_generated(forwarded_value, balance),
+                    self.capacity_imbalance_fee_divisor,
+                )
+                forwarded_value += fee
+                fees += fee
+                if fees > max_fee:
+                    raise TransferError("The fees exceed the max fee parameter.")
+
+            new_balance = balance - forwarded_value
+            creditline_received = trustline[2] if is_view_of_sender else trustline[1]
+            if -new_balance > creditline_received:
+                raise TransferError(
+                    "The transferred value exceeds the capacity of the credit line."
+                )
+            changed_balances[hop] = new_balance
+            changed_balances[(receiver, sender)] = -new_balance
+        return fees
+
+    def apply_balances(self, changed_balances: Dict[Tuple[str, str], int]) -> None:
+        """Store balances computed by `simulate_transfer`"""
+        for hop, balance in changed_balances.items():
+            trustline, is_view_of_sender = self._trustlines[hop]
+            trustline[0] = balance if is_view_of_sender else -balance
+
+
+@attr.s(auto_attribs=True, frozen=True, slots=True)
+class SimulatedFill:
+    """The outcome of a simulated `fillOrderTrustlines`
+
+    If the fill would emit a `LogError`, `error` is set and the amounts are 0.
+    If the transaction would revert, `revert_reason` is set.
+    """
+
+    filled_taker_token_amount: int = 0
+    filled_maker_token_amount: int = 0
+    error: Optional[ExchangeError] = None
+    revert_reason: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and self.revert_reason is None
+
+
+class FillSimulator:
+    """Simulates `fillOrderTrustlines` of the exchange contract offline
+
+    The trustline legs are checked against the `TrustlineSnapshot` of the
+    maker and taker token in `snapshots`. A leg with an empty path is a token
+    transfer, which is not checked. Already unavailable amounts of orders are
+    taken from `unavailable_amounts`, for example an `OrderBook` or an
+    `ExchangeEventFollower`. Signatures are not checked.
+    """
+
+    def __init__(
+        self,
+        snapshots: Dict[str, TrustlineSnapshot] = None,
+        *,
+        unavailable_amounts=None,
+    ):
+        self.snapshots: Dict[str, TrustlineSnapshot] = (
+            snapshots if snapshots is not None else {}
+        )
+        self.unavailable_amounts = unavailable_amounts
+        # fills applied with `simulate_fill(..., apply=True)`
+        self._filled: Dict[bytes, int] = {}
+
+    def get_unavailable_taker_token_amount(self, order_hash: bytes) -> int:
+        amount = self._filled.get(order_hash, 0)
+        if self.unavailable_amounts is not None:
+            amount += self.unavailable_amounts.get_unavailable_taker_token_amount(
+                order_hash
+            )
+        return amount
+
+    def simulate_fill(
+        self,
+        order: Order,
+        fill_taker_token_amount: int,
+        maker_path: Sequence[str] = (),
+        taker_path: Sequence[str] = (),
+        *,
+        taker: str = None,
+        timestamp: int = None,
+        apply: bool = False,
+    ) -> SimulatedFill:
+        """Simulate `fillOrderTrustlines` at `timestamp`, per default now
+
+        If `taker` is given, it is checked against the taker of the order.
+        With `apply`, a successful fill is recorded and its transfers change
+        the snapshots, so that following simulations take it into account.
+        """
+        if taker is not None and order.taker_address not in (NULL_ADDRESS, taker):
+            return SimulatedFill(
+                revert_reason="Order taker must be message sender or the zero address."
+            )
+        if (
+            order.maker_token_amount <= 0
+            or order.taker_token_amount <= 0
+            or fill_taker_token_amount <= 0
+        ):
+            return SimulatedFill(
+                revert_reason="Token amount of order maker, order taker, and fill "
+                "taker must be positive."
+            )
+        if timestamp is None:
+            timestamp = int(time.time())
+        if timestamp >= order.expiration_timestamp_in_sec:
+            return SimulatedFill(error=ExchangeError.ORDER_EXPIRED)
+
+        order_hash = order.hash()
+        remaining_taker_token_amount = max(
+            order.taker_token_amount
+            - self.get_unavailable_taker_token_amount(order_hash),
+            0,
+        )
+        filled_taker_token_amount = min(
+            fill_taker_token_amount, remaining_taker_token_amount
+        )
+        if filled_taker_token_amount == 0:
+            return SimulatedFill(error=ExchangeError.ORDER_FULLY_FILLED_OR_CANCELLED)
+        if is_rounding_error(
+            filled_taker_token_amount,
+            order.taker_token_amount,
+            order.maker_token_amount,
+        ):
+            return SimulatedFill(error=ExchangeError.ROUNDING_ERROR_TOO_LARGE)
+        filled_maker_token_amount = get_partial_amount(
+            filled_taker_token_amount,
+            order.taker_token_amount,
+            order.maker_token_amount,
+        )
+
+        changed_balances: Dict[str, Dict[Tuple[str, str], int]] = {}
+        try:
+            for token, path, amount in (
+                (order.maker_token, maker_path, filled_maker_token_amount),
+                (order.taker_token, taker_path, filled_taker_token_amount),
+            ):
+                if path:
+                    self._simulate_transfer(token, path, amount, changed_balances)
+        except TransferError as e:
+            return SimulatedFill(revert_reason=str(e))
+
+        if apply:
+            self._filled[order_hash] = (
+                self._filled.get(order_hash, 0) + filled_taker_token_amount
+            )
+            for token, balances in changed_balances.items():
+                self.snapshots[token].apply_balances(balances)
+        return SimulatedFill(filled_taker_token_amount, filled_maker_token_amount)
+
+    def _simulate_transfer(
+        self,
+        token: str,
+        path: Sequence[str],
+        amount: int,
+        changed_balances: Dict[str, Dict[Tuple[str, str], int]],
+    ) -> None:
+        snapshot = self.snapshots.get(token)
+        if snapshot is None:
+            raise TransferError(
+                f"There is no snapshot of the currency network {token}."
+            )
+        snapshot.simulate_transfer(
+            amount & UINT32_MASK,
+            EXCHANGE_MAX_FEE,
+            path,
+            changed_balances.setdefault(token, {}),
+        )
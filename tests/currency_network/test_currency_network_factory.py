@@ -0,0 +1,85 @@
+#! pytest
+
+import eth_tester.exceptions
+import pytest
+
+import tldeploy.core
+from tldeploy.core import (
+    UnexpectedNetworkAddress,
+    compute_network_address,
+    deploy_currency_network_factory,
+    deploy_network_with_factory,
+)
+from tests.conftest import EXPIRATION_TIME
+
+NETWORK_SETTING = {
+    "name": "TestCoin",
+    "symbol": "T",
+    "decimals": 6,
+    "fee_divisor": 100,
+    "default_interest_rate": 0,
+    "custom_interests": False,
+    "expiration_time": EXPIRATION_TIME,
+}
+
+
+@pytest.fixture(scope="session")
+def currency_network_factory(web3):
+    return deploy_currency_network_factory(web3=web3)
+
+
+def test_deploy_network_with_factory(web3, currency_network_factory, accounts):
+    block_number = web3.eth.blockNumber
+
+    network = deploy_network_with_factory(
+        web3, currency_network_factory.address, salt=1, **NETWORK_SETTING
+    )
+
+    assert web3.eth.blockNumber == block_number + 1
+    assert network.functions.name().call() == "TestCoin"
+    assert network.functions.capacityImbalanceFeeDivisor().call() == 100
+    assert network.functions.expirationTime().call() == EXPIRATION_TIME
+    assert network.address == compute_network_address(
+        currency_network_factory.address, accounts[0], 1
+    )
+
+
+def test_network_address_depends_on_deployer(web3, currency_network_factory, accounts):
+    network = deploy_network_with_factory(
+        web3,
+        currency_network_factory.address,
+        salt=2,
+        transaction_options={"from": accounts[1]},
+        **NETWORK_SETTING,
+    )
+
+    assert network.address == compute_network_address(
+        currency_network_factory.address, accounts[1], 2
+    )
+    assert network.address != compute_network_address(
+        currency_network_factory.address, accounts[0], 2
+    )
+
+
+def test_deploy_network_with_same_salt_twice(web3, currency_network_factory):
+    deploy_network_with_factory(
+        web3, currency_network_factory.address, salt=3, **NETWORK_SETTING
+    )
+
+    with pytest.raises(eth_tester.exceptions.TransactionFailed):
+        deploy_network_with_factory(
+            web3, currency_network_factory.address, salt=3, **NETWORK_SETTING
+        )
+
+
+def test_deploy_network_with_wrong_computed_address(
+    web3, currency_network_factory, accounts, monkeypatch
+):
+    monkeypatch.setattr(
+        tldeploy.core, "compute_network_address", lambda *args, **kwargs: accounts[5]
+    )
+
+    with pytest.raises(UnexpectedNetworkAddress):
+        deploy_network_with_factory(
+            web3, currency_network_factory.address, salt=4, **NETWORK_SETTING
+        )
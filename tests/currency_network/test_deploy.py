@@ -1,37 +1,136 @@
 #! pytest
 
-from tldeploy.core import deploy_networks, deploy_network
+import gc
+import threading
+import weakref
+
+import pytest
+from web3 import Web3
+from web3.exceptions import ValidationError
+
+from tldeploy.core import (
+    deploy_networks,
+    deploy_network,
+    get_chain_id,
+    get_contract,
+    get_contract_factory,
+    set_chain_id,
+)
+from tldeploy.pipeline import (
+    NonceAllocator,
+    TransactionPipeline,
+    deploy_networks_concurrently,
+    deploy_networks_pipelined,
+    pipeline_identity_implementation,
+    pipeline_identity_proxy_factory,
+)
 
 from tests.conftest import EXPIRATION_TIME
 
 
-def test_deploy_networks(web3):
-    example_settings = [
-        {
-            "name": "Test",
-            "symbol": "TST",
-            "decimals": 4,
-            "fee_divisor": 1000,
-            "default_interest_rate": 0,
-            "custom_interests": True,
-            "expiration_time": EXPIRATION_TIME,
-        },
-        {
-            "name": "Test Coin",
-            "symbol": "TCN",
-            "decimals": 2,
-            "fee_divisor": 0,
-            "default_interest_rate": 1000,
-            "custom_interests": False,
-            "expiration_time": EXPIRATION_TIME,
-        },
-    ]
-    networks, exchange, unw_eth = deploy_networks(web3, example_settings)
+EXAMPLE_SETTINGS = [
+    {
+        "name": "Test",
+        "symbol": "TST",
+        "decimals": 4,
+        "fee_divisor": 1000,
+        "default_interest_rate": 0,
+        "custom_interests": True,
+        "expiration_time": EXPIRATION_TIME,
+    },
+    {
+        "name": "Test Coin",
+        "symbol": "TCN",
+        "decimals": 2,
+        "fee_divisor": 0,
+        "default_interest_rate": 1000,
+        "custom_interests": False,
+        "expiration_time": EXPIRATION_TIME,
+    },
+]
+
+
+@pytest.mark.parametrize(
+    "deploy_function", [deploy_networks, deploy_networks_pipelined]
+)
+def test_deploy_networks(web3, deploy_function):
+    networks, exchange, unw_eth = deploy_function(web3, EXAMPLE_SETTINGS)
 
     assert networks[0].functions.name().call() == "Test"
     assert networks[0].functions.symbol().call() == "TST"
     assert networks[1].functions.decimals().call() == 2
     assert unw_eth.functions.decimals().call() == 18
+    assert unw_eth.functions.globalAuthorized(exchange.address).call()
+    assert networks[1].functions.globalAuthorized(exchange.address).call()
+
+
+def serialize_requests(make_request, web3):
+    """eth-tester is not thread safe, so the requests are sent one by one"""
+    lock = threading.Lock()
+
+    def middleware(method, params):
+        with lock:
+            return make_request(method, params)
+
+    return middleware
+
+
+@pytest.fixture()
+def thread_safe_web3(web3):
+    thread_safe_web3 = Web3(web3.provider)
+    thread_safe_web3.middleware_onion.add(serialize_requests)
+    return thread_safe_web3
+
+
+def test_deploy_networks_concurrently(thread_safe_web3):
+    deployments, exchange, unw_eth = deploy_networks_concurrently(
+        thread_safe_web3, EXAMPLE_SETTINGS * 3, max_workers=4
+    )
+
+    assert [
+        deployment.contract.functions.name().call() for deployment in deployments
+    ] == ["Test", "Test Coin"] * 3
+    assert all(deployment.duration >= 0 for deployment in deployments)
+    assert deployments[1].contract.functions.globalAuthorized(exchange.address).call()
+
+
+def test_deploy_networks_concurrently_after_failure(thread_safe_web3):
+    """A deployment failing before it sends a transaction must not leave a gap
+    in the nonces for the others"""
+    invalid_settings = dict(EXAMPLE_SETTINGS[0], decimals=-1)
+
+    with pytest.raises(ValidationError):
+        deploy_networks_concurrently(
+            thread_safe_web3, [invalid_settings] + EXAMPLE_SETTINGS, max_workers=4
+        )
+
+    networks, exchange, unw_eth = deploy_networks_pipelined(
+        thread_safe_web3, EXAMPLE_SETTINGS
+    )
+    assert networks[0].functions.name().call() == "Test"
+
+
+def test_pipeline_identity_contracts(web3):
+    pipeline = TransactionPipeline(web3=web3)
+    identity_implementation = pipeline_identity_implementation(pipeline)
+    identity_proxy_factory = pipeline_identity_proxy_factory(pipeline)
+    pipeline.wait()
+
+    assert len(web3.eth.getCode(identity_implementation.address)) > 0
+    assert identity_proxy_factory.functions.chainId().call() == get_chain_id(web3)
+
+
+def test_nonce_allocator():
+    nonce_allocator = NonceAllocator(5)
+
+    with nonce_allocator.use_nonce() as nonce:
+        assert nonce == 5
+    with pytest.raises(ValueError):
+        with nonce_allocator.use_nonce() as nonce:
+            raise ValueError("sending failed")
+    with nonce_allocator.use_nonce() as nonce:
+        assert nonce == 6
+    assert nonce_allocator.next_nonce == 7
 
 
 def test_deploy_network(web3):
@@ -53,3 +152,38 @@ def test_deploy_network(web3):
     assert network.functions.customInterests().call() is False
     assert network.functions.defaultInterestRate().call() == 100
     assert network.functions.expirationTime().call() == EXPIRATION_TIME
+
+
+def test_contract_factories_are_cached(web3):
+    network = deploy_network(
+        web3, name="Testcoin", symbol="T", decimals=2, expiration_time=EXPIRATION_TIME
+    )
+
+    assert get_contract_factory(web3, "CurrencyNetwork") is get_contract_factory(
+        web3, "CurrencyNetwork"
+    )
+    contract = get_contract(web3, "CurrencyNetwork", network.address)
+    assert contract is not network
+    assert contract.address == network.address
+    assert network.functions.name().call() == "Testcoin"
+
+
+def test_contract_factory_cache_does_not_keep_web3_alive(web3):
+    other_web3 = Web3()
+    get_contract_factory(other_web3, "CurrencyNetwork")
+    reference = weakref.ref(other_web3)
+
+    del other_web3
+    gc.collect()
+    assert reference() is None
+
+
+def test_chain_id_cache_does_not_keep_web3_alive():
+    other_web3 = Web3()
+    set_chain_id(other_web3, 123)
+    assert get_chain_id(other_web3) == 123
+    reference = weakref.ref(other_web3)
+
+    del other_web3
+    gc.collect()
+    assert reference() is None
@@ -5,7 +5,11 @@
  They are not meant to enforce a limit.
  """
 import pytest
-from tldeploy.core import deploy_network
+from tldeploy.core import (
+    deploy_currency_network_implementation,
+    deploy_network,
+    deploy_proxied_network,
+)
 
 from ..conftest import EXTRA_DATA, EXPIRATION_TIME, get_gas_costs, report_gas_costs
 
@@ -49,6 +53,46 @@ def currency_network_contract_with_trustlines(web3, accounts):
     return contract
 
 
+def get_gas_costs_of_blocks_since(web3, block_number_before):
+    gas_cost = 0
+    for block_number in range(web3.eth.blockNumber, block_number_before, -1):
+        gas_cost += web3.eth.getBlock(block_number).gasUsed
+    return gas_cost
+
+
+@pytest.fixture(scope="session")
+def currency_network_implementation(web3):
+    return deploy_currency_network_implementation(web3=web3)
+
+
+def test_cost_deploy_network_vs_proxied_network(
+    web3, currency_network_implementation, table
+):
+    network_setting = dict(
+        name="Teuro",
+        symbol="TEUR",
+        decimals=2,
+        fee_divisor=100,
+        expiration_time=EXPIRATION_TIME,
+    )
+
+    block_number_before = web3.eth.blockNumber
+    deploy_network(web3, **network_setting)
+    deploy_gas_cost = get_gas_costs_of_blocks_since(web3, block_number_before)
+    report_gas_costs(table, "Deploy Currency Network", deploy_gas_cost, limit=7_000_000)
+
+    block_number_before = web3.eth.blockNumber
+    deploy_proxied_network(
+        web3, currency_network_implementation.address, **network_setting
+    )
+    proxied_gas_cost = get_gas_costs_of_blocks_since(web3, block_number_before)
+    report_gas_costs(
+        table, "Deploy Proxied Currency Network", proxied_gas_cost, limit=600_000
+    )
+
+    assert proxied_gas_cost < deploy_gas_cost / 5
+
+
 def test_cost_transfer_0_mediators(
     web3, currency_network_contract_with_trustlines, accounts, table
 ):
@@ -0,0 +1,85 @@
+#! pytest
+
+import eth_tester.exceptions
+import pytest
+
+from tldeploy.core import deploy_currency_network_implementation, deploy_proxied_network
+from tests.conftest import EXPIRATION_TIME, EXTRA_DATA
+
+NETWORK_SETTING = {
+    "name": "TestCoin",
+    "symbol": "T",
+    "decimals": 6,
+    "fee_divisor": 100,
+    "default_interest_rate": 0,
+    "custom_interests": False,
+    "expiration_time": EXPIRATION_TIME,
+    "currency_network_contract_name": "TestProxiedCurrencyNetwork",
+}
+
+
+@pytest.fixture(scope="session")
+def currency_network_implementation(web3):
+    return deploy_currency_network_implementation(
+        web3=web3, currency_network_contract_name="TestProxiedCurrencyNetwork"
+    )
+
+
+def test_deploy_proxied_network(web3, currency_network_implementation):
+    block_number = web3.eth.blockNumber
+
+    network = deploy_proxied_network(
+        web3, currency_network_implementation.address, **NETWORK_SETTING
+    )
+
+    assert web3.eth.blockNumber == block_number + 2
+    assert network.address != currency_network_implementation.address
+    assert (
+        network.functions.implementation().call()
+        == currency_network_implementation.address
+    )
+    assert network.functions.name().call() == "TestCoin"
+    assert network.functions.capacityImbalanceFeeDivisor().call() == 100
+    assert network.functions.expirationTime().call() == EXPIRATION_TIME
+    assert currency_network_implementation.functions.name().call() == ""
+
+
+def test_proxied_networks_have_separate_storage(
+    web3, currency_network_implementation, accounts
+):
+    A, B, *rest = accounts
+    first_network = deploy_proxied_network(
+        web3, currency_network_implementation.address, **NETWORK_SETTING
+    )
+    second_network = deploy_proxied_network(
+        web3, currency_network_implementation.address, **NETWORK_SETTING
+    )
+
+    first_network.functions.setAccount(A, B, 100, 150, 0, 0, False, 0, 0).transact()
+    first_network.functions.transfer(10, 1, [A, B], EXTRA_DATA).transact({"from": A})
+
+    assert first_network.functions.balance(A, B).call() == -10
+    assert second_network.functions.balance(A, B).call() == 0
+
+
+def test_proxied_network_can_not_be_initialized_twice(
+    web3, currency_network_implementation
+):
+    network = deploy_proxied_network(
+        web3, currency_network_implementation.address, **NETWORK_SETTING
+    )
+
+    with pytest.raises(eth_tester.exceptions.TransactionFailed):
+        network.functions.init("Other", "O", 2, 0, 0, False, False, 0, []).transact()
+
+
+def test_currency_network_abi_has_no_proxy_storage(contract_assets):
+    def function_names(contract_name):
+        return {
+            abi_entry["name"]
+            for abi_entry in contract_assets[contract_name]["abi"]
+            if abi_entry["type"] == "function"
+        }
+
+    assert "implementation" not in function_names("CurrencyNetwork")
+    assert "implementation" in function_names("ProxiedCurrencyNetwork")
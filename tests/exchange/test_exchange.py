@@ -2,6 +2,7 @@
 
 import time
 
+import attr
 import pytest
 
 from tldeploy.core import deploy_network, deploy_exchange, deploy
@@ -103,6 +104,45 @@ def test_order_hash(
     )
 
 
+def test_order_contract_args(
+    exchange_contract,
+    token_contract,
+    currency_network_contract_with_trustlines,
+    accounts,
+):
+    maker_address, taker_address, *rest = accounts
+
+    order = Order(
+        exchange_contract.address,
+        maker_address,
+        NULL_ADDRESS,
+        token_contract.address,
+        currency_network_contract_with_trustlines.address,
+        NULL_ADDRESS,
+        100,
+        50,
+        0,
+        0,
+        1234,
+        1234,
+    )
+
+    assert (
+        order.hash()
+        == exchange_contract.functions.getOrderHash(*order.to_contract_args()).call()
+    )
+
+
+def test_order_is_immutable_with_cached_hash(accounts):
+    order = Order(NULL_ADDRESS, accounts[0], *[NULL_ADDRESS] * 4, *range(6))
+
+    assert order.hash() is order.hash()
+    assert order == Order(NULL_ADDRESS, accounts[0], *[NULL_ADDRESS] * 4, *range(6))
+    assert not hasattr(order, "__dict__")
+    with pytest.raises(attr.exceptions.FrozenInstanceError):
+        order.salt = 1
+
+
 def test_order_signature(
     exchange_contract,
     token_contract,
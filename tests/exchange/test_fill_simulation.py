@@ -0,0 +1,244 @@
+#! pytest
+
+import time
+import timeit
+
+import attr
+import pytest
+from eth_tester.exceptions import TransactionFailed
+from eth_utils import to_checksum_address
+
+from tldeploy.core import deploy, deploy_exchange, deploy_network
+from tldeploy.exchange import ExchangeError, Order
+from tldeploy.orderbook import OrderBook
+from tldeploy.simulation import FillSimulator, TrustlineSnapshot
+
+from tests.conftest import EXPIRATION_TIME
+
+NULL_ADDRESS = "0x0000000000000000000000000000000000000000"
+SIGNATURE = (27, bytes(32), bytes(32))
+TIMESTAMP = 1000
+
+
+def address(number):
+    return to_checksum_address(number.to_bytes(20, byteorder="big"))
+
+
+MAKER = address(1)
+MEDIATOR = address(2)
+TAKER = address(3)
+MAKER_NETWORK = address(4)
+TAKER_NETWORK = address(5)
+
+
+def make_order(maker_token_amount=100, taker_token_amount=50, *, expiration=2000):
+    return Order(
+        address(6),
+        MAKER,
+        NULL_ADDRESS,
+        MAKER_NETWORK,
+        TAKER_NETWORK,
+        NULL_ADDRESS,
+        maker_token_amount,
+        taker_token_amount,
+        0,
+        0,
+        expiration,
+        0,
+    )
+
+
+@pytest.fixture()
+def simulator():
+    maker_network = TrustlineSnapshot()
+    maker_network.set_trustline(
+        MAKER, TAKER, creditline_given=1000, creditline_received=1000
+    )
+    taker_network = TrustlineSnapshot(capacity_imbalance_fee_divisor=100)
+    taker_network.set_trustline(
+        TAKER, MEDIATOR, creditline_given=0, creditline_received=200
+    )
+    taker_network.set_trustline(
+        MEDIATOR, MAKER, creditline_given=0, creditline_received=200
+    )
+    return FillSimulator({MAKER_NETWORK: maker_network, TAKER_NETWORK: taker_network})
+
+
+def simulate(simulator, order, amount, **kwargs):
+    return simulator.simulate_fill(
+        order,
+        amount,
+        [MAKER, TAKER],
+        [TAKER, MEDIATOR, MAKER],
+        timestamp=TIMESTAMP,
+        **kwargs,
+    )
+
+
+def test_simulate_fill(simulator):
+    fill = simulate(simulator, make_order(), 30, apply=True)
+
+    assert fill.success
+    assert fill.filled_taker_token_amount == 30
+    assert fill.filled_maker_token_amount == 60
+    assert simulator.snapshots[MAKER_NETWORK].get_balance(MAKER, TAKER) == -60
+    # the taker pays a fee of 1 to the mediator
+    assert simulator.snapshots[TAKER_NETWORK].get_balance(TAKER, MEDIATOR) == -31
+    assert simulator.snapshots[TAKER_NETWORK].get_balance(MAKER, MEDIATOR) == 30
+
+
+def test_simulate_fill_of_remaining_amount(simulator):
+    order = make_order()
+    simulate(simulator, order, 30, apply=True)
+
+    fill = simulate(simulator, order, 30, apply=True)
+
+    assert fill.filled_taker_token_amount == 20
+    assert (
+        simulate(simulator, order, 30).error
+        == ExchangeError.ORDER_FULLY_FILLED_OR_CANCELLED
+    )
+
+
+def test_simulate_fill_errors(simulator):
+    assert (
+        simulate(simulator, make_order(expiration=TIMESTAMP), 10).error
+        == ExchangeError.ORDER_EXPIRED
+    )
+    assert (
+        simulate(simulator, make_order(10, 3), 1).error
+        == ExchangeError.ROUNDING_ERROR_TOO_LARGE
+    )
+
+
+def test_simulate_fill_exceeding_capacity(simulator):
+    fill = simulate(simulator, make_order(1000, 500), 250)
+
+    assert not fill.success
+    assert "capacity" in fill.revert_reason
+
+
+def test_failed_simulation_does_not_change_snapshots(simulator):
+    simulate(simulator, make_order(1000, 500), 250, apply=True)
+
+    assert simulator.snapshots[MAKER_NETWORK].get_balance(MAKER, TAKER) == 0
+    assert simulator.snapshots[TAKER_NETWORK].get_balance(TAKER, MEDIATOR) == 0
+
+
+def test_simulate_fill_uses_unavailable_amounts(simulator):
+    order_book = OrderBook()
+    order = make_order()
+    order_book.add(order, SIGNATURE)
+    order_book.record_cancel(order.hash(), 40)
+    simulator.unavailable_amounts = order_book
+
+    assert simulate(simulator, order, 30).filled_taker_token_amount == 10
+
+
+def test_simulate_fill_checks_taker(simulator):
+    order = attr.evolve(make_order(), taker_address=TAKER)
+
+    assert simulate(simulator, order, 30, taker=TAKER).success
+    assert simulate(simulator, order, 30, taker=MEDIATOR).revert_reason is not None
+
+
+def test_simulate_many_fills_per_second(simulator):
+    orders = [make_order(100 + i, 50) for i in range(100)]
+
+    def simulate_all():
+        for order in orders:
+            simulate(simulator, order, 10)
+
+    duration = timeit.timeit(simulate_all, number=10)
+
+    print(f"{1000 / duration:.0f} simulated fills per second")
+    assert duration < 1
+
+
+@pytest.fixture(scope="session")
+def exchange_contract(web3):
+    return deploy_exchange(web3=web3)
+
+
+@pytest.fixture(scope="session")
+def token_contract(web3, accounts, exchange_contract):
+    maker = accounts[0]
+    constructor_args = ("DummyToken", "DT", 18, 10000000)
+    contract = deploy("DummyToken", web3=web3, constructor_args=constructor_args)
+    contract.functions.setBalance(maker, 10000).transact()
+    contract.functions.approve(exchange_contract.address, 10000).transact(
+        {"from": maker}
+    )
+    return contract
+
+
+@pytest.fixture(scope="session")
+def currency_network_contract(web3, exchange_contract, accounts):
+    maker, mediator, taker, *rest = accounts
+    contract = deploy_network(
+        web3,
+        name="TestCoin",
+        symbol="T",
+        decimals=6,
+        fee_divisor=100,
+        currency_network_contract_name="TestCurrencyNetwork",
+        expiration_time=EXPIRATION_TIME,
+        exchange_address=exchange_contract.address,
+    )
+    for (a, b, creditline_given, creditline_received) in [
+        (taker, mediator, 0, 100),
+        (mediator, maker, 0, 100),
+    ]:
+        contract.functions.setAccount(
+            a, b, creditline_given, creditline_received, 0, 0, False, 0, 0
+        ).transact()
+    return contract
+
+
+def test_simulation_matches_contract(
+    web3,
+    exchange_contract,
+    token_contract,
+    currency_network_contract,
+    accounts,
+    account_keys,
+):
+    maker, mediator, taker, *rest = accounts
+    order = Order(
+        exchange_contract.address,
+        maker,
+        NULL_ADDRESS,
+        token_contract.address,
+        currency_network_contract.address,
+        NULL_ADDRESS,
+        200,
+        100,
+        0,
+        0,
+        int(time.time() + 60 * 60 * 24),
+        0,
+    )
+    v, r, s = order.sign(account_keys[0].to_bytes())
+    snapshot = TrustlineSnapshot.from_contract(currency_network_contract)
+    simulator = FillSimulator({currency_network_contract.address: snapshot})
+    taker_path = [taker, mediator, maker]
+
+    def fill_order(amount):
+        return exchange_contract.functions.fillOrderTrustlines(
+            *order.to_contract_args(), amount, [], taker_path, v, r, s
+        ).transact({"from": taker})
+
+    fill = simulator.simulate_fill(order, 60, [], taker_path, taker=taker, apply=True)
+    assert fill.success
+    fill_order(60)
+    for a, b in [(taker, mediator), (mediator, maker)]:
+        assert (
+            snapshot.get_balance(a, b)
+            == currency_network_contract.functions.balance(a, b).call()
+        )
+
+    # the taker has not enough credit left to pay the fee
+    fill = simulator.simulate_fill(order, 40, [], taker_path, taker=taker)
+    assert not fill.success
+    with pytest.raises(TransactionFailed):
+        fill_order(40)
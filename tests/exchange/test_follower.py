@@ -0,0 +1,263 @@
+#! pytest
+
+import time
+
+import pytest
+
+from tldeploy.core import deploy, deploy_exchange
+from tldeploy.exchange import ExchangeError, Order
+from tldeploy.follower import ExchangeEventFollower
+from tldeploy.orderbook import OrderBook
+
+NULL_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+@pytest.fixture(scope="session")
+def exchange_contract(web3):
+    return deploy_exchange(web3=web3)
+
+
+@pytest.fixture(scope="session")
+def tokens(web3, accounts, exchange_contract):
+    maker, taker, *rest = accounts
+    tokens = []
+    for symbol in ["MT", "TT"]:
+        constructor_args = ("DummyToken", symbol, 18, 10000000)
+        token = deploy("DummyToken", web3=web3, constructor_args=constructor_args)
+        for account in [maker, taker]:
+            token.functions.setBalance(account, 10000).transact()
+            token.functions.approve(exchange_contract.address, 10000).transact(
+                {"from": account}
+            )
+        tokens.append(token)
+    return tokens
+
+
+@pytest.fixture(scope="session")
+def traded_orders(web3, exchange_contract, tokens, accounts, account_keys):
+    """Fill, cancel and fill an expired order"""
+    maker, taker, *rest = accounts
+    maker_token, taker_token = tokens
+    expiration = int(time.time() + 60 * 60 * 24)
+
+    def make_order(salt, expiration=expiration):
+        return Order(
+            exchange_contract.address,
+            maker,
+            NULL_ADDRESS,
+            maker_token.address,
+            taker_token.address,
+            NULL_ADDRESS,
+            100,
+            50,
+            0,
+            0,
+            expiration,
+            salt,
+        )
+
+    filled_order = make_order(1)
+    cancelled_order = make_order(2)
+    expired_order = make_order(3, expiration=1)
+
+    for fill_amount in [10, 20]:
+        exchange_contract.functions.fillOrder(
+            *filled_order.to_contract_args(),
+            fill_amount,
+            False,
+            *filled_order.sign(account_keys[0].to_bytes()),
+        ).transact({"from": taker})
+    exchange_contract.functions.cancelOrder(
+        *cancelled_order.to_contract_args(), 15
+    ).transact({"from": maker})
+    exchange_contract.functions.fillOrder(
+        *expired_order.to_contract_args(),
+        10,
+        False,
+        *expired_order.sign(account_keys[0].to_bytes()),
+    ).transact({"from": taker})
+
+    return filled_order, cancelled_order, expired_order
+
+
+def test_follower_tracks_fills_and_cancels(web3, exchange_contract, traded_orders):
+    filled_order, cancelled_order, expired_order = traded_orders
+    follower = ExchangeEventFollower(web3, exchange_contract.address, confirmations=0)
+
+    assert follower.sync() == 4
+
+    assert follower.get_filled_taker_token_amount(filled_order.hash()) == 30
+    assert follower.get_cancelled_taker_token_amount(cancelled_order.hash()) == 15
+    for order in traded_orders:
+        assert (
+            follower.get_unavailable_taker_token_amount(order.hash())
+            == exchange_contract.functions.getUnavailableTakerTokenAmount(
+                order.hash()
+            ).call()
+        )
+    assert follower.get_errors(expired_order.hash()) == [ExchangeError.ORDER_EXPIRED]
+    assert follower.last_processed_block == web3.eth.blockNumber
+    assert follower.sync() == 0
+
+
+def test_follower_resumes_from_checkpoint(
+    web3, exchange_contract, traded_orders, tmp_path
+):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    first_fill_block = exchange_contract.events.LogFill.getLogs(fromBlock=0)[0][
+        "blockNumber"
+    ]
+    follower = ExchangeEventFollower(
+        web3, exchange_contract.address, chunk_size=2, checkpoint_path=checkpoint_path
+    )
+    assert follower.sync(to_block=first_fill_block) == 1
+
+    resumed_follower = ExchangeEventFollower(
+        web3,
+        exchange_contract.address,
+        confirmations=0,
+        checkpoint_path=checkpoint_path,
+    )
+    assert resumed_follower.last_processed_block == first_fill_block
+    assert resumed_follower.sync() == 3
+
+    follower = ExchangeEventFollower(web3, exchange_contract.address, confirmations=0)
+    follower.sync()
+    assert resumed_follower.filled == follower.filled
+    assert resumed_follower.cancelled == follower.cancelled
+    assert resumed_follower.errors == follower.errors
+
+
+def test_follower_accepts_checkpoint_of_differently_cased_address(
+    web3, exchange_contract, traded_orders, tmp_path
+):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    ExchangeEventFollower(
+        web3,
+        exchange_contract.address.lower(),
+        confirmations=0,
+        checkpoint_path=checkpoint_path,
+    ).sync()
+
+    resumed_follower = ExchangeEventFollower(
+        web3,
+        exchange_contract.address,
+        confirmations=0,
+        checkpoint_path=checkpoint_path,
+    )
+    assert resumed_follower.sync() == 0
+
+
+def test_follower_checkpoints_periodically(
+    web3, exchange_contract, traded_orders, tmp_path, monkeypatch
+):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    clock_time = [0.0]
+    follower = ExchangeEventFollower(
+        web3,
+        exchange_contract.address,
+        chunk_size=1,
+        confirmations=0,
+        checkpoint_path=checkpoint_path,
+        checkpoint_interval=10,
+        clock=lambda: clock_time[0],
+    )
+    saved_blocks = []
+    save_checkpoint = follower.save_checkpoint
+
+    def recording_save_checkpoint():
+        saved_blocks.append(follower.last_processed_block)
+        # every checkpoint takes some time
+        clock_time[0] += 4
+        save_checkpoint()
+
+    monkeypatch.setattr(follower, "save_checkpoint", recording_save_checkpoint)
+    to_block = web3.eth.blockNumber
+
+    def get_logs(filter_params):
+        clock_time[0] += 1
+        return []
+
+    monkeypatch.setattr(web3.eth, "getLogs", get_logs)
+    follower.sync(to_block=to_block)
+
+    assert saved_blocks[-1] == to_block
+    assert len(saved_blocks) == to_block // 10 + 1
+
+
+def test_follower_updates_order_book(
+    web3, exchange_contract, traded_orders, account_keys
+):
+    filled_order, cancelled_order, expired_order = traded_orders
+    order_book = OrderBook()
+    for order in traded_orders:
+        order_book.add(order, order.sign(account_keys[0].to_bytes()))
+
+    ExchangeEventFollower(
+        web3, exchange_contract.address, confirmations=0, order_book=order_book
+    ).sync()
+
+    assert order_book.get_remaining_taker_token_amount(filled_order.hash()) == 20
+    assert order_book.get_remaining_taker_token_amount(cancelled_order.hash()) == 35
+
+
+def test_follower_replays_checkpoint_into_order_book(
+    web3, exchange_contract, traded_orders, account_keys, tmp_path
+):
+    filled_order, cancelled_order, expired_order = traded_orders
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    ExchangeEventFollower(
+        web3,
+        exchange_contract.address,
+        confirmations=0,
+        checkpoint_path=checkpoint_path,
+    ).sync()
+    order_book = OrderBook()
+    for order in traded_orders:
+        order_book.add(order, order.sign(account_keys[0].to_bytes()))
+
+    follower = ExchangeEventFollower(
+        web3,
+        exchange_contract.address,
+        confirmations=0,
+        checkpoint_path=checkpoint_path,
+        order_book=order_book,
+    )
+
+    assert follower.sync() == 0
+    assert order_book.get_remaining_taker_token_amount(filled_order.hash()) == 20
+    assert order_book.get_remaining_taker_token_amount(cancelled_order.hash()) == 35
+
+
+def test_follower_replays_checkpoint_only_for_orders_in_book(
+    web3, exchange_contract, traded_orders, account_keys, tmp_path
+):
+    filled_order, cancelled_order, expired_order = traded_orders
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    ExchangeEventFollower(
+        web3,
+        exchange_contract.address,
+        confirmations=0,
+        checkpoint_path=checkpoint_path,
+    ).sync()
+    order_book = OrderBook()
+    order_book.add(filled_order, filled_order.sign(account_keys[0].to_bytes()))
+
+    ExchangeEventFollower(
+        web3,
+        exchange_contract.address,
+        confirmations=0,
+        checkpoint_path=checkpoint_path,
+        order_book=order_book,
+    )
+
+    assert order_book.get_remaining_taker_token_amount(filled_order.hash()) == 20
+    assert order_book.get_unavailable_taker_token_amount(cancelled_order.hash()) == 0
+
+
+def test_follower_waits_for_confirmations(web3, exchange_contract, traded_orders):
+    follower = ExchangeEventFollower(web3, exchange_contract.address)
+
+    follower.sync()
+
+    assert follower.last_processed_block == max(web3.eth.blockNumber - 12, -1)
@@ -0,0 +1,102 @@
+#! pytest
+
+import attr
+import pytest
+from eth_utils import keccak, to_checksum_address
+from hexbytes import HexBytes
+
+from tldeploy.exchange import Order, OrderBatch
+
+
+def address(number):
+    return to_checksum_address(number.to_bytes(20, byteorder="big"))
+
+
+@pytest.fixture()
+def orders():
+    return [
+        Order(
+            address(1),
+            address(100 + i),
+            address(0),
+            address(2),
+            address(3),
+            address(0),
+            100 * i,
+            50 * i,
+            0,
+            1,
+            2 ** 32 + i,
+            2 ** 256 - 1 - i,
+        )
+        for i in range(7)
+    ]
+
+
+def test_order_batch_hashes(orders):
+    batch = OrderBatch.from_orders(orders)
+
+    assert len(batch) == 7
+    assert batch.hashes() == [order.hash() for order in orders]
+
+
+def test_order_batch_and_order_hashes_are_hex_bytes(orders):
+    batch = OrderBatch.from_orders(orders)
+
+    assert all(isinstance(order_hash, HexBytes) for order_hash in batch.hashes())
+    assert all(
+        isinstance(order_hash, HexBytes)
+        for order_hash in batch.hashes(processes=2, chunk_size=3)
+    )
+    assert isinstance(orders[0].hash(), HexBytes)
+
+
+def test_order_batch_hashes_with_processes(orders):
+    batch = OrderBatch.from_orders(orders)
+
+    assert batch.hashes(processes=2, chunk_size=3) == batch.hashes()
+
+
+def test_order_batch_get_order(orders):
+    batch = OrderBatch.from_orders(orders)
+
+    assert batch[3] == orders[3]
+    assert batch[-1] == orders[-1]
+    with pytest.raises(IndexError):
+        batch[7]
+
+
+def test_order_batch_slices_without_copy(orders):
+    batch = OrderBatch.from_orders(orders)
+
+    sliced_batch = batch[2:5]
+
+    assert len(sliced_batch) == 3
+    assert sliced_batch.hashes() == [order.hash() for order in orders[2:5]]
+    assert sliced_batch.addresses.obj is batch.addresses.obj
+    assert sliced_batch.values.obj is batch.values.obj
+    assert len(batch[5:2]) == 0
+
+
+def test_order_batch_preimages(orders):
+    batch = OrderBatch.from_orders(orders[:1])
+
+    assert keccak(batch.preimages()) == orders[0].hash()
+
+
+def test_order_batch_rejects_mismatched_columns():
+    with pytest.raises(ValueError):
+        OrderBatch(bytes(120), bytes(2 * 192))
+
+
+def test_order_batch_accepts_addresses_without_prefix(orders):
+    order = attr.evolve(orders[0], maker_address=orders[0].maker_address[2:])
+
+    assert OrderBatch.from_orders([order]).hashes() == [orders[0].hash()]
+
+
+def test_order_batch_rejects_invalid_addresses(orders):
+    order = attr.evolve(orders[0], maker_address=orders[0].maker_address[:-2])
+
+    with pytest.raises(ValueError):
+        OrderBatch.from_orders([order])
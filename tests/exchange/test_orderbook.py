@@ -0,0 +1,248 @@
+#! pytest
+
+import time
+
+import pytest
+from eth_utils import to_checksum_address
+
+from tldeploy.core import deploy, deploy_exchange
+from tldeploy.exchange import Order
+from tldeploy.orderbook import OrderBook
+
+NULL_ADDRESS = "0x0000000000000000000000000000000000000000"
+SIGNATURE = (27, bytes(32), bytes(32))
+
+
+def address(number):
+    return to_checksum_address(number.to_bytes(20, byteorder="big"))
+
+
+MAKER_TOKEN = address(1)
+TAKER_TOKEN = address(2)
+
+
+def make_order(
+    maker_token_amount,
+    taker_token_amount,
+    *,
+    expiration=2 ** 32,
+    salt=0,
+    maker_token=MAKER_TOKEN,
+    taker_token=TAKER_TOKEN,
+):
+    return Order(
+        address(3),
+        address(4),
+        NULL_ADDRESS,
+        maker_token,
+        taker_token,
+        NULL_ADDRESS,
+        maker_token_amount,
+        taker_token_amount,
+        0,
+        0,
+        expiration,
+        salt,
+    )
+
+
+def test_orders_are_sorted_by_price():
+    order_book = OrderBook()
+    expensive = make_order(100, 300)
+    cheap = make_order(100, 100)
+    medium_first = make_order(100, 200, salt=1)
+    medium_second = make_order(50, 100, salt=2)
+    for order in [expensive, medium_first, cheap, medium_second]:
+        order_book.add(order, SIGNATURE)
+
+    assert list(order_book.orders(MAKER_TOKEN, TAKER_TOKEN)) == [
+        cheap,
+        medium_first,
+        medium_second,
+        expensive,
+    ]
+    assert list(order_book.orders(TAKER_TOKEN, MAKER_TOKEN)) == []
+
+
+def test_remove_order():
+    order_book = OrderBook()
+    order = make_order(100, 100)
+    order_hash = order_book.add(order, SIGNATURE)
+
+    assert order_book.remove(order_hash) == order
+    assert order_hash not in order_book
+    assert len(order_book) == 0
+    assert list(order_book.orders(MAKER_TOKEN, TAKER_TOKEN)) == []
+
+
+def test_remove_expired_orders():
+    order_book = OrderBook()
+    orders = [
+        make_order(100, 100, expiration=expiration) for expiration in [30, 10, 20]
+    ]
+    for order in orders:
+        order_book.add(order, SIGNATURE)
+    order_book.remove(orders[1].hash())
+
+    assert order_book.remove_expired(20) == [orders[2]]
+    assert order_book.remove_expired(25) == []
+    assert len(order_book) == 1
+
+
+def test_fills_and_cancels_are_tracked():
+    order_book = OrderBook()
+    order = make_order(100, 50)
+    order_hash = order_book.add(order, SIGNATURE)
+
+    order_book.record_fill(order_hash, 20)
+    order_book.record_cancel(order_hash, 10)
+
+    assert order_book.get_unavailable_taker_token_amount(order_hash) == 30
+    assert order_book.get_remaining_taker_token_amount(order_hash) == 20
+
+    order_book.record_fill(order_hash, 20)
+
+    assert order_hash not in order_book
+    assert order_book.get_unavailable_taker_token_amount(order_hash) == 50
+    order_book.add(order, SIGNATURE)
+    assert order_hash not in order_book
+
+
+def test_amounts_are_dropped_when_orders_expire():
+    order_book = OrderBook()
+    partially_filled = make_order(100, 50, expiration=10)
+    filled = make_order(100, 50, expiration=20)
+    order_book.add(partially_filled, SIGNATURE)
+    order_book.add(filled, SIGNATURE)
+    order_book.record_fill(partially_filled.hash(), 20)
+    order_book.record_fill(filled.hash(), 50)
+
+    assert order_book.remove_expired(10) == [partially_filled]
+    assert order_book.get_filled_taker_token_amount(partially_filled.hash()) == 0
+    assert order_book.get_filled_taker_token_amount(filled.hash()) == 50
+
+    order_book.remove_expired(20)
+    assert order_book.get_filled_taker_token_amount(filled.hash()) == 0
+
+
+def test_amounts_of_unknown_orders_are_ignored():
+    order_book = OrderBook()
+    order = make_order(100, 50)
+
+    order_book.record_fill(order.hash(), 50)
+    order_book.record_cancel(order.hash(), 10)
+
+    assert order_book.get_unavailable_taker_token_amount(order.hash()) == 0
+    assert order_book._filled == {}
+    assert order_book._cancelled == {}
+
+
+def test_add_with_known_amounts():
+    order_book = OrderBook()
+    partially_filled = make_order(100, 50, salt=1)
+    filled = make_order(100, 50, salt=2)
+
+    order_book.add(partially_filled, SIGNATURE, filled_taker_token_amount=20)
+    order_book.add(
+        filled, SIGNATURE, filled_taker_token_amount=40, cancelled_taker_token_amount=10
+    )
+
+    assert order_book.get_remaining_taker_token_amount(partially_filled.hash()) == 30
+    assert filled.hash() not in order_book
+    assert order_book.get_unavailable_taker_token_amount(filled.hash()) == 50
+    order_book.remove_expired(filled.expiration_timestamp_in_sec)
+    assert order_book.get_unavailable_taker_token_amount(filled.hash()) == 0
+
+
+def test_removed_orders_are_pruned_from_expirations():
+    order_book = OrderBook()
+    kept_order = make_order(100, 100, expiration=1000)
+    order_book.add(kept_order, SIGNATURE)
+    for salt in range(1, 100):
+        order_book.remove(order_book.add(make_order(100, 100, salt=salt), SIGNATURE))
+
+    assert len(order_book._expirations) <= 2
+    assert order_book.remove_expired(1000) == [kept_order]
+
+
+def test_select_orders():
+    order_book = OrderBook()
+    cheap = make_order(100, 100)
+    expired = make_order(100, 150, expiration=10)
+    expensive = make_order(100, 200)
+    for order in [cheap, expired, expensive]:
+        order_book.add(order, SIGNATURE)
+    order_book.record_fill(cheap.hash(), 40)
+
+    assert order_book.select_orders(MAKER_TOKEN, TAKER_TOKEN, 100, timestamp=10) == [
+        (cheap, 60),
+        (expensive, 40),
+    ]
+    assert order_book.select_orders(MAKER_TOKEN, TAKER_TOKEN, 1000) == [
+        (cheap, 60),
+        (expired, 150),
+        (expensive, 200),
+    ]
+
+
+def test_select_orders_skips_rounding_errors():
+    order_book = OrderBook()
+    order = make_order(10, 3)
+    order_book.add(order, SIGNATURE)
+
+    assert order_book.select_orders(MAKER_TOKEN, TAKER_TOKEN, 1) == []
+    assert order_book.select_orders(MAKER_TOKEN, TAKER_TOKEN, 3) == [(order, 3)]
+
+
+@pytest.fixture(scope="session")
+def exchange_contract(web3):
+    return deploy_exchange(web3=web3)
+
+
+@pytest.fixture(scope="session")
+def tokens(web3, accounts, exchange_contract):
+    maker, taker, *rest = accounts
+    tokens = []
+    for symbol in ["MT", "TT"]:
+        constructor_args = ("DummyToken", symbol, 18, 10000000)
+        token = deploy("DummyToken", web3=web3, constructor_args=constructor_args)
+        for account in [maker, taker]:
+            token.functions.setBalance(account, 10000).transact()
+            token.functions.approve(exchange_contract.address, 10000).transact(
+                {"from": account}
+            )
+        tokens.append(token)
+    return tokens
+
+
+def test_fill_orders_up_to(exchange_contract, tokens, accounts, account_keys):
+    maker, taker, *rest = accounts
+    maker_token, taker_token = tokens
+    order_book = OrderBook()
+    expiration = int(time.time() + 60 * 60 * 24)
+    for salt, (maker_token_amount, taker_token_amount) in enumerate(
+        [(100, 300), (100, 100), (100, 200)]
+    ):
+        order = Order(
+            exchange_contract.address,
+            maker,
+            NULL_ADDRESS,
+            maker_token.address,
+            taker_token.address,
+            NULL_ADDRESS,
+            maker_token_amount,
+            taker_token_amount,
+            0,
+            0,
+            expiration,
+            salt,
+        )
+        order_book.add(order, order.sign(account_keys[0].to_bytes()))
+
+    args = order_book.fill_orders_up_to_args(
+        maker_token.address, taker_token.address, 200
+    )
+    exchange_contract.functions.fillOrdersUpTo(*args).transact({"from": taker})
+
+    assert maker_token.functions.balanceOf(taker).call() == 10150
+    assert taker_token.functions.balanceOf(maker).call() == 10200
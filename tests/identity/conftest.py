@@ -3,7 +3,7 @@ from deploy_tools import deploy_compiled_contract
 from tldeploy.identity import Delegate, Identity, deploy_proxied_identity
 from web3 import Web3
 
-from tldeploy.core import get_chain_id
+from tldeploy.core import deploy_multicall, get_chain_id
 
 
 @pytest.fixture(scope="session")
@@ -65,6 +65,17 @@ def delegate(contract_assets, delegate_address, web3):
     )
 
 
+@pytest.fixture(scope="session")
+def multicall_delegate(contract_assets, delegate_address, web3):
+    return Delegate(
+        delegate_address,
+        web3=web3,
+        identity_contract_abi=contract_assets["Identity"]["abi"],
+        default_gas=None,
+        multicall_address=deploy_multicall(web3=web3).address,
+    )
+
+
 @pytest.fixture(scope="session")
 def identity_contract(deploy_contract, web3, owner, chain_id):
 
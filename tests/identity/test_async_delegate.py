@@ -0,0 +1,140 @@
+#! pytest
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tldeploy.async_delegate import AsyncDelegate, AsyncJsonRpcClient, Web3JsonRpcClient
+from tldeploy.identity import (
+    MetaTransaction,
+    MetaTransactionStatus,
+    UnexpectedIdentityContractException,
+)
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+@pytest.fixture(scope="session")
+def async_delegate(contract_assets, delegate_address, web3):
+    client = Web3JsonRpcClient(web3)
+    yield AsyncDelegate(
+        delegate_address,
+        client=client,
+        identity_contract_abi=contract_assets["Identity"]["abi"],
+        default_gas=None,
+    )
+    run(client.close())
+
+
+def test_async_delegate_send(web3, identity, async_delegate, accounts):
+    to = accounts[2]
+    value = 1000
+    meta_transaction = identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=to, value=value)
+    )
+    balance_before = web3.eth.getBalance(to)
+
+    assert run(async_delegate.validate_meta_transaction(meta_transaction))
+    tx_hash = run(async_delegate.send_signed_meta_transaction(meta_transaction))
+
+    assert web3.eth.getTransactionReceipt(tx_hash)["status"]
+    assert web3.eth.getBalance(to) - balance_before == value
+    assert not run(async_delegate.validate_meta_transaction(meta_transaction))
+    assert (
+        run(
+            async_delegate.get_meta_transaction_status(
+                identity.address, meta_transaction.hash
+            )
+        )
+        == MetaTransactionStatus.SUCCESS
+    )
+
+
+def test_async_delegate_matches_delegate(identity, delegate, async_delegate, accounts):
+    meta_transaction = identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=accounts[2], value=1000)
+    )
+
+    assert run(async_delegate.get_next_nonce(identity.address)) == (
+        delegate.get_next_nonce(identity.address)
+    )
+    assert run(async_delegate.validate_meta_transaction(meta_transaction)) == (
+        delegate.validate_meta_transaction(meta_transaction)
+    )
+    assert isinstance(
+        run(async_delegate.estimate_gas_signed_meta_transaction(meta_transaction)), int
+    )
+    assert (
+        run(
+            async_delegate.get_meta_transaction_status(
+                identity.address, meta_transaction.hash
+            )
+        )
+        == MetaTransactionStatus.NOT_FOUND
+    )
+
+
+def test_async_delegate_encodes_like_web3(identity, delegate, async_delegate, accounts):
+    meta_transaction = identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=accounts[2], value=1000, data=bytes(range(40)))
+    )
+
+    function_call = delegate._meta_transaction_function_call(meta_transaction)
+    transaction = async_delegate._meta_transaction_transaction(meta_transaction)
+
+    assert transaction["data"] == function_call._encode_transaction_data()
+
+
+def test_async_json_rpc_client_is_abstract():
+    with pytest.raises(TypeError):
+        AsyncJsonRpcClient()
+
+
+def test_web3_json_rpc_client_close_shuts_down_own_executor(web3):
+    client = Web3JsonRpcClient(web3)
+    assert run(client.request("eth_blockNumber", [])) is not None
+
+    run(client.close())
+
+    with pytest.raises(RuntimeError):
+        run(client.request("eth_blockNumber", []))
+
+
+def test_web3_json_rpc_client_close_keeps_given_executor(web3):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        client = Web3JsonRpcClient(web3, executor=executor)
+        run(client.close())
+
+        assert executor.submit(lambda: 1).result() == 1
+
+
+def test_async_delegate_validates_concurrently(identity, async_delegate, accounts):
+    meta_transactions = [
+        identity.filled_and_signed_meta_transaction(
+            MetaTransaction(to=accounts[2], value=value)
+        )
+        for value in range(1, 11)
+    ]
+
+    async def validate_all():
+        return await asyncio.gather(
+            *(
+                async_delegate.validate_meta_transaction(meta_transaction)
+                for meta_transaction in meta_transactions
+            )
+        )
+
+    assert all(run(validate_all()))
+
+
+def test_async_delegate_validate_from_no_code(
+    async_delegate, accounts, owner_key, chain_id
+):
+    meta_transaction = MetaTransaction(
+        from_=accounts[3], to=accounts[2], value=1000, nonce=0, chain_id=chain_id
+    ).signed(owner_key)
+
+    with pytest.raises(UnexpectedIdentityContractException):
+        run(async_delegate.validate_meta_transaction(meta_transaction))
@@ -1,14 +1,30 @@
 #! pytest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 import attr
 from eth_tester.exceptions import TransactionFailed
 from hexbytes import HexBytes
-from tldeploy.core import deploy_network, deploy_identity
+from tldeploy.core import (
+    clear_chain_id_cache,
+    deploy_network,
+    deploy_identity,
+    get_chain_id,
+    set_chain_id,
+)
 from tldeploy.identity import (
+    Delegate,
+    Identity,
+    IdentityNonceManager,
     MetaTransaction,
+    MetaTransactionValidation,
     UnexpectedIdentityContractException,
     build_create2_address,
+    deploy_identity_implementation,
     MetaTransactionStatus,
+    is_hash_replay_nonce,
 )
 from tldeploy.signing import solidity_keccak, sign_msg_hash
 
@@ -196,6 +212,31 @@ def test_delegated_transaction_hash(each_identity_contract, test_contract, accou
     assert hash == HexBytes(hash_by_contract)
 
 
+def test_meta_transaction_hash_is_cached():
+    meta_transaction = MetaTransaction(
+        from_="0xf2e246bb76df876cef8b38ae84130f4f55de395b",
+        to="0x51a240271ab8ab9f9a21c82d9a85396b704e164d",
+        chain_id=0,
+        nonce=1,
+    )
+
+    assert meta_transaction.from_ == "0xF2E246BB76DF876Cef8b38ae84130F4F55De395b"
+    assert (
+        meta_transaction.currency_network_of_fees
+        == "0x51a240271AB8AB9f9a21C82d9a85396b704E164d"
+    )
+    assert meta_transaction.hash is meta_transaction.hash
+
+    evolved_meta_transaction = attr.evolve(meta_transaction, nonce=2)
+    assert evolved_meta_transaction.hash != meta_transaction.hash
+    assert evolved_meta_transaction.hash == attr.evolve(evolved_meta_transaction).hash
+
+
+def test_meta_transaction_with_invalid_address():
+    with pytest.raises(ValueError):
+        MetaTransaction(from_="0x1234")
+
+
 def test_delegated_transaction_function_call(
     each_identity, delegate, test_contract, web3
 ):
@@ -577,6 +618,347 @@ def test_validate_valid_transfer(each_identity, delegate, accounts):
     assert delegate.validate_meta_transaction(meta_transaction)
 
 
+@pytest.fixture(params=["delegate", "multicall_delegate"])
+def each_delegate(request):
+    """Allows to test the checks with and without the multicall contract"""
+    return request.getfixturevalue(request.param)
+
+
+def test_check_meta_transactions(each_identity, each_delegate, accounts, account_keys):
+    to = accounts[2]
+    value = 1000
+
+    valid_meta_transaction = each_identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=to, value=value)
+    )
+    wrong_signature_meta_transaction = each_identity.defaults_filled(
+        MetaTransaction(to=to, value=value)
+    ).signed(account_keys[3])
+    wrong_nonce_meta_transaction = each_identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=to, value=value, nonce=1000, chain_id=123)
+    )
+
+    validations = each_delegate.check_meta_transactions(
+        [
+            valid_meta_transaction,
+            wrong_signature_meta_transaction,
+            wrong_nonce_meta_transaction,
+        ]
+    )
+
+    assert validations == [
+        MetaTransactionValidation(
+            chain_id=True, nonce=True, signature=True, time_limit=True
+        ),
+        MetaTransactionValidation(
+            chain_id=True, nonce=True, signature=False, time_limit=True
+        ),
+        MetaTransactionValidation(
+            chain_id=False, nonce=False, signature=True, time_limit=True
+        ),
+    ]
+    assert [validation.is_valid for validation in validations] == [True, False, False]
+
+
+def test_check_meta_transaction_from_no_code(
+    multicall_delegate, accounts, owner_key, chain_id
+):
+    meta_transaction = MetaTransaction(
+        from_=accounts[3], to=accounts[2], value=1000, nonce=0, chain_id=chain_id
+    ).signed(owner_key)
+
+    with pytest.raises(UnexpectedIdentityContractException):
+        multicall_delegate.check_meta_transaction(meta_transaction)
+
+
+def test_pre_validate_meta_transaction(
+    each_identity, delegate, web3, accounts, account_keys
+):
+    to = accounts[2]
+    value = 1000
+    latest_timestamp = web3.eth.getBlock("latest").timestamp
+
+    valid_meta_transaction = each_identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=to, value=value, time_limit=latest_timestamp + 1000)
+    )
+    wrong_signature_meta_transaction = each_identity.defaults_filled(
+        MetaTransaction(to=to, value=value)
+    ).signed(account_keys[3])
+    expired_meta_transaction = each_identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=to, value=value, time_limit=latest_timestamp - 1)
+    )
+
+    assert delegate.pre_validate_meta_transaction(valid_meta_transaction)
+    assert not delegate.pre_validate_meta_transaction(wrong_signature_meta_transaction)
+    assert not delegate.pre_validate_meta_transaction(expired_meta_transaction)
+
+
+def test_pre_validate_meta_transaction_of_uninitialized_identity(
+    web3, delegate, accounts, owner_key, chain_id
+):
+    uninitialized_identity = deploy_identity_implementation(web3=web3)
+    meta_transaction = MetaTransaction(
+        from_=uninitialized_identity.address,
+        to=accounts[2],
+        value=1000,
+        nonce=1,
+        chain_id=chain_id,
+    ).signed(owner_key)
+
+    assert not delegate.pre_validate_meta_transaction(meta_transaction)
+    assert not delegate.pre_validate_signature(meta_transaction)
+
+
+def test_pre_validation_uses_cached_values(
+    each_identity,
+    contract_assets,
+    delegate_address,
+    web3,
+    chain,
+    accounts,
+    account_keys,
+):
+    time = 0
+    local_delegate = Delegate(
+        delegate_address,
+        web3=web3,
+        identity_contract_abi=contract_assets["Identity"]["abi"],
+        pre_validate=True,
+        block_timestamp_max_age=10,
+        clock=lambda: time,
+    )
+    meta_transaction = each_identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=accounts[2], value=1000)
+    )
+    assert local_delegate.validate_meta_transaction(meta_transaction)
+    latest_block_timestamp = local_delegate.get_latest_block_timestamp()
+
+    # the cached timestamp is kept until it is older than the max age
+    chain.time_travel(latest_block_timestamp + 100)
+    chain.mine_block()
+    time = 10
+    assert local_delegate.get_latest_block_timestamp() == latest_block_timestamp
+    time = 11
+    assert local_delegate.get_latest_block_timestamp() > latest_block_timestamp
+
+    # the owner is cached, so the signature is rejected without calls
+    assert not local_delegate.pre_validate_signature(
+        meta_transaction.signed(account_keys[3])
+    )
+
+
+def test_chain_id_override(web3, chain_id):
+    set_chain_id(web3, 123)
+    try:
+        assert get_chain_id(web3) == 123
+    finally:
+        clear_chain_id_cache()
+    assert get_chain_id(web3) == chain_id
+
+
+def test_delegate_and_identity_with_chain_id(
+    identity_contract, contract_assets, delegate_address, owner_key, web3, accounts
+):
+    identity = Identity(
+        contract=identity_contract, owner_private_key=owner_key, chain_id=123
+    )
+    delegate_with_chain_id = Delegate(
+        delegate_address,
+        web3=web3,
+        identity_contract_abi=contract_assets["Identity"]["abi"],
+        chain_id=123,
+    )
+
+    meta_transaction = identity.defaults_filled(MetaTransaction(to=accounts[2]))
+
+    assert meta_transaction.chain_id == 123
+    assert delegate_with_chain_id.validate_chain_id(meta_transaction)
+
+
+@pytest.fixture()
+def nonce_manager(web3, contract_assets):
+    return IdentityNonceManager(
+        web3, identity_contract_abi=contract_assets["Identity"]["abi"]
+    )
+
+
+@pytest.fixture()
+def managed_delegate(contract_assets, delegate_address, web3, nonce_manager):
+    return Delegate(
+        delegate_address,
+        web3=web3,
+        identity_contract_abi=contract_assets["Identity"]["abi"],
+        default_gas=None,
+        nonce_manager=nonce_manager,
+    )
+
+
+@pytest.fixture()
+def managed_identity(each_identity_contract, owner_key, nonce_manager):
+    return Identity(
+        contract=each_identity_contract,
+        owner_private_key=owner_key,
+        nonce_manager=nonce_manager,
+    )
+
+
+def test_nonce_manager_allocates_consecutive_nonces(
+    managed_identity, managed_delegate, accounts
+):
+    meta_transactions = [
+        managed_identity.filled_and_signed_meta_transaction(
+            MetaTransaction(to=accounts[2], value=1000)
+        )
+        for _ in range(3)
+    ]
+    first_nonce = meta_transactions[0].nonce
+
+    assert [meta_transaction.nonce for meta_transaction in meta_transactions] == [
+        first_nonce,
+        first_nonce + 1,
+        first_nonce + 2,
+    ]
+    for meta_transaction in meta_transactions:
+        assert managed_delegate.validate_meta_transaction(meta_transaction)
+        managed_delegate.send_signed_meta_transaction(meta_transaction)
+
+
+def test_nonce_manager_resyncs_on_invalid_nonce(
+    managed_identity, managed_delegate, nonce_manager, accounts
+):
+    # the meta transaction with the first nonce is never sent
+    managed_identity.get_next_nonce()
+    meta_transaction = managed_identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=accounts[2], value=1000)
+    )
+
+    assert not managed_delegate.validate_meta_transaction(meta_transaction)
+    next_nonce = nonce_manager.allocate_nonce(managed_identity.address)
+    assert next_nonce == meta_transaction.nonce - 1
+
+
+def test_nonce_manager_allocates_concurrently_for_new_identity(
+    managed_identity, nonce_manager, monkeypatch
+):
+    fetch_last_nonce = nonce_manager._fetch_last_nonce
+
+    def slow_fetch_last_nonce(identity_address):
+        # widen the window in which concurrent allocations could interleave
+        time.sleep(0.01)
+        return fetch_last_nonce(identity_address)
+
+    monkeypatch.setattr(nonce_manager, "_fetch_last_nonce", slow_fetch_last_nonce)
+    number_of_threads = 8
+    barrier = threading.Barrier(number_of_threads)
+
+    def allocate_nonce():
+        barrier.wait()
+        return nonce_manager.allocate_nonce(managed_identity.address)
+
+    with ThreadPoolExecutor(max_workers=number_of_threads) as executor:
+        nonces = list(
+            executor.map(lambda _: allocate_nonce(), range(number_of_threads))
+        )
+
+    first_nonce = min(nonces)
+    assert sorted(nonces) == list(range(first_nonce, first_nonce + number_of_threads))
+
+
+def test_nonce_manager_keeps_pending_nonces_on_resync(
+    managed_identity, managed_delegate, nonce_manager, chain, accounts
+):
+    chain.disable_auto_mine_transactions()
+    try:
+        first_meta_transaction, second_meta_transaction = [
+            managed_identity.filled_and_signed_meta_transaction(
+                MetaTransaction(to=accounts[2], value=1000)
+            )
+            for _ in range(2)
+        ]
+        managed_delegate.send_signed_meta_transaction(first_meta_transaction)
+
+        # the first meta transaction is not mined yet
+        assert not managed_delegate.validate_meta_transaction(second_meta_transaction)
+        assert (
+            nonce_manager.allocate_nonce(managed_identity.address)
+            == second_meta_transaction.nonce
+        )
+    finally:
+        chain.enable_auto_mine_transactions()
+
+    assert managed_delegate.validate_meta_transaction(second_meta_transaction)
+
+
+def test_nonce_manager_hands_out_nonce_of_failed_meta_transaction(
+    managed_identity, managed_delegate, nonce_manager, chain, accounts
+):
+    chain.disable_auto_mine_transactions()
+    try:
+        meta_transaction = managed_identity.filled_and_signed_meta_transaction(
+            MetaTransaction(to=accounts[2], value=1000)
+        )
+        managed_delegate.send_signed_meta_transaction(meta_transaction)
+
+        nonce_manager.record_failed_meta_transaction(meta_transaction)
+        nonce_manager.resync(managed_identity.address)
+
+        assert (
+            nonce_manager.allocate_nonce(managed_identity.address)
+            == meta_transaction.nonce
+        )
+    finally:
+        chain.enable_auto_mine_transactions()
+
+
+def test_nonce_manager_sync_from_events(
+    managed_identity, managed_delegate, nonce_manager, web3, accounts
+):
+    from_block = web3.eth.blockNumber + 1
+    last_nonce = nonce_manager.get_last_nonce(managed_identity.address)
+    meta_transaction = managed_identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=accounts[2], value=1000)
+    )
+    managed_delegate.send_signed_meta_transaction(meta_transaction)
+
+    nonce_manager.sync_from_events(from_block=from_block)
+
+    assert nonce_manager.get_last_nonce(managed_identity.address) == last_nonce + 1
+
+
+def test_hash_replay_nonces(managed_identity, managed_delegate, accounts):
+    meta_transactions = [
+        managed_identity.filled_and_signed_meta_transaction(
+            MetaTransaction(
+                to=accounts[2],
+                value=1000,
+                nonce=IdentityNonceManager.allocate_hash_replay_nonce(),
+            )
+        )
+        for _ in range(2)
+    ]
+
+    assert is_hash_replay_nonce(meta_transactions[0].nonce)
+    assert meta_transactions[0].hash != meta_transactions[1].hash
+    for meta_transaction in reversed(meta_transactions):
+        assert managed_delegate.validate_meta_transaction(meta_transaction)
+        managed_delegate.send_signed_meta_transaction(meta_transaction)
+
+
+def test_delegate_without_nonce_manager(each_identity, delegate, web3, accounts):
+    next_nonce = delegate.get_next_nonce(each_identity.address)
+    meta_transaction = each_identity.filled_and_signed_meta_transaction(
+        MetaTransaction(to=accounts[2], value=1000, nonce=next_nonce)
+    )
+
+    assert delegate.validate_meta_transaction(meta_transaction)
+    tx_id = delegate.send_signed_meta_transaction(meta_transaction)
+
+    assert get_transaction_status(web3, tx_id)
+    assert delegate.get_next_nonce(each_identity.address) == next_nonce + 1
+    # the used nonce is invalid now, which does not need a nonce manager
+    assert not delegate.validate_meta_transaction(meta_transaction)
+
+
 def test_validate_valid_nonce_increase(each_identity, delegate, accounts):
     to = accounts[2]
     value = 1000
@@ -0,0 +1,250 @@
+#! pytest
+
+import json
+import os
+import stat
+
+import pytest
+
+from tldeploy import core
+from tldeploy.artifacts import (
+    ContractsCache,
+    ContractsIndex,
+    get_cache_path,
+    get_index_path,
+    get_user_cache_path,
+    open_contracts_index,
+    write_contracts_index,
+)
+
+CONTRACTS = {
+    "Exchange": {"abi": [{"type": "function", "name": "fillOrder"}], "bytecode": "60"},
+    "Identity": {"abi": [], "bytecode": "6080"},
+}
+
+
+@pytest.fixture(autouse=True)
+def user_cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / "user-cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(path))
+    return path
+
+
+@pytest.fixture()
+def contracts_json_path(tmp_path):
+    path = tmp_path / "contracts.json"
+    path.write_text(json.dumps(CONTRACTS))
+    return str(path)
+
+
+@pytest.fixture()
+def read_only_contracts_json_path(tmp_path):
+    """contracts.json in a directory that is not writable, like site-packages"""
+    contracts_dir = tmp_path / "read-only"
+    contracts_dir.mkdir()
+    path = contracts_dir / "contracts.json"
+    path.write_text(json.dumps(CONTRACTS))
+    contracts_dir.chmod(stat.S_IRUSR | stat.S_IXUSR)
+    if os.access(str(contracts_dir), os.W_OK):
+        contracts_dir.chmod(stat.S_IRWXU)
+        pytest.skip("The directory is writable anyway, e.g. when running as root")
+    yield str(path)
+    contracts_dir.chmod(stat.S_IRWXU)
+
+
+@pytest.fixture()
+def contracts_json_parses(monkeypatch):
+    """Records every parse of the whole content of contracts.json"""
+    parses = []
+    json_load = json.load
+    json_loads = json.loads
+    content = json.dumps(CONTRACTS).encode()
+
+    def recording_json_load(f, **kwargs):
+        if os.path.basename(getattr(f, "name", "")) == "contracts.json":
+            parses.append(f.name)
+        return json_load(f, **kwargs)
+
+    def recording_json_loads(s, **kwargs):
+        if s == content:
+            parses.append(s)
+        return json_loads(s, **kwargs)
+
+    monkeypatch.setattr(json, "load", recording_json_load)
+    monkeypatch.setattr(json, "loads", recording_json_loads)
+    return parses
+
+
+def test_index_roundtrip(contracts_json_path):
+    index = ContractsIndex(write_contracts_index(contracts_json_path))
+
+    assert set(index) == set(CONTRACTS)
+    assert index["Exchange"] == CONTRACTS["Exchange"]
+    assert index["Identity"] == CONTRACTS["Identity"]
+    assert index.is_fresh_for(contracts_json_path)
+
+
+def test_index_unknown_contract(contracts_json_path):
+    index = ContractsIndex(write_contracts_index(contracts_json_path))
+    with pytest.raises(KeyError):
+        index["Unknown"]
+
+
+def test_open_index_builds_missing_index(contracts_json_path):
+    index = open_contracts_index(contracts_json_path)
+
+    assert index is not None
+    assert index["Exchange"] == CONTRACTS["Exchange"]
+
+
+def test_open_index_rebuilds_stale_index(contracts_json_path):
+    write_contracts_index(contracts_json_path)
+    with open(contracts_json_path, "w") as f:
+        json.dump({"Exchange": {"abi": [], "bytecode": "ff"}}, f)
+
+    index = open_contracts_index(contracts_json_path)
+
+    assert index["Exchange"] == {"abi": [], "bytecode": "ff"}
+    assert "Identity" not in index
+
+
+def test_invalid_index_file(contracts_json_path):
+    with open(get_index_path(contracts_json_path), "wb") as f:
+        f.write(b"not an index")
+
+    with pytest.raises(ValueError):
+        ContractsIndex(get_index_path(contracts_json_path))
+    index = open_contracts_index(contracts_json_path)
+    assert index["Identity"] == CONTRACTS["Identity"]
+
+
+def test_open_index_in_read_only_directory(read_only_contracts_json_path):
+    index = open_contracts_index(read_only_contracts_json_path)
+
+    assert index["Exchange"] == CONTRACTS["Exchange"]
+    assert not os.path.exists(get_index_path(read_only_contracts_json_path))
+    assert os.path.exists(
+        get_user_cache_path(get_index_path(read_only_contracts_json_path))
+    )
+
+
+def test_read_only_directory_parses_json_at_most_once(
+    read_only_contracts_json_path, contracts_json_parses, monkeypatch
+):
+    monkeypatch.setenv("TRUSTLINES_CONTRACTS_JSON", read_only_contracts_json_path)
+    monkeypatch.setattr(core, "contracts_cache", ContractsCache())
+
+    assert core.LazyContractsLoader()["Exchange"] == CONTRACTS["Exchange"]
+    assert len(contracts_json_parses) == 1
+
+    # a new process start uses the index in the user cache directory
+    assert core.LazyContractsLoader()["Exchange"] == CONTRACTS["Exchange"]
+    assert len(contracts_json_parses) == 1
+
+
+def test_unwritable_index_parses_json_at_most_once(
+    read_only_contracts_json_path, user_cache_dir, contracts_json_parses, monkeypatch
+):
+    user_cache_dir.mkdir()
+    user_cache_dir.chmod(stat.S_IRUSR | stat.S_IXUSR)
+    monkeypatch.setenv("TRUSTLINES_CONTRACTS_JSON", read_only_contracts_json_path)
+    monkeypatch.setattr(core, "contracts_cache", ContractsCache())
+
+    try:
+        assert core.LazyContractsLoader()["Exchange"] == CONTRACTS["Exchange"]
+    finally:
+        user_cache_dir.chmod(stat.S_IRWXU)
+    assert len(contracts_json_parses) == 1
+
+
+def test_cache_miss_then_hit(contracts_json_path):
+    cache = ContractsCache()
+
+    assert cache.load(contracts_json_path) == CONTRACTS
+    assert cache.load(contracts_json_path) == CONTRACTS
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_in_read_only_directory(read_only_contracts_json_path):
+    cache = ContractsCache()
+
+    assert cache.load(read_only_contracts_json_path) == CONTRACTS
+    assert ContractsCache().load(read_only_contracts_json_path) == CONTRACTS
+    assert cache.load(read_only_contracts_json_path) == CONTRACTS
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not os.path.exists(get_cache_path(read_only_contracts_json_path))
+    assert os.path.exists(
+        get_user_cache_path(get_cache_path(read_only_contracts_json_path))
+    )
+
+
+def test_cache_hit_after_touch(contracts_json_path):
+    cache = ContractsCache()
+    cache.load(contracts_json_path)
+    os.utime(contracts_json_path, ns=(0, 0))
+
+    assert cache.load(contracts_json_path) == CONTRACTS
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_stale_after_change(contracts_json_path):
+    cache = ContractsCache()
+    cache.load(contracts_json_path)
+    changed_contracts = {"Exchange": {"abi": [], "bytecode": "ff"}}
+    with open(contracts_json_path, "w") as f:
+        json.dump(changed_contracts, f)
+
+    assert cache.load(contracts_json_path) == changed_contracts
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_corrupt_cache_falls_back_to_json(contracts_json_path):
+    with open(get_cache_path(contracts_json_path), "wb") as f:
+        f.write(b"garbage")
+    cache = ContractsCache()
+
+    assert cache.load(contracts_json_path) == CONTRACTS
+    assert cache.misses == 1
+
+
+def test_failed_index_write_removes_temporary_file(
+    contracts_json_path, tmp_path, monkeypatch
+):
+    def fail_replace(src, dst):
+        raise OSError("replace failed")
+
+    monkeypatch.setattr(os, "replace", fail_replace)
+
+    with pytest.raises(OSError):
+        write_contracts_index(contracts_json_path)
+    assert os.listdir(str(tmp_path)) == ["contracts.json"]
+
+
+@pytest.mark.parametrize("with_index", [True, False])
+def test_lazy_contracts_loader_mapping(contracts_json_path, monkeypatch, with_index):
+    monkeypatch.setenv("TRUSTLINES_CONTRACTS_JSON", contracts_json_path)
+    if not with_index:
+        monkeypatch.setattr(core.contracts_cache, "open_index", lambda path: None)
+    loader = core.LazyContractsLoader()
+
+    assert loader["Exchange"] == CONTRACTS["Exchange"]
+    assert "Identity" in loader
+    assert "Unknown" not in loader
+    assert len(loader) == 2
+    assert set(loader) == set(loader.keys()) == set(CONTRACTS)
+    assert dict(loader.items()) == CONTRACTS
+
+
+def test_index_lookups_are_counted(tmp_path, monkeypatch, web3, contract_assets):
+    contracts_json_path = tmp_path / "contracts.json"
+    contracts_json_path.write_text(json.dumps(contract_assets))
+    monkeypatch.setenv("TRUSTLINES_CONTRACTS_JSON", str(contracts_json_path))
+    monkeypatch.setattr(core, "contracts", core.LazyContractsLoader())
+    monkeypatch.setattr(core, "contracts_cache", ContractsCache())
+
+    core.get_contract(web3, "Exchange", web3.eth.accounts[0])
+    assert (core.contracts_cache.hits, core.contracts_cache.misses) == (0, 1)
+
+    monkeypatch.setattr(core, "contracts", core.LazyContractsLoader())
+    core.get_contract(web3, "Exchange", web3.eth.accounts[0])
+    assert (core.contracts_cache.hits, core.contracts_cache.misses) == (1, 1)
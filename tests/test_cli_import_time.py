@@ -0,0 +1,56 @@
+#! pytest
+"""Make sure that the startup of the command line tool stays fast, by checking
+that the expensive modules are only imported by the commands that need them."""
+
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from tldeploy.cli import cli
+
+HEAVY_MODULES = [
+    "web3",
+    "deploy_tools",
+    "pendulum",
+    "pkg_resources",
+    "eth_utils",
+    "tldeploy.core",
+    "tldeploy.identity",
+]
+
+# prints the modules imported by `tl-deploy --help`
+LIST_MODULES = """
+import sys
+from click.testing import CliRunner
+from tldeploy.cli import cli
+
+result = CliRunner().invoke(cli, ["--help"])
+assert result.exit_code == 0, result.output
+print("\\n".join(sys.modules))
+"""
+
+
+@pytest.fixture(scope="session")
+def cli_modules():
+    result = subprocess.run(
+        [sys.executable, "-c", LIST_MODULES],
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return set(result.stdout.splitlines())
+
+
+@pytest.mark.parametrize("module", HEAVY_MODULES)
+def test_cli_help_does_not_import_heavy_modules(cli_modules, module):
+    assert module not in cli_modules
+
+
+def test_commands_have_transaction_options():
+    result = CliRunner().invoke(cli, ["exchange", "--help"])
+
+    assert result.exit_code == 0
+    for option in ["--jsonrpc", "--gas", "--gas-price", "--nonce", "--keystore"]:
+        assert option in result.output
@@ -0,0 +1,130 @@
+#! pytest
+
+import pytest
+from eth_abi import encode_abi
+from eth_utils import keccak
+
+from tldeploy.artifacts import build_selector_table
+from tldeploy.core import deploy_network, get_selector_table
+from tldeploy.events import EventDecoder, get_hot_event_decoder
+
+from tests.conftest import EXPIRATION_TIME, EXTRA_DATA
+
+
+@pytest.fixture(scope="session")
+def currency_network_contract(web3, accounts):
+    contract = deploy_network(
+        web3,
+        name="TestCoin",
+        symbol="T",
+        decimals=6,
+        currency_network_contract_name="TestCurrencyNetwork",
+        expiration_time=EXPIRATION_TIME,
+    )
+    A, B, *rest = accounts
+    contract.functions.setAccount(A, B, 100, 150, 0, 0, False, 0, 0).transact()
+    contract.functions.transfer(10, 0, [A, B], EXTRA_DATA).transact({"from": A})
+    return contract
+
+
+def test_selector_table():
+    abi = [
+        {
+            "type": "function",
+            "name": "transfer",
+            "inputs": [{"type": "address"}, {"type": "uint256"}],
+        },
+        {
+            "type": "event",
+            "name": "Transfer",
+            "inputs": [
+                {"type": "address", "indexed": True},
+                {"type": "address", "indexed": True},
+                {"type": "uint256", "indexed": False},
+            ],
+        },
+    ]
+    table = build_selector_table({"Token": {"abi": abi}})
+
+    assert table["Token"]["functions"]["transfer(address,uint256)"] == "0xa9059cbb"
+    assert (
+        table["Token"]["events"]["Transfer(address,address,uint256)"]
+        == "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+    )
+
+
+def test_selector_table_of_contracts(currency_network_contract):
+    functions = get_selector_table()["CurrencyNetwork"]["functions"]
+    selector = functions["transfer(uint64,uint64,address[],bytes)"]
+
+    transaction_data = currency_network_contract.encodeABI(
+        fn_name="transfer", args=[1, 0, [], b""]
+    )
+    assert transaction_data.startswith(selector)
+
+
+@pytest.mark.parametrize("event_name", ["Transfer", "BalanceUpdate"])
+def test_hot_event_decoder_matches_web3(web3, currency_network_contract, event_name):
+    event = getattr(currency_network_contract.events, event_name)
+    web3_events = event.getLogs(fromBlock=0)
+    raw_logs = web3.eth.getLogs(
+        {"fromBlock": 0, "address": currency_network_contract.address}
+    )
+
+    decoded_events = [
+        decoded_event
+        for decoded_event in get_hot_event_decoder().decode_many(raw_logs)
+        if decoded_event["event"] == event_name
+    ]
+
+    assert len(decoded_events) == len(web3_events) > 0
+    for decoded_event, web3_event in zip(decoded_events, web3_events):
+        assert decoded_event["args"] == dict(web3_event["args"])
+        assert decoded_event["transactionHash"] == web3_event["transactionHash"]
+
+
+ARRAY_EVENT_ABI = {
+    "type": "event",
+    "name": "Update",
+    "inputs": [
+        {"name": "user", "type": "address", "indexed": True},
+        {"name": "value", "type": "uint64", "indexed": False},
+        {"name": "values", "type": "uint256[]", "indexed": False},
+        {"name": "pair", "type": "bytes32[2]", "indexed": False},
+        {"name": "data", "type": "bytes", "indexed": False},
+    ],
+}
+ARRAY_EVENT_TOPIC = keccak(text="Update(address,uint64,uint256[],bytes32[2],bytes)")
+USER = "0x" + "11" * 20
+CONTRACT_ADDRESS = "0x" + "22" * 20
+
+
+def make_array_event_log(address=CONTRACT_ADDRESS):
+    data = encode_abi(
+        ["uint64", "uint256[]", "bytes32[2]", "bytes"],
+        [5, [1, 2, 3], [b"a" * 32, b"b" * 32], b"data"],
+    )
+    return {
+        "address": address,
+        "topics": [ARRAY_EVENT_TOPIC, bytes(12) + bytes.fromhex("11" * 20)],
+        "data": data,
+    }
+
+
+def test_decode_arrays():
+    event = EventDecoder([ARRAY_EVENT_ABI]).decode(make_array_event_log())
+
+    assert event["event"] == "Update"
+    assert event["args"]["user"].lower() == USER
+    assert event["args"]["value"] == 5
+    assert list(event["args"]["values"]) == [1, 2, 3]
+    assert list(event["args"]["pair"]) == [b"a" * 32, b"b" * 32]
+    assert event["args"]["data"] == b"data"
+
+
+def test_decoder_filters_addresses():
+    decoder = EventDecoder([ARRAY_EVENT_ABI], addresses=[CONTRACT_ADDRESS])
+
+    assert decoder.decode(make_array_event_log()) is not None
+    assert decoder.decode(make_array_event_log(address=USER)) is None
+    assert not decoder.can_decode(make_array_event_log(address=USER))
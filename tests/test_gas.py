@@ -0,0 +1,165 @@
+#! pytest
+
+import gc
+import weakref
+
+import pytest
+from web3 import Web3
+
+from tldeploy.core import (
+    deploy,
+    gas_estimate_cache,
+    get_chain_id,
+    get_contract_factory,
+    set_chain_id,
+)
+from tldeploy.gas import CONSTRUCTOR, GasEstimateCache, get_function_selector
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture()
+def cache(clock):
+    return GasEstimateCache(max_age=60, margin=1.5, clock=clock)
+
+
+@pytest.fixture()
+def constructor(web3):
+    return get_contract_factory(web3, "TestContract").constructor()
+
+
+def test_function_selector(web3, constructor):
+    test_contract = get_contract_factory(web3, "TestContract")(address="0x" + "11" * 20)
+
+    assert get_function_selector(constructor) == CONSTRUCTOR
+    assert (
+        get_function_selector(test_contract.functions.testFunction(1))
+        == test_contract.encodeABI(fn_name="testFunction", args=[1])[:10]
+    )
+
+
+def test_gas_limit_is_cached(web3, cache, constructor):
+    gas_limit = cache.get_gas_limit(
+        constructor, web3=web3, contract_name="TestContract"
+    )
+
+    assert gas_limit == int(constructor.estimateGas() * 1.5)
+    assert (
+        cache.get_gas_limit(constructor, web3=web3, contract_name="TestContract")
+        == gas_limit
+    )
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.gas_limits() == {"TestContract": {CONSTRUCTOR: gas_limit}}
+
+
+def test_gas_limit_is_refreshed(web3, cache, clock, constructor):
+    cache.get_gas_limit(constructor, web3=web3, contract_name="TestContract")
+    clock.time += 61
+    cache.get_gas_limit(constructor, web3=web3, contract_name="TestContract")
+
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_gas_limit_depends_on_data_size(web3, cache):
+    network = deploy("TestCurrencyNetwork", web3=web3)
+
+    def set_name(name):
+        return cache.get_gas_limit(
+            network.functions.setNetworkSettings(name, "T", 2, 0, 0, False, False),
+            web3=web3,
+            contract_name="TestCurrencyNetwork",
+        )
+
+    short_name_gas_limit = set_name("A")
+    long_name_gas_limit = set_name("A" * 100)
+    assert set_name("B") == short_name_gas_limit
+
+    assert long_name_gas_limit > short_name_gas_limit
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert list(cache.gas_limits()["TestCurrencyNetwork"].values()) == [
+        long_name_gas_limit
+    ]
+
+
+def test_gas_limit_depends_on_chain(web3, cache, constructor):
+    other_web3 = Web3(web3.provider)
+    set_chain_id(other_web3, get_chain_id(web3) + 1)
+
+    cache.get_gas_limit(constructor, web3=web3, contract_name="TestContract")
+    cache.get_gas_limit(constructor, web3=other_web3, contract_name="TestContract")
+    cache.get_gas_limit(constructor, web3=web3, contract_name="TestContract")
+
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_gas_price_is_refreshed_after_a_few_seconds(web3, cache, clock):
+    gas_price = cache.get_gas_price(web3)
+    clock.time += 1
+
+    assert cache.get_gas_price(web3) == gas_price
+    clock.time += 5
+    cache.get_gas_price(web3)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_gas_price_cache_does_not_keep_web3_alive(web3, cache):
+    other_web3 = Web3(web3.provider)
+    cache.get_gas_price(other_web3)
+    reference = weakref.ref(other_web3)
+
+    del other_web3
+    gc.collect()
+    assert reference() is None
+
+
+def test_gas_price_uses_gas_price_strategy(web3, cache):
+    web3.eth.setGasPriceStrategy(lambda web3, transaction_params: 12345)
+    try:
+        assert cache.get_gas_price(web3) == 12345
+    finally:
+        web3.eth.setGasPriceStrategy(None)
+
+
+def test_gas_limit_does_not_exceed_block_gas_limit(web3, clock, constructor):
+    cache = GasEstimateCache(margin=1000, clock=clock)
+
+    gas_limit = cache.get_gas_limit(
+        constructor, web3=web3, contract_name="TestContract"
+    )
+
+    assert gas_limit == web3.eth.getBlock("latest")["gasLimit"]
+
+
+def test_fill_transaction_options_keeps_given_values(web3, cache, constructor):
+    transaction_options = {"gas": 123, "gasPrice": 456, "nonce": 1}
+
+    filled_options = cache.fill_transaction_options(
+        constructor,
+        web3=web3,
+        contract_name="TestContract",
+        transaction_options=transaction_options,
+    )
+
+    assert filled_options == transaction_options
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_deploy_uses_gas_estimate_cache(web3):
+    deploy("TestContract", web3=web3)
+    gas_estimate_cache.reset_stats()
+
+    deploy("TestContract", web3=web3)
+
+    assert gas_estimate_cache.misses == 0
+    assert gas_estimate_cache.hits == 2
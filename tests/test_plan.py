@@ -0,0 +1,151 @@
+#! pytest
+
+import json
+
+import pytest
+
+from tldeploy.core import get_contract
+from tldeploy.plan import (
+    InvalidPlan,
+    Manifest,
+    execute_plan,
+    get_plan_addresses,
+    validate_plan,
+)
+
+from tests.conftest import EXPIRATION_TIME
+
+PLAN = {
+    "exchange": True,
+    "unwEth": True,
+    "identityImplementation": True,
+    "identityProxyFactory": True,
+    "networks": [
+        {
+            "name": "Cash",
+            "symbol": "CASH",
+            "decimals": 4,
+            "fee_divisor": 1000,
+            "expiration_time": EXPIRATION_TIME,
+        },
+        {"name": "Beers", "symbol": "BEER", "decimals": 0},
+    ],
+}
+
+
+@pytest.fixture()
+def manifest_path(tmp_path):
+    return str(tmp_path / "plan.json.progress.json")
+
+
+def test_execute_plan(web3, manifest_path):
+    addresses = get_plan_addresses(
+        PLAN, execute_plan(PLAN, web3=web3, manifest_path=manifest_path)
+    )
+
+    networks = [
+        get_contract(web3, "CurrencyNetwork", address)
+        for address in addresses["networks"]
+    ]
+    assert [network.functions.name().call() for network in networks] == [
+        "Cash",
+        "Beers",
+    ]
+    assert networks[0].functions.globalAuthorized(addresses["exchange"]).call()
+    assert web3.eth.getCode(addresses["exchange"]) != b""
+    assert web3.eth.getCode(addresses["identityProxyFactory"]) != b""
+
+
+def test_resume_plan_does_not_send_again(web3, manifest_path):
+    first_addresses = execute_plan(PLAN, web3=web3, manifest_path=manifest_path)
+    block_number = web3.eth.blockNumber
+
+    second_addresses = execute_plan(PLAN, web3=web3, manifest_path=manifest_path)
+
+    assert web3.eth.blockNumber == block_number
+    assert first_addresses == second_addresses
+
+
+def test_resume_partially_deployed_plan(web3, manifest_path):
+    execute_plan(PLAN, web3=web3, manifest_path=manifest_path)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    # pretend the second network was never deployed
+    del manifest["steps"]["networks.1"]
+    del manifest["steps"]["networks.1.init"]
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    block_number = web3.eth.blockNumber
+
+    execute_plan(PLAN, web3=web3, manifest_path=manifest_path)
+
+    assert web3.eth.blockNumber == block_number + 2
+
+
+class Crash(Exception):
+    pass
+
+
+@pytest.fixture()
+def crash_after_first_broadcast(monkeypatch):
+    """Simulate a crash after the first transaction was sent, but before it was
+    recorded as sent in the manifest"""
+
+    def crash(self, step_id, transaction_hash):
+        raise Crash()
+
+    monkeypatch.setattr(Manifest, "set_sent", crash)
+    return monkeypatch
+
+
+def test_resume_after_crash_while_sending(
+    web3, manifest_path, account_keys, crash_after_first_broadcast
+):
+    private_key = account_keys[0].to_bytes()
+    with pytest.raises(Crash):
+        execute_plan(
+            PLAN, web3=web3, manifest_path=manifest_path, private_key=private_key
+        )
+    crash_after_first_broadcast.undo()
+    block_number = web3.eth.blockNumber
+
+    addresses = execute_plan(
+        PLAN, web3=web3, manifest_path=manifest_path, private_key=private_key
+    )
+
+    # the exchange was deployed before the crash and is not deployed again
+    assert web3.eth.blockNumber == block_number + 8
+    assert web3.eth.getCode(addresses["exchange"]) != b""
+
+
+def test_resume_after_crash_while_sending_unsigned(
+    web3, manifest_path, crash_after_first_broadcast
+):
+    with pytest.raises(Crash):
+        execute_plan(PLAN, web3=web3, manifest_path=manifest_path)
+    crash_after_first_broadcast.undo()
+
+    with pytest.raises(InvalidPlan):
+        execute_plan(PLAN, web3=web3, manifest_path=manifest_path)
+
+
+def test_manifest_of_other_plan(web3, manifest_path):
+    execute_plan(PLAN, web3=web3, manifest_path=manifest_path)
+
+    with pytest.raises(InvalidPlan):
+        execute_plan(
+            {"exchange": True, "networks": []}, web3=web3, manifest_path=manifest_path
+        )
+
+
+@pytest.mark.parametrize(
+    "plan",
+    [
+        {"unknown": True},
+        {"networks": [{"name": "Cash", "symbol": "CASH"}]},
+        {"networks": [{"name": "Cash", "symbol": "CASH", "decimals": 2, "fee": 1}]},
+    ],
+)
+def test_invalid_plan(plan):
+    with pytest.raises(InvalidPlan):
+        validate_plan(plan)
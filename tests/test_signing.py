@@ -1,7 +1,21 @@
 #! pytest
+import random
 
-from eth_utils import to_checksum_address
-from tldeploy.signing import eth_validate, eth_sign
+import pytest
+from eth_utils import to_canonical_address, to_checksum_address
+from web3 import Web3
+
+from tldeploy.exchange import order_hash_packer
+from tldeploy.identity import meta_transaction_hash_packer
+from tldeploy.signing import (
+    SolidityKeccakPacker,
+    eth_validate,
+    eth_sign,
+    recover_msg_hash_signer,
+    sign_msg_hash,
+    sign_many,
+    validate_many,
+)
 
 
 def test_eth_validate(accounts, account_keys):
@@ -13,6 +27,21 @@ def test_eth_validate(accounts, account_keys):
     assert eth_validate(msg_hash, vrs, to_checksum_address(address))
 
 
+def test_recover_msg_hash_signer(accounts, account_keys):
+    msg_hash = (123).to_bytes(32, byteorder="big")
+    signature = sign_msg_hash(msg_hash, account_keys[0])
+
+    assert recover_msg_hash_signer(msg_hash, signature) == to_canonical_address(
+        accounts[0]
+    )
+    signature_with_v_27 = signature[:64] + bytes([signature[64] + 27])
+    assert recover_msg_hash_signer(msg_hash, signature_with_v_27) == (
+        to_canonical_address(accounts[0])
+    )
+    assert recover_msg_hash_signer(msg_hash, signature[:64]) is None
+    assert recover_msg_hash_signer(msg_hash, signature[:64] + bytes([2])) is None
+
+
 def test_eth_validate_fail(accounts, account_keys):
     address = accounts[0]
     key = account_keys[0].to_bytes()
@@ -31,3 +60,116 @@ def test_eth_validate_fail2(accounts, account_keys):
     r = 18
     s = 2748
     assert not eth_validate(msg_hash, (v, r, s), to_checksum_address(address))
+
+
+def test_sign_many(accounts, account_keys):
+    key = account_keys[0].to_bytes()
+    hashes = [i.to_bytes(32, byteorder="big") for i in range(5)]
+
+    signatures = sign_many(hashes, key)
+
+    assert signatures == [eth_sign(msg_hash, key) for msg_hash in hashes]
+    for msg_hash, vrs in zip(hashes, signatures):
+        assert eth_validate(msg_hash, vrs, to_checksum_address(accounts[0]))
+
+
+def test_sign_many_with_processes(account_keys):
+    key = account_keys[0].to_bytes()
+    hashes = [i.to_bytes(32, byteorder="big") for i in range(5)]
+
+    assert sign_many(hashes, key, processes=2, chunk_size=2) == sign_many(hashes, key)
+
+
+def test_validate_many(accounts, account_keys):
+    address = to_checksum_address(accounts[0])
+    key = account_keys[0].to_bytes()
+    hashes = [i.to_bytes(32, byteorder="big") for i in range(3)]
+    signatures = sign_many(hashes, key)
+
+    signed_hashes = [
+        (hashes[0], signatures[0], address),
+        (hashes[1], signatures[2], address),
+        (hashes[2], signatures[2], to_checksum_address(accounts[1])),
+        (hashes[2], (27, 18, 2748), address),
+        (hashes[2], (35, 18, 2748), address),
+        (hashes[2], signatures[2], address),
+    ]
+
+    assert validate_many(signed_hashes) == [True, False, False, False, False, True]
+
+
+def test_validate_many_with_processes(accounts, account_keys):
+    key = account_keys[0].to_bytes()
+    hashes = [i.to_bytes(32, byteorder="big") for i in range(5)]
+    signed_hashes = [
+        (msg_hash, vrs, accounts[0])
+        for msg_hash, vrs in zip(hashes, sign_many(hashes, key))
+    ]
+
+    assert validate_many(signed_hashes, processes=2, chunk_size=2) == [True] * 5
+
+
+def random_value(abi_type, rng):
+    if abi_type == "address":
+        return to_checksum_address(rng.getrandbits(160).to_bytes(20, byteorder="big"))
+    if abi_type == "bool":
+        return rng.random() < 0.5
+    if abi_type.startswith("uint"):
+        return rng.getrandbits(int(abi_type[len("uint") :]))
+    if abi_type.startswith("int"):
+        bits = int(abi_type[len("int") :])
+        return rng.getrandbits(bits) - 2 ** (bits - 1)
+    size = int(abi_type[len("bytes") :])
+    return rng.getrandbits(8 * size).to_bytes(size, byteorder="big")
+
+
+@pytest.mark.parametrize(
+    "abi_types",
+    [
+        order_hash_packer.abi_types,
+        meta_transaction_hash_packer.abi_types,
+        ("bool", "int8", "int256", "uint64", "bytes4", "bytes32", "address"),
+    ],
+)
+def test_solidity_keccak_packer_matches_web3(abi_types):
+    rng = random.Random(0)
+    packer = SolidityKeccakPacker(abi_types)
+    for _ in range(50):
+        values = [random_value(abi_type, rng) for abi_type in abi_types]
+        assert packer(values) == Web3.solidityKeccak(abi_types, values)
+
+
+def test_solidity_keccak_packer_accepts_hex_bytes():
+    packer = SolidityKeccakPacker(["bytes1", "bytes32"])
+    values = ["0x19", "0x" + "ab" * 32]
+
+    assert packer(values) == Web3.solidityKeccak(["bytes1", "bytes32"], values)
+
+
+@pytest.mark.parametrize(
+    "abi_types, values",
+    [
+        (["uint8"], [256]),
+        (["uint8"], [-1]),
+        (["address"], [bytes(19)]),
+        (["bytes1"], [bytes(2)]),
+        (["bytes4"], [bytes(3)]),
+        (["bytes4"], ["0x01"]),
+    ],
+)
+def test_solidity_keccak_packer_rejects_invalid_values(abi_types, values):
+    with pytest.raises((ValueError, OverflowError)):
+        SolidityKeccakPacker(abi_types)(values)
+
+
+def test_web3_does_not_pad_short_bytes():
+    # a short value would be packed in fewer bytes by web3, so the packer can
+    # not compute the same hash and rejects it instead
+    assert Web3.solidityKeccak(["bytes4", "uint8"], [bytes(3), 1]) == (
+        Web3.solidityKeccak(["bytes3", "uint8"], [bytes(3), 1])
+    )
+
+
+def test_solidity_keccak_packer_rejects_dynamic_types():
+    with pytest.raises(ValueError):
+        SolidityKeccakPacker(["bytes"])